@@ -0,0 +1,137 @@
+"""
+Time Service MCP 服务器基准 - 先对比进程内时区查找（原先的线性扫描 + 每次 pytz.timezone 与 前缀索引 + 时区缓存），
+再以 streamable-http 方式启动服务器，用多个客户端会话发起数千个并发工具调用，统计吞吐与延迟分位数
+运行: uv run python -m example.AgentTools.bench_mcp_server
+"""
+import asyncio
+import logging
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack
+from typing import List
+
+import pytz
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+from example.AgentTools.mcp_server import get_tz, timezones_with_prefix
+
+PORT = 8765
+SESSIONS = 20
+REQUESTS = 5000
+CONCURRENCY = 1000
+LOOKUPS = 20_000
+REGIONS = ["Asia", "America", "Europe", "Africa", "Australia", "Pacific", "America/Argentina", "America/Indiana", "Etc"]
+ZONES = ["UTC", "Asia/Shanghai", "America/New_York", "Europe/London", "Asia/Tokyo", "Australia/Sydney"]
+
+
+def legacy_lookup(region: str, zone: str):
+    timezones = [tz for tz in pytz.all_timezones if tz.startswith(region)]
+    return timezones[:50], pytz.timezone(zone)
+
+
+def indexed_lookup(region: str, zone: str):
+    return timezones_with_prefix(region)[:50], get_tz(zone)
+
+
+def lookups():
+    rng = random.Random(0)
+    queries = [(rng.choice(REGIONS), rng.choice(ZONES)) for _ in range(LOOKUPS)]
+    for region, zone in queries[:100]:
+        assert list(legacy_lookup(region, zone)[0]) == list(indexed_lookup(region, zone)[0])
+    costs = {}
+    for name, func in (("原线性扫描", legacy_lookup), ("前缀索引", indexed_lookup)):
+        start = time.perf_counter()
+        for region, zone in queries:
+            func(region, zone)
+        costs[name] = time.perf_counter() - start
+    for name, cost in costs.items():
+        print(f"{name}: {LOOKUPS} 次查询 {cost * 1000:.1f} ms，{LOOKUPS / cost:,.0f} 次/秒")
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"服务器未在 {timeout} 秒内监听端口 {port}")
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def random_call(rng: random.Random):
+    kind = rng.random()
+    if kind < 0.5:
+        return "get_current_time", {"timezone": rng.choice(ZONES), "format": "readable"}
+    if kind < 0.8:
+        return "get_timezone_list", {"region": rng.choice(REGIONS), "offset": rng.randint(0, 40), "limit": 20}
+    return "compare_timezones", {"timezone1": rng.choice(ZONES), "timezone2": rng.choice(ZONES)}
+
+
+async def open_session(url: str, stack) -> ClientSession:
+    read, write, _ = await stack.enter_async_context(streamablehttp_client(url))
+    session = await stack.enter_async_context(ClientSession(read, write))
+    await session.initialize()
+    return session
+
+
+async def load_test(url: str):
+    rng = random.Random(0)
+    calls = [random_call(rng) for _ in range(REQUESTS)]
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies: List[float] = []
+    errors = 0
+
+    async with AsyncExitStack() as stack:
+        sessions = [await open_session(url, stack) for _ in range(SESSIONS)]
+
+        async def one(i: int):
+            nonlocal errors
+            name, arguments = calls[i]
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await sessions[i % SESSIONS].call_tool(name, arguments)
+                    if result.isError:
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"并发压测: {REQUESTS} 次调用，并发 {CONCURRENCY}，{SESSIONS} 个会话，失败 {errors} 次")
+    print(f"  吞吐 {REQUESTS / elapsed:,.0f} 次/秒，总耗时 {elapsed:.2f} 秒")
+    print(f"  延迟 p50 {percentile(latencies, 0.5) * 1000:.1f} ms，p95 {percentile(latencies, 0.95) * 1000:.1f} ms，"
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+
+
+def main():
+    # mcp 会把日志级别设为 INFO，压测时每个请求都打印日志会拖慢客户端
+    for name in ("httpx", "mcp"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    lookups()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "example.AgentTools.mcp_server", "--transport", "streamable-http", "--port", str(PORT)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(PORT)
+        asyncio.run(load_test(f"http://127.0.0.1:{PORT}/mcp"))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
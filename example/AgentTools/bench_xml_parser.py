@@ -0,0 +1,128 @@
+"""
+XML工具调用解析器的模糊测试与吞吐基准 - 对比原先的正则解析与流式状态机解析
+运行: uv run python -m example.AgentTools.bench_xml_parser
+"""
+import random
+import re
+import time
+from typing import Any, Dict, List
+from xml.sax.saxutils import escape, quoteattr
+
+from example.AgentTools.xml_fc import StreamingXmlToolCallParser, parse_xml_tool_calls
+
+FUZZ_CASES = 2000
+RESPONSE_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# 模拟SSE每个事件携带的文本长度
+STREAM_CHUNK_SIZE = 16
+VALUE_ALPHABET = "abc 北京<>&'\"]]=/\n"
+
+
+def legacy_parse_xml_tool_calls(content: str) -> List[Dict[str, Any]]:
+    """原先的解析方式：整段正则匹配，参数值遇到 < 即截断"""
+    tool_calls = []
+    tool_calls_match = re.search(r'<tool_calls>(.*?)</tool_calls>', content, re.DOTALL)
+    if not tool_calls_match:
+        return tool_calls
+    for tool_name, params_content in re.findall(r'<invoke name="([^"]+)">(.*?)</invoke>',
+                                                tool_calls_match.group(1), re.DOTALL):
+        param_matches = re.findall(r'<parameter name="([^"]+)">([^<]*)</parameter>', params_content, re.DOTALL)
+        tool_calls.append({"name": tool_name, "arguments": {name: value.strip() for name, value in param_matches}})
+    return tool_calls
+
+
+def encode_value(value: str, rng: random.Random) -> str:
+    """随机选择实体转义或CDATA编码参数值；CDATA中的 ]]> 拆成两段"""
+    if rng.random() < 0.5:
+        return escape(value)
+    return "<![CDATA[" + value.replace("]]>", "]]]]><![CDATA[>") + "]]>"
+
+
+def random_case(rng: random.Random):
+    """生成一组随机工具调用及其XML文本，返回 (文本, 期望的解析结果)"""
+    expected = []
+    body = []
+    for i in range(rng.randint(0, 4)):
+        arguments = {}
+        params = []
+        for j in range(rng.randint(0, 3)):
+            value = "".join(rng.choice(VALUE_ALPHABET) for _ in range(rng.randint(0, 20)))
+            encoded = encode_value(value, rng)
+            # 实体转义的值首尾空白会被去掉，CDATA原样保留
+            arguments[f"p{j}"] = value if encoded.startswith("<![CDATA[") else value.strip()
+            params.append(f"{rng.choice(['', ' ', chr(10)])}<parameter name={quoteattr(f'p{j}')}>{encoded}</parameter>")
+        expected.append({"name": f"tool_{i}", "arguments": arguments})
+        body.append(f"<invoke name={quoteattr(f'tool_{i}')}>{''.join(params)}\n</invoke>")
+    content = f"好的，我来调用工具 a<b\n<tool_calls>\n{''.join(body)}\n</tool_calls>\n之后的文本 <invoke name=\"x\"></invoke>"
+    return content, expected
+
+
+def feed_in_chunks(content: str, chunk_sizes) -> List[Dict[str, Any]]:
+    parser = StreamingXmlToolCallParser()
+    tool_calls = []
+    pos = 0
+    for size in chunk_sizes:
+        if pos >= len(content):
+            break
+        tool_calls.extend(parser.feed(content[pos:pos + size]))
+        pos += size
+    tool_calls.extend(parser.feed(content[pos:]))
+    tool_calls.extend(parser.close())
+    return tool_calls
+
+
+def fuzz():
+    rng = random.Random(0)
+    legacy_mismatches = 0
+    for case in range(FUZZ_CASES):
+        content, expected = random_case(rng)
+        chunk_sizes = [rng.randint(1, 12) for _ in range(len(content))]
+        assert parse_xml_tool_calls(content) == expected, f"整段解析不一致: case {case}\n{content}"
+        assert feed_in_chunks(content, chunk_sizes) == expected, f"分块解析不一致: case {case}\n{content}"
+        if legacy_parse_xml_tool_calls(content) != expected:
+            legacy_mismatches += 1
+    print(f"模糊测试: {FUZZ_CASES} 组随机切分全部通过；原正则解析有 {legacy_mismatches} 组结果错误（参数值被截断或丢失）")
+
+
+def make_response(size: int) -> str:
+    """生成约 size 字节、由多个 <invoke> 组成的响应"""
+    invoke = '<invoke name="get_weather"><parameter name="city">北京</parameter>' \
+             '<parameter name="note">温度 &gt; 20 &amp; 晴</parameter></invoke>\n'
+    count = max(1, size // len(invoke.encode()))
+    return "我来调用工具。\n<tool_calls>\n" + invoke * count + "</tool_calls>"
+
+
+def best_of(func, repeat: int = 5) -> float:
+    costs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        costs.append(time.perf_counter() - start)
+    return min(costs)
+
+
+def throughput():
+    print(f"{'响应大小':>10} | {'原正则(MB/s)':>12} | {'状态机整段(MB/s)':>16} | {'状态机流式(MB/s)':>16}")
+    for size in RESPONSE_SIZES:
+        content = make_response(size)
+        chunks = [content[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(content), STREAM_CHUNK_SIZE)]
+        megabytes = len(content.encode()) / 1_000_000
+
+        def stream():
+            parser = StreamingXmlToolCallParser()
+            for chunk in chunks:
+                parser.feed(chunk)
+
+        legacy_cost = best_of(lambda: legacy_parse_xml_tool_calls(content))
+        whole_cost = best_of(lambda: parse_xml_tool_calls(content))
+        stream_cost = best_of(stream)
+        print(f"{len(content.encode()):>10} | {megabytes / legacy_cost:>12.1f} | "
+              f"{megabytes / whole_cost:>16.1f} | {megabytes / stream_cost:>16.1f}")
+
+
+def main():
+    fuzz()
+    throughput()
+
+
+if __name__ == "__main__":
+    main()
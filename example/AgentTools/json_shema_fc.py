@@ -2,30 +2,34 @@
 通过原始的json schema + 提示词 + rest调用接口的方式来练习 FunctionCalling
 """
 import json
-import os
+import sys
+import time
 from dotenv import load_dotenv
 load_dotenv()
 
 import requests
-from datetime import datetime
+from typing import Iterator
 
+from example.common.demo_tools import demo_registry
+from example.common.http_client import DASHSCOPE_GENERATION_URL, dashscope_client
+from example.common.tool_dispatch import (
+    ToolCallAssembler,
+    collect_results,
+    dispatch_tool_calls,
+    submit_tool_call,
+)
+from example.common.tool_registry import ToolArgumentError, UnknownToolError
 
-def get_weather(city: str) -> str:
-    """获取指定城市的天气信息"""
-    return f"{city}的天气是晴天，温度为25度。"
+# 单个工具的执行超时（秒）
+TOOL_TIMEOUT = 10.0
 
 
-def get_time() -> str:
-    """获取当前时间"""
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
 # 构造提示词
 system_prompt = f"""
 你是一个专业的人工智能助手，你会根据用户的问题来解答。你可以借助工具来辅助你生成答案。
 
 工具定义：
-1. get_weather: 获取指定城市的天气信息，参数：city (string, required) - 城市名称
-2. get_time: 获取当前时间，无需参数
+{demo_registry.text_prompt()}
 
 请根据用户的问题，选择合适的工具来调用。如果你需要调用工具，请按照以下JSON格式返回：
 
@@ -42,16 +46,8 @@ system_prompt = f"""
 """
 
 
-def call_qwen_api(messages: list, tools: dict = None) -> dict:
-    """调用通义千问API"""
-    api_key = os.getenv("DASHSCOPE_API_KEY")
-    url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    # 构建请求数据
+def build_request(messages: list, tools: list = None, stream: bool = False) -> dict:
+    """构建请求数据"""
     data = {
         "model": "qwen3-max",
         "input": {
@@ -63,63 +59,49 @@ def call_qwen_api(messages: list, tools: dict = None) -> dict:
         }
     }
 
-    # 如果有工具定义，添加到请求中
+    # 如果有工具定义，添加到请求中（注册表缓存的列表，不随每次请求重建）
     if tools:
-        data["input"]["tools"] = [{
-            "type": "function",
-            "function": {
-                "name": tool_name,
-                "description": tool_desc,
-                "parameters": tool_schema
-            }
-        } for tool_name, (tool_desc, tool_schema) in tools.items()]
+        data["input"]["tools"] = tools
 
+    # 流式返回时每个事件只携带新增的内容，而不是截至目前的全部内容
+    if stream:
+        data["parameters"]["incremental_output"] = True
+    return data
+
+
+def call_qwen_api(messages: list, tools: list = None) -> dict:
+    """调用通义千问API"""
     try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        return response.json()
+        # 共享的连接池客户端：复用连接，带超时与有限次数重试
+        return dashscope_client().post_json(DASHSCOPE_GENERATION_URL, build_request(messages, tools))
     except requests.exceptions.RequestException as e:
         print(f"API请求失败: {e}")
         return {"error": str(e)}
 
 
+def stream_qwen_api(messages: list, tools: list = None) -> Iterator[dict]:
+    """以SSE方式调用通义千问API，逐个产出增量 message；请求失败时抛出 requests.exceptions.RequestException"""
+    for event in dashscope_client().stream_sse(DASHSCOPE_GENERATION_URL, build_request(messages, tools, stream=True)):
+        yield event["output"]["choices"][0]["message"]
+
+
 def execute_tool_call(tool_name: str, arguments: dict) -> str:
-    """执行工具调用"""
-    if tool_name == "get_weather":
-        city = arguments.get("city")
-        return get_weather(city)
-    elif tool_name == "get_time":
-        return get_time()
-    else:
+    """执行工具调用：在注册表中按名称分发，参数先经过校验"""
+    try:
+        return demo_registry.execute(tool_name, arguments)
+    except UnknownToolError:
         return f"未知工具: {tool_name}"
+    except ToolArgumentError as e:
+        return f"参数错误: {e}"
 
 
-def chat_with_tools(user_message: str) -> str:
-    """与带工具的助手对话"""
-    # 定义工具
-    tools = {
-        "get_weather": (
-            "获取指定城市的天气信息",
-            {
-                "type": "object",
-                "properties": {
-                    "city": {
-                        "type": "string",
-                        "description": "城市名称"
-                    }
-                },
-                "required": ["city"]
-            }
-        ),
-        "get_time": (
-            "获取当前时间",
-            {
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-        )
-    }
+def chat_with_tools(user_message: str, stream: bool = False) -> str:
+    """与带工具的助手对话
+
+    stream=True 时使用SSE流式返回，边接收边拼装 tool_calls，某个调用的参数一完整就开始执行该工具
+    """
+    if stream:
+        return chat_with_tools_stream(user_message)
 
     # 第一次调用
     print("========= 第一次调用 =========")
@@ -135,7 +117,7 @@ def chat_with_tools(user_message: str) -> str:
     ]
 
     # 调用API
-    response = call_qwen_api(messages, tools)
+    response = call_qwen_api(messages, demo_registry.schemas())
 
     if "error" in response:
         return f"API调用失败: {response['error']}"
@@ -157,21 +139,15 @@ def chat_with_tools(user_message: str) -> str:
         # 如果有工具调用
         if tool_calls:
             print("\n=== 工具调用 ===")
-            tool_results = []
-            tool_call_ids = []
+            # 为每个工具调用创建ID，结果按同样的顺序与ID配对
+            tool_call_ids = [function.get("id", f"call_{i}") for i, function in enumerate(tool_calls)]
 
-            # 修改工具调用的处理方式
-            for i, function in enumerate(tool_calls):
-                tool_name = function["name"]
-                arguments = function["arguments"]
-
-                print(f"调用工具: {tool_name}")
-                # 执行工具
-                result = execute_tool_call(tool_name, arguments)
-                print(f"执行结果: {result}")
-                tool_results.append(result)
-                # 为每个工具调用创建ID
-                tool_call_ids.append(f"call_{i}")
+            # 多个工具并发执行，每个工具有独立的超时
+            for function in tool_calls:
+                print(f"调用工具: {function['name']}")
+            tool_results = dispatch_tool_calls(tool_calls, execute_tool_call, timeout=TOOL_TIMEOUT)
+            for function, result in zip(tool_calls, tool_results):
+                print(f"{function['name']} 执行结果: {result}")
 
             # 将工具调用结果添加到消息历史 - 使用正确的格式
             tool_calls_formatted = []
@@ -213,13 +189,108 @@ def chat_with_tools(user_message: str) -> str:
         return f"解析响应失败: {e}"
 
 
-def main():
+def chat_with_tools_stream(user_message: str) -> str:
+    """流式版本：原生 tool_calls 的参数片段一闭合就提交执行，模型还在输出后续调用时前面的工具已经在跑"""
+    print("========= 第一次调用（流式） =========")
+    messages = [
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        {
+            "role": "user",
+            "content": user_message
+        }
+    ]
+
+    assembler = ToolCallAssembler()
+    started = []
+    futures = []
+    content_parts = []
+
+    def start(calls: list):
+        for call in calls:
+            print(f"参数已完整，开始执行工具: {call['name']} {call['arguments']}")
+            started.append(call)
+            futures.append(submit_tool_call(call, execute_tool_call))
+
+    try:
+        for message in stream_qwen_api(messages, demo_registry.schemas()):
+            content_parts.append(message.get("content") or "")
+            start(assembler.feed(message.get("tool_calls")))
+        start(assembler.close())
+    except requests.exceptions.RequestException as e:
+        return f"API调用失败: {e}"
+    except (KeyError, IndexError) as e:
+        return f"解析响应失败: {e}"
+
+    content = "".join(content_parts)
+    print(f"第一次返回调用结果: {content}")
+
+    tool_calls = assembler.calls()
+    if tool_calls:
+        # 超时从流结束时起算，提前开始的工具只会多得到时间
+        deadline = time.monotonic() + TOOL_TIMEOUT
+        tool_results = collect_results(started, futures, deadline, TOOL_TIMEOUT)
+        results_by_id = {call["id"]: result for call, result in zip(started, tool_results)}
+        tool_results = [results_by_id[call["id"]] for call in tool_calls]
+    else:
+        # 模型没有使用原生 tool_calls 时，按提示词约定从正文JSON中解析，流结束后再统一执行
+        try:
+            tool_calls = json.loads(content).get("tool_calls", [])
+        except (json.JSONDecodeError, AttributeError):
+            tool_calls = []
+        for i, function in enumerate(tool_calls):
+            function.setdefault("id", f"call_{i}")
+        tool_results = dispatch_tool_calls(tool_calls, execute_tool_call, timeout=TOOL_TIMEOUT)
+
+    if not tool_calls:
+        return content
+
+    print("\n=== 工具调用 ===")
+    for function, result in zip(tool_calls, tool_results):
+        print(f"{function['name']} 执行结果: {result}")
+
+    messages.append({
+        "role": "assistant",
+        "content": "",
+        "tool_calls": [{
+            "id": function["id"],
+            "type": "function",
+            "function": {
+                "name": function["name"],
+                "arguments": json.dumps(function["arguments"])
+            }
+        } for function in tool_calls]
+    })
+    for function, result in zip(tool_calls, tool_results):
+        messages.append({
+            "role": "tool",
+            "content": result,
+            "tool_call_id": function["id"]
+        })
+
+    # 最终回答也流式输出
+    print("\n=== 生成最终回答 ===")
+    final_parts = []
+    try:
+        for message in stream_qwen_api(messages):
+            delta = message.get("content") or ""
+            final_parts.append(delta)
+            print(delta, end="", flush=True)
+    except requests.exceptions.RequestException as e:
+        return f"API调用失败: {e}"
+    print()
+    return "".join(final_parts)
+
+
+def main(stream: bool = False):
     """主函数"""
     print("=== JSON Schema Function Calling 示例 ===\n")
     # 测试问题
     question = "请告诉我北京天气和当前时间"
-    print(chat_with_tools(question))
+    print(chat_with_tools(question, stream=stream))
 
 
 if __name__ == "__main__":
-    main()
+    main(stream="--stream" in sys.argv)
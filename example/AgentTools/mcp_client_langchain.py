@@ -21,10 +21,14 @@ import os
 
 from dotenv import load_dotenv
 from langchain.messages import HumanMessage
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_openai import ChatOpenAI
 from langchain.agents import create_agent
 
+from example.common.mcp_session_pool import MCPSessionPool
+from example.common.mcp_tool_cache import MCPToolSchemaCache
+from example.common.tool_cache import ToolResultCache
+from example.common.tool_cache_middleware import ToolResultCacheMiddleware
+
 load_dotenv()
 
 
@@ -32,7 +36,8 @@ class MCPLangChainClient:
     """
     使用LangChain官方适配器的MCP客户端
     
-    这个类封装了MultiServerMCPClient，提供更友好的接口
+    这个类封装了MultiServerMCPClient，提供更友好的接口；
+    每个MCP服务器保持一个常驻会话（MCPSessionPool），多次chat复用，不会每次工具调用都重新启动 mcp_server.py
     """
 
     def __init__(self):
@@ -66,11 +71,14 @@ class MCPLangChainClient:
             }
         }
 
-        # 创建MultiServerMCPClient
-        self.client = MultiServerMCPClient(server_config)
+        # 创建会话池：本地服务只启动一次子进程，HTTP服务复用同一个会话
+        # 工具定义优先读磁盘缓存并在后台校验，单个服务器慢或不可用不会阻塞其他服务器
+        self.client = MCPSessionPool(server_config, discovery_timeout=10.0, tool_cache=MCPToolSchemaCache())
 
-        # 获取所有MCP服务器的工具
-        self.tools = await self.client.get_tools()
+        # 并发获取所有MCP服务器的工具，工具调用走池中的常驻会话
+        time_tools, weather_tools = await asyncio.gather(self.client.get_tools("time-service"),
+                                                         self.client.get_tools("weather-service"))
+        self.tools = time_tools + weather_tools
         print(f"成功加载 {len(self.tools)} 个工具")
 
         # 打印工具列表
@@ -82,8 +90,13 @@ class MCPLangChainClient:
                          base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
                          model="qwen3-max")
 
+        # 工具结果缓存只对明确列出的工具生效：天气10分钟内相同城市不再请求上游，时区列表不随时间变化；
+        # 读取当前时间的工具（get_current_time、get_current_time_batch、compare_timezones）不缓存，避免返回过期时间
+        cacheable = [tool.name for tool in weather_tools] + ["get_timezone_list"]
+        cache = ToolResultCache(default_ttl=600.0)
+
         # 创建ReAct Agent
-        self.agent = create_agent(llm, self.tools)
+        self.agent = create_agent(llm, self.tools, middleware=[ToolResultCacheMiddleware(cache, tools=cacheable)])
 
     async def chat(self, message: str) -> str:
         """
@@ -113,9 +126,11 @@ class MCPLangChainClient:
     async def cleanup(self):
         """清理资源"""
         if self.client:
-            # 关闭所有MCP连接
-            # MultiServerMCPClient会自动管理连接
+            # 关闭所有MCP会话，stdio子进程随之退出
             print("关闭MCP连接...")
+            await self.client.close()
+            self.client = None
+            self.agent = None
 
 
 async def example_combined_query():
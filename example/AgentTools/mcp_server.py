@@ -5,10 +5,13 @@
 提供工具(tools)、资源(resources)功能。
 
 主要功能：
-1. 查询当前时间的工具（支持不同时区和格式）
-2. 时区列表查询和时区对比
+1. 查询当前时间的工具（支持不同时区和格式，批量版本一次查询多个时区）
+2. 时区列表查询（分页）和时区对比
 3. 服务器信息资源（通过URI访问）
 
+时区列表按名称排序，地区前缀在有序列表上二分查找并缓存结果，时区对象按名称缓存，请求时不再线性扫描全部时区。
+压测：uv run python -m example.AgentTools.bench_mcp_server
+
 运行方式：
     # 使用stdio传输（默认，用于与AI客户端通信）
     python mcp_server.py
@@ -20,8 +23,10 @@
     python mcp_server.py --transport streamable-http --port 8000
 """
 
-from datetime import datetime
-from typing import Any, Literal
+import bisect
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Literal, Tuple
 
 import pytz
 from mcp.server.fastmcp import FastMCP
@@ -29,6 +34,44 @@ from mcp.server.fastmcp import FastMCP
 # 创建FastMCP服务器实例
 mcp = FastMCP[Any]("Time Service")
 
+# 时区列表默认每页数量与上限
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# 有序时区列表，任意前缀都可以二分查找出连续区间
+SORTED_TIMEZONES: List[str] = sorted(pytz.all_timezones)
+
+
+@lru_cache(maxsize=1024)
+def timezones_with_prefix(region: str) -> Tuple[str, ...]:
+    """按字符串前缀筛选时区（与 str.startswith 相同，如 'America/Indiana' 也匹配 'America/Indianapolis'）
+
+    有序列表中前缀相同的时区是连续区间，二分找到起点后向后扫描；结果按地区缓存
+    """
+    start = bisect.bisect_left(SORTED_TIMEZONES, region)
+    end = start
+    while end < len(SORTED_TIMEZONES) and SORTED_TIMEZONES[end].startswith(region):
+        end += 1
+    return tuple(SORTED_TIMEZONES[start:end])
+
+
+@lru_cache(maxsize=1024)
+def get_tz(name: str):
+    """按名称缓存时区对象；未知时区抛出异常，不会进入缓存
+
+    pytz 查找不区分大小写，同一时区的不同写法各占一个缓存项，因此限制缓存大小（时区总数约600个）
+    """
+    return pytz.timezone(name)
+
+
+def format_time(now: datetime, format: str) -> str:
+    """按格式输出时间"""
+    if format == "readable":
+        return now.strftime("%Y年%m月%d日 %H:%M:%S %Z")
+    elif format == "timestamp":
+        return str(int(now.timestamp()))
+    return now.isoformat()
+
 
 @mcp.tool()
 def get_current_time(
@@ -50,49 +93,70 @@ def get_current_time(
     """
     try:
         # 获取指定时区
-        tz = pytz.timezone(timezone)
+        tz = get_tz(timezone)
         now = datetime.now(tz)
 
         # 根据格式返回不同的时间表示
-        if format == "iso":
-            return now.isoformat()
-        elif format == "readable":
-            return now.strftime("%Y年%m月%d日 %H:%M:%S %Z")
-        elif format == "timestamp":
-            return str(int(now.timestamp()))
-        else:
-            return now.isoformat()
+        return format_time(now, format)
     except Exception as e:
         return f"错误: {str(e)}"
 
 
 @mcp.tool()
-def get_timezone_list(region: str = "all") -> str:
+def get_current_time_batch(
+        timezones: List[str],
+        format: Literal["iso", "readable", "timestamp"] = "iso"
+) -> List[Dict[str, str]]:
     """
-    获取可用的时区列表
+    批量获取多个时区的当前时间，一次调用代替多次 get_current_time
+    
+    Args:
+        timezones: 时区列表，例如 ['UTC', 'Asia/Shanghai', 'America/New_York']
+        format: 返回格式，同 get_current_time
+    
+    Returns:
+        与输入顺序一致的结果列表，每项为 {"timezone", "time"}，时区无效时为 {"timezone", "error"}
+    """
+    # 所有时区基于同一时刻换算，结果之间没有时间差
+    now = datetime.now(dt_timezone.utc)
+    results = []
+    for name in timezones:
+        try:
+            results.append({"timezone": name, "time": format_time(now.astimezone(get_tz(name)), format)})
+        except Exception as e:
+            results.append({"timezone": name, "error": f"错误: {str(e)}"})
+    return results
+
+
+@mcp.tool()
+def get_timezone_list(region: str = "all", offset: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> str:
+    """
+    获取可用的时区列表（分页）
     
     Args:
         region: 地区筛选，如 'Asia', 'America', 'Europe' 或 'all' (默认)
+        offset: 从第几个时区开始返回，默认0
+        limit: 每页数量，默认50，最多500
     
     Returns:
         时区列表的字符串表示
     """
     try:
-        all_timezones = pytz.all_timezones
-
         if region.lower() == "all":
-            timezones = all_timezones
+            timezones = SORTED_TIMEZONES
         else:
             # 按地区筛选
-            timezones = [tz for tz in all_timezones if tz.startswith(region)]
+            timezones = timezones_with_prefix(region)
 
-        # 限制返回数量，避免过长
-        max_display = 50
-        if len(timezones) > max_display:
-            result = "\n".join(timezones[:max_display])
-            result += f"\n... (共 {len(timezones)} 个时区，仅显示前 {max_display} 个)"
-        else:
-            result = "\n".join(timezones)
+        offset = max(offset, 0)
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        page = timezones[offset:offset + limit]
+        result = "\n".join(page)
+
+        # 还有下一页时提示如何继续获取
+        end = offset + len(page)
+        if end < len(timezones):
+            result += f"\n... (共 {len(timezones)} 个时区，当前第 {offset + 1}-{end} 个，使用 offset={end} 获取下一页)"
 
         return result
     except Exception as e:
@@ -112,8 +176,8 @@ def compare_timezones(timezone1: str, timezone2: str) -> str:
         两个时区的时间对比结果
     """
     try:
-        tz1 = pytz.timezone(timezone1)
-        tz2 = pytz.timezone(timezone2)
+        tz1 = get_tz(timezone1)
+        tz2 = get_tz(timezone2)
 
         now1 = datetime.now(tz1)
         now2 = datetime.now(tz2)
@@ -183,11 +247,13 @@ def main():
     print(f"Time Service MCP Server 启动中...")
     print(f"传输方式: {args.transport}")
     if args.transport == "streamable-http":
-        print(f"访问地址: http://localhost:{args.port}/mcp_tools")
+        print(f"访问地址: http://localhost:{args.port}{mcp.settings.streamable_http_path}")
 
     # 运行服务器
     if args.transport == "streamable-http":
-        mcp.run(transport="streamable-http", port=args.port)
+        # 端口通过 settings 设置，run() 不接受 port 参数
+        mcp.settings.port = args.port
+        mcp.run(transport="streamable-http")
     else:
         # stdio模式下不打印到stdout，避免干扰MCP协议通信
         mcp.run()
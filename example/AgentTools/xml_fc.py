@@ -2,33 +2,34 @@
 """
 通过XML格式来提示工具的使用，实现 FunctionCalling
 """
+import html
 import json
-import os
+import sys
 from dotenv import load_dotenv
 load_dotenv()
 
 import requests
-from datetime import datetime
 import re
+import time
+from itertools import groupby
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
 
+from example.common.demo_tools import demo_registry
+from example.common.http_client import DASHSCOPE_GENERATION_URL, dashscope_client
+from example.common.tool_dispatch import collect_results, dispatch_tool_calls, submit_tool_call
+from example.common.tool_registry import ToolArgumentError, UnknownToolError
 
-def get_weather(city: str) -> str:
-    """获取指定城市的天气信息"""
-    return f"{city}的天气是晴天，温度为25度。"
-
-
-def get_time() -> str:
-    """获取当前时间"""
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# 单个工具的执行超时（秒）
+TOOL_TIMEOUT = 10.0
 
 
 # 构造XML格式的提示词
-system_prompt = """
+system_prompt = f"""
 你是一个专业的人工智能助手，你会根据用户的问题来解答。你可以借助工具来辅助你生成答案。
 
 工具定义：
-1. get_weather: 获取指定城市的天气信息，参数：city (string, required) - 城市名称
-2. get_time: 获取当前时间，无需参数
+{demo_registry.xml_prompt()}
 
 请根据用户的问题，选择合适的工具来调用。如果你需要调用工具，请按照以下XML格式返回：
 
@@ -46,16 +47,8 @@ system_prompt = """
 """
 
 
-def call_qwen_api(messages: list) -> dict:
-    """调用通义千问API"""
-    api_key = os.getenv("DASHSCOPE_API_KEY")
-    url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    # 构建请求数据
+def build_request(messages: list, stream: bool = False) -> dict:
+    """构建请求数据"""
     data = {
         "model": "qwen3-max",
         "input": {
@@ -66,62 +59,259 @@ def call_qwen_api(messages: list) -> dict:
             "temperature": 0.7
         }
     }
+    # 流式返回时每个事件只携带新增的内容，而不是截至目前的全部内容
+    if stream:
+        data["parameters"]["incremental_output"] = True
+    return data
+
 
+def call_qwen_api(messages: list) -> dict:
+    """调用通义千问API"""
     try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        return response.json()
+        # 共享的连接池客户端：复用连接，带超时与有限次数重试
+        return dashscope_client().post_json(DASHSCOPE_GENERATION_URL, build_request(messages))
     except requests.exceptions.RequestException as e:
         print(f"API请求失败: {e}")
         return {"error": str(e)}
 
 
-def parse_xml_tool_calls(content: str) -> list:
-    """解析XML格式的工具调用"""
-    tool_calls = []
-
-    # 使用正则表达式解析XML
-    # 匹配 <tool_calls> 标签内的内容
-    tool_calls_match = re.search(r'<tool_calls>(.*?)</tool_calls>', content, re.DOTALL)
-    if not tool_calls_match:
-        return tool_calls
-
-    tool_calls_content = tool_calls_match.group(1)
-
-    # 匹配所有 <invoke> 标签
-    invoke_pattern = r'<invoke name="([^"]+)">(.*?)</invoke>'
-    invoke_matches = re.findall(invoke_pattern, tool_calls_content, re.DOTALL)
-
-    for tool_name, params_content in invoke_matches:
-        # 解析参数
-        param_pattern = r'<parameter name="([^"]+)">([^<]*)</parameter>'
-        param_matches = re.findall(param_pattern, params_content, re.DOTALL)
+def stream_qwen_api(messages: list) -> Iterator[str]:
+    """以SSE方式调用通义千问API，逐个产出增量文本；请求失败时抛出 requests.exceptions.RequestException"""
+    for event in dashscope_client().stream_sse(DASHSCOPE_GENERATION_URL, build_request(messages, stream=True)):
+        yield event["output"]["choices"][0]["message"].get("content") or ""
+
+
+class StreamingXmlToolCallParser:
+    """增量解析 <tool_calls> 块的状态机，每个 <invoke> 一闭合就产出对应的工具调用
+
+    参数值中可以出现 <（只有 </parameter> 才结束参数），支持 <![CDATA[...]]> 原样保留，
+    以及 &lt; &amp; &#60; 等实体转义。每次 feed 只扫描新到的文本和上次留下的未完成标签，整体为线性时间。
+    """
+
+    # 解析状态
+    TEXT = "text"          # <tool_calls> 之前的普通文本
+    BLOCK = "block"        # <tool_calls> 内、<invoke> 之间
+    INVOKE = "invoke"      # <invoke> 内、<parameter> 之间
+    PARAMETER = "parameter"  # 参数值
+    CDATA = "cdata"        # 参数值中的 CDATA 段
+    DONE = "done"          # 已读到 </tool_calls>
+
+    TOOL_CALLS_START = "<tool_calls>"
+    TOOL_CALLS_END = "</tool_calls>"
+    INVOKE_END = "</invoke>"
+    PARAMETER_END = "</parameter>"
+    CDATA_START = "<![CDATA["
+    CDATA_END = "]]>"
+    OPEN_TAG_PATTERN = re.compile(r'<(invoke|parameter)\s+name\s*=\s*(["\'])(.*?)\2\s*>', re.DOTALL)
+
+    def __init__(self):
+        self.state = self.TEXT
+        self._buffer = ""
+        self._invoke_name = ""
+        self._arguments: Dict[str, str] = {}
+        self._parameter_name = ""
+        # 当前参数值的片段：(文本, 是否为CDATA)
+        self._value_parts: List[Tuple[str, bool]] = []
+        self._scanners = {
+            self.TEXT: self._scan_text,
+            self.BLOCK: self._scan_block,
+            self.INVOKE: self._scan_invoke,
+            self.PARAMETER: self._scan_parameter,
+            self.CDATA: self._scan_cdata,
+        }
 
-        arguments = {}
-        for param_name, param_value in param_matches:
-            arguments[param_name] = param_value.strip()
+    @property
+    def finished(self) -> bool:
+        """是否已读到 </tool_calls>"""
+        return self.state == self.DONE
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """接收一段增量文本，返回本次新闭合的工具调用 {"name", "arguments"}"""
+        if self.state == self.DONE:
+            return []
+        self._buffer += chunk
+        ready = []
+        pos = 0
+        while pos < len(self._buffer) and self.state != self.DONE:
+            next_pos = self._scanners[self.state](pos, ready)
+            if next_pos is None:
+                break
+            pos = next_pos
+        self._buffer = self._buffer[pos:] if self.state != self.DONE else ""
+        return ready
+
+    def close(self) -> List[Dict[str, Any]]:
+        """输入结束；未闭合的 <invoke> 参数不完整，直接丢弃"""
+        self._buffer = ""
+        return []
+
+    # 以下 _scan_* 方法从 pos 开始扫描，返回推进后的位置；返回 None 表示需要等待更多输入
+
+    @staticmethod
+    def _advance(pos: int, new_pos: int) -> Optional[int]:
+        return new_pos if new_pos > pos else None
+
+    def _scan_text(self, pos: int, ready: list) -> Optional[int]:
+        start = self._buffer.find(self.TOOL_CALLS_START, pos)
+        if start < 0:
+            # 丢弃前面的普通文本，只保留可能是 <tool_calls> 前缀的尾部
+            return self._advance(pos, len(self._buffer) - len(self.TOOL_CALLS_START) + 1)
+        self.state = self.BLOCK
+        return start + len(self.TOOL_CALLS_START)
+
+    def _scan_block(self, pos: int, ready: list) -> Optional[int]:
+        tag_start = self._buffer.find("<", pos)
+        if tag_start < 0:
+            return len(self._buffer)
+        if self._buffer.startswith(self.TOOL_CALLS_END, tag_start):
+            self.state = self.DONE
+            return tag_start + len(self.TOOL_CALLS_END)
+        return self._scan_open_tag(pos, tag_start, "invoke", self.TOOL_CALLS_END)
+
+    def _scan_invoke(self, pos: int, ready: list) -> Optional[int]:
+        tag_start = self._buffer.find("<", pos)
+        if tag_start < 0:
+            return len(self._buffer)
+        if self._buffer.startswith(self.INVOKE_END, tag_start):
+            ready.append({"name": self._invoke_name, "arguments": self._arguments})
+            self._arguments = {}
+            self.state = self.BLOCK
+            return tag_start + len(self.INVOKE_END)
+        return self._scan_open_tag(pos, tag_start, "parameter", self.INVOKE_END)
+
+    def _scan_open_tag(self, pos: int, tag_start: int, tag: str, end_tag: str) -> Optional[int]:
+        """在 tag_start 处识别 <invoke name="..."> 或 <parameter name="...">；不认识的标签跳过"""
+        tag_end = self._buffer.find(">", tag_start)
+        if tag_end < 0:
+            rest = self._buffer[tag_start:]
+            opening = f"<{tag}"
+            if end_tag.startswith(rest) or rest.startswith(opening) or opening.startswith(rest):
+                # 标签还没收完，等待更多输入
+                return self._advance(pos, tag_start)
+            return tag_start + 1
+        match = self.OPEN_TAG_PATTERN.match(self._buffer, tag_start, tag_end + 1)
+        if not match or match.group(1) != tag:
+            return tag_start + 1
+        name = html.unescape(match.group(3))
+        if tag == "invoke":
+            self._invoke_name = name
+            self.state = self.INVOKE
+        else:
+            self._parameter_name = name
+            self._value_parts = []
+            self.state = self.PARAMETER
+        return match.end()
+
+    def _scan_parameter(self, pos: int, ready: list) -> Optional[int]:
+        buffer = self._buffer
+        search = pos
+        while True:
+            tag_start = buffer.find("<", search)
+            if tag_start < 0:
+                self._append_value(buffer[pos:], False)
+                return len(buffer)
+            if buffer.startswith(self.PARAMETER_END, tag_start):
+                self._append_value(buffer[pos:tag_start], False)
+                self._arguments[self._parameter_name] = self._finish_value()
+                self.state = self.INVOKE
+                return tag_start + len(self.PARAMETER_END)
+            if buffer.startswith(self.CDATA_START, tag_start):
+                self._append_value(buffer[pos:tag_start], False)
+                self.state = self.CDATA
+                return tag_start + len(self.CDATA_START)
+            if len(buffer) - tag_start < len(self.PARAMETER_END):
+                rest = buffer[tag_start:]
+                if self.PARAMETER_END.startswith(rest) or self.CDATA_START.startswith(rest):
+                    # 可能是被切开的结束标签或CDATA开头，先收下前面的文本
+                    self._append_value(buffer[pos:tag_start], False)
+                    return self._advance(pos, tag_start)
+            # 参数值中普通的 <，属于值的一部分
+            search = tag_start + 1
+
+    def _scan_cdata(self, pos: int, ready: list) -> Optional[int]:
+        end = self._buffer.find(self.CDATA_END, pos)
+        if end < 0:
+            # 保留可能是 ]]> 前缀的尾部
+            keep_from = max(pos, len(self._buffer) - len(self.CDATA_END) + 1)
+            self._append_value(self._buffer[pos:keep_from], True)
+            return self._advance(pos, keep_from)
+        self._append_value(self._buffer[pos:end], True)
+        self.state = self.PARAMETER
+        return end + len(self.CDATA_END)
+
+    def _append_value(self, text: str, is_cdata: bool):
+        if text:
+            self._value_parts.append((text, is_cdata))
+
+    def _finish_value(self) -> str:
+        """拼接参数值：普通文本做实体反转义，CDATA原样保留；首尾空白只去掉普通文本部分的"""
+        value_parts = self._value_parts
+        self._value_parts = []
+        # 常见情况：整个值是一段普通文本
+        if len(value_parts) == 1 and not value_parts[0][1]:
+            return html.unescape(value_parts[0][0]).strip()
+        # 相邻的同类片段先合并，实体可能被切在两个片段之间
+        parts = [("".join(text for text, _ in group), is_cdata)
+                 for is_cdata, group in groupby(value_parts, key=lambda part: part[1])]
+        parts = [(text if is_cdata else html.unescape(text), is_cdata) for text, is_cdata in parts]
+        if parts and not parts[0][1]:
+            parts[0] = (parts[0][0].lstrip(), False)
+        if parts and not parts[-1][1]:
+            parts[-1] = (parts[-1][0].rstrip(), False)
+        return "".join(text for text, _ in parts)
 
-        tool_calls.append({
-            "name": tool_name,
-            "arguments": arguments
-        })
 
+def parse_xml_tool_calls(content: str) -> list:
+    """解析XML格式的工具调用"""
+    parser = StreamingXmlToolCallParser()
+    tool_calls = parser.feed(content)
+    parser.close()
     return tool_calls
 
 
 def execute_tool_call(tool_name: str, arguments: dict) -> str:
-    """执行工具调用"""
-    if tool_name == "get_weather":
-        city = arguments.get("city")
-        return get_weather(city)
-    elif tool_name == "get_time":
-        return get_time()
-    else:
+    """执行工具调用：在注册表中按名称分发，参数先经过校验"""
+    try:
+        return demo_registry.execute(tool_name, arguments)
+    except UnknownToolError:
         return f"未知工具: {tool_name}"
+    except ToolArgumentError as e:
+        return f"参数错误: {e}"
 
 
-def chat_with_xml_tools(user_message: str) -> str:
-    """与XML格式工具的助手对话"""
+def stream_tool_calls(messages: list) -> Tuple[str, list, list]:
+    """流式接收回复：每个 <invoke> 一闭合就提交执行，</tool_calls> 出现后立即断开连接
+
+    返回 (回复文本, 工具调用列表, 与之一一对应的 Future 列表)
+    """
+    parser = StreamingXmlToolCallParser()
+    parts = []
+    tool_calls = []
+    futures = []
+    stream = stream_qwen_api(messages)
+    try:
+        for delta in stream:
+            parts.append(delta)
+            for call in parser.feed(delta):
+                print(f"<invoke> 已闭合，开始执行工具: {call['name']} {call['arguments']}")
+                tool_calls.append(call)
+                futures.append(submit_tool_call(call, execute_tool_call))
+            if parser.finished:
+                break
+    finally:
+        stream.close()
+    content = "".join(parts)
+    end = content.find(parser.TOOL_CALLS_END)
+    if end >= 0:
+        content = content[:end + len(parser.TOOL_CALLS_END)]
+    return content, tool_calls, futures
+
+
+def chat_with_xml_tools(user_message: str, stream: bool = False) -> str:
+    """与XML格式工具的助手对话
+
+    stream=True 时使用SSE流式返回，每个 <invoke> 一闭合就开始执行对应工具，工具调用块结束后停止接收
+    """
     # 第一次调用
     print("========= 第一次调用 =========")
     messages = [
@@ -135,50 +325,46 @@ def chat_with_xml_tools(user_message: str) -> str:
         }
     ]
 
-    # 调用API
-    response = call_qwen_api(messages)
-
-    if "error" in response:
-        return f"API调用失败: {response['error']}"
-
-    # 解析响应
+    # 调用API并解析响应
     try:
-        message = response["output"]["choices"][0]["message"]
-        content = message.get("content", "")
+        if stream:
+            try:
+                content, tool_calls, futures = stream_tool_calls(messages)
+            except requests.exceptions.RequestException as e:
+                return f"API调用失败: {e}"
+        else:
+            response = call_qwen_api(messages)
+            if "error" in response:
+                return f"API调用失败: {response['error']}"
+            message = response["output"]["choices"][0]["message"]
+            content = message.get("content", "")
+            # 解析XML格式的工具调用
+            tool_calls = parse_xml_tool_calls(content)
 
         print(f"第一次返回调用结果: {content}")
 
-        # 解析XML格式的工具调用
-        tool_calls = parse_xml_tool_calls(content)
-
         # 如果有工具调用
         if tool_calls:
             print("\n=== 工具调用 ===")
-            tool_results = []
-            tool_call_ids = []
-
-            # 处理每个工具调用
-            for i, function in enumerate(tool_calls):
-                tool_name = function["name"]
-                arguments = function["arguments"]
-
-                print(f"调用工具: {tool_name}")
-                print(f"调用参数: {arguments}")
-
-                # 执行工具
-                result = execute_tool_call(tool_name, arguments)
-                print(f"执行结果: {result}")
-                tool_results.append(result)
-                # 为每个工具调用创建ID
-                tool_call_ids.append(f"call_{i}")
+            # 多个工具并发执行，每个工具有独立的超时，结果按调用顺序返回
+            for function in tool_calls:
+                print(f"调用工具: {function['name']}")
+                print(f"调用参数: {function['arguments']}")
+            if stream:
+                # 工具已在流式接收时提交，超时从流结束时起算
+                tool_results = collect_results(tool_calls, futures, time.monotonic() + TOOL_TIMEOUT, TOOL_TIMEOUT)
+            else:
+                tool_results = dispatch_tool_calls(tool_calls, execute_tool_call, timeout=TOOL_TIMEOUT)
+            for function, result in zip(tool_calls, tool_results):
+                print(f"{function['name']} 执行结果: {result}")
 
             # 将工具调用结果添加到消息历史
-            # 由于使用XML格式，我们需要构造一个assistant消息来表示工具调用
+            # 由于使用XML格式，我们需要构造一个assistant消息来表示工具调用；名称和参数值需要转义
             tool_calls_text = f"<tool_calls>\n"
             for i, function in enumerate(tool_calls):
-                tool_calls_text += f'    <invoke name="{function["name"]}">\n'
+                tool_calls_text += f'    <invoke name={quoteattr(function["name"])}>\n'
                 for param_name, param_value in function["arguments"].items():
-                    tool_calls_text += f'        <parameter name="{param_name}">{param_value}</parameter>\n'
+                    tool_calls_text += f'        <parameter name={quoteattr(param_name)}>{escape(str(param_value))}</parameter>\n'
                 tool_calls_text += f"    </invoke>\n"
             tool_calls_text += "</tool_calls>"
 
@@ -196,6 +382,8 @@ def chat_with_xml_tools(user_message: str) -> str:
 
             # 再次调用API获取最终回答
             print("\n=== 生成最终回答 ===")
+            if stream:
+                return stream_final_answer(messages)
             final_response = call_qwen_api(messages)
             if "error" not in final_response:
                 final_content = final_response["output"]["choices"][0]["message"]["content"]
@@ -208,13 +396,26 @@ def chat_with_xml_tools(user_message: str) -> str:
         return f"解析响应失败: {e}"
 
 
-def main():
+def stream_final_answer(messages: list) -> str:
+    """流式输出最终回答"""
+    parts = []
+    try:
+        for delta in stream_qwen_api(messages):
+            parts.append(delta)
+            print(delta, end="", flush=True)
+    except requests.exceptions.RequestException as e:
+        return f"API调用失败: {e}"
+    print()
+    return "".join(parts)
+
+
+def main(stream: bool = False):
     """主函数"""
     print("=== XML Function Calling 示例 ===\n")
     # 测试问题
     question = "请告诉我北京天气和当前时间"
-    print(chat_with_xml_tools(question))
+    print(chat_with_xml_tools(question, stream=stream))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(stream="--stream" in sys.argv)
\ No newline at end of file
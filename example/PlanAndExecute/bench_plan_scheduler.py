@@ -0,0 +1,92 @@
+"""
+计划调度基准测试 - 在合成计划上对比逐轮扫描调度与入度计数(Kahn)调度
+运行: uv run python -m example.PlanAndExecute.bench_plan_scheduler
+"""
+import logging
+import random
+import time
+from typing import List
+
+from example.PlanAndExecute.classics_plan_execute import (
+    DependencyGraph,
+    ExecutionPlan,
+    PlanAndExecuteAgent,
+    Task,
+    TaskStatus,
+)
+
+# 基准测试中关闭逐任务的INFO日志，避免日志开销掩盖调度开销
+logging.getLogger("example.PlanAndExecute.classics_plan_execute").setLevel(logging.WARNING)
+
+PLAN_SIZES = [10, 1_000, 100_000]
+# 逐轮扫描是 O(n²·d)，超过该规模不再运行
+LEGACY_MAX_SIZE = 1_000
+MAX_DEPENDENCIES = 3
+
+
+class NoopToolExecutor:
+    """不做任何事的工具执行器，只测量调度本身"""
+
+    def execute(self, tool_name: str, tool_input: str) -> str:
+        return "ok"
+
+
+def make_plan(size: int, seed: int = 42) -> List[Task]:
+    """生成合成计划：每个任务随机依赖至多 MAX_DEPENDENCIES 个更早的任务，任务顺序随机打乱"""
+    rng = random.Random(seed)
+    tasks = []
+    for task_id in range(1, size + 1):
+        dep_count = min(task_id - 1, rng.randint(0, MAX_DEPENDENCIES))
+        dependencies = rng.sample(range(1, task_id), dep_count) if dep_count else []
+        tasks.append(Task(id=task_id, description=f"任务{task_id}", tool_name="calculate",
+                          tool_input="1+1", dependencies=dependencies))
+    # 模板生成的计划不保证按拓扑序排列
+    rng.shuffle(tasks)
+    return tasks
+
+
+def legacy_schedule(tasks: List[Task]) -> int:
+    """原先的调度方式：每轮重新扫描全部任务，依赖检查基于列表"""
+    completed = []
+    while len(completed) < len(tasks):
+        progress_made = False
+        for task in tasks:
+            if task.status in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
+                continue
+            if all(dep_id in completed for dep_id in task.dependencies):
+                task.status = TaskStatus.COMPLETED
+                completed.append(task.id)
+                progress_made = True
+        if not progress_made:
+            break
+    return len(completed)
+
+
+def main():
+    agent = PlanAndExecuteAgent(llm=None)
+    agent.tool_executor = NoopToolExecutor()
+
+    print(f"{'任务数':>8} | {'逐轮扫描(s)':>12} | {'构建依赖图(s)':>12} | {'入度计数执行(s)':>12}")
+    for size in PLAN_SIZES:
+        legacy_cost = "-"
+        if size <= LEGACY_MAX_SIZE:
+            tasks = make_plan(size)
+            start = time.perf_counter()
+            legacy_schedule(tasks)
+            legacy_cost = f"{time.perf_counter() - start:.4f}"
+
+        tasks = make_plan(size)
+        start = time.perf_counter()
+        DependencyGraph(tasks)
+        graph_cost = time.perf_counter() - start
+
+        start = time.perf_counter()
+        agent._execute_plan(ExecutionPlan(goal="benchmark", tasks=tasks))
+        kahn_cost = time.perf_counter() - start
+        assert all(task.status == TaskStatus.COMPLETED for task in tasks)
+
+        print(f"{size:>8} | {legacy_cost:>12} | {graph_cost:>12.4f} | {kahn_cost:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,17 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
+from example.common.safe_math import CalculationError, default_calculator
+from example.common.tool_cache import default_tool_cache
+from example.common.tool_registry import ToolRegistry
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -59,15 +65,18 @@ class ExecutionPlan:
 
 
 class MockToolExecutor:
-    """模拟工具执行器"""
+    """模拟工具执行器：工具注册在 ToolRegistry 中，按名称 O(1) 分发"""
 
     def __init__(self):
-        self.tools = {
-            "search_market_data": self._search_market_data,
-            "calculate": self._calculate,
-            "query_user_profile": self._query_user_profile,
-            "analyze_investment": self._analyze_investment,
-        }
+        self.registry = ToolRegistry()
+        # 行情和用户画像在同一会话内会被反复查询，结果经过工具结果缓存
+        cache = default_tool_cache()
+        self.registry.register(cache.cached(self._search_market_data, name="search_market_data"),
+                               name="search_market_data", params={"query": "查询内容"})
+        self.registry.register(self._calculate, name="calculate", params={"expression": "数学表达式"})
+        self.registry.register(cache.cached(self._query_user_profile, name="query_user_profile"),
+                               name="query_user_profile", params={"user_id": "用户ID"})
+        self.registry.register(self._analyze_investment, name="analyze_investment", params={"params": "分析参数"})
 
     def _search_market_data(self, query: str) -> str:
         """搜索市场数据"""
@@ -82,9 +91,9 @@ class MockToolExecutor:
         """数学计算"""
         logger.info(f"进行计算，计算公式: {expression}")
         try:
-            if not all(c in set('0123456789+-*/(). ') for c in expression):
-                return "错误: 非法字符"
-            return f"{eval(expression)}"
+            return f"{default_calculator.evaluate(expression)}"
+        except CalculationError as e:
+            return f"错误: {e}"
         except Exception as e:
             return f"计算错误: {str(e)}"
 
@@ -101,70 +110,228 @@ class MockToolExecutor:
     # 统一外部调用入口
     def execute(self, tool_name: str, tool_input: str) -> str:
         """执行工具"""
-        if tool_name in self.tools:
-            return self.tools[tool_name](tool_input)
+        if tool_name in self.registry:
+            return self.registry.execute_text(tool_name, tool_input)
         return f"错误: 未知工具 '{tool_name}'"
 
 
 class PlanParser:
     """计划解析器"""
 
+    @staticmethod
+    def parse_line(line: str) -> Optional[Task]:
+        """解析单行计划文本，格式: <任务编号>. [<工具名>] <任务描述>|<工具输入>|依赖: <编号>"""
+        line = line.strip()
+        # 检查行是否以数字和点开始（例如："1."、"2."等）
+        if not line or not re.match(r'^\d+\.', line):
+            return None
+        # 如果行是空的或者不匹配这种模式，则跳过该行
+        task_match = re.match(r'^(\d+)\.\s*\[(\w+)\]\s*(.*)', line)
+        if not task_match:
+            return None
+        # 任务id
+        task_id = int(task_match.group(1))
+        # 工具名称
+        tool_name = task_match.group(2).strip()
+        # 任务描述
+        rest_content = task_match.group(3).strip()
+        # 将剩余内容按竖线"|"分割成多个部分 "描述|输入参数"
+        parts = rest_content.split('|')
+
+        if len(parts) < 2:
+            return None
+
+        description = parts[0].strip()
+        tool_input = parts[1].strip()
+        dependencies = []
+
+        # 检查依赖任务
+        if len(parts) > 2 and '依赖' in parts[2]:
+            dep_match = re.search(r'依赖[:\s：]*([\d,\s]+)', parts[2])
+            if dep_match:
+                dep_str = dep_match.group(1).strip()
+                dependencies = [int(d.strip()) for d in dep_str.split(',') if d.strip().isdigit()]
+
+        return Task(
+            id=task_id,
+            description=description,
+            tool_name=tool_name,
+            tool_input=tool_input,
+            dependencies=dependencies
+        )
+
     @staticmethod
     def parse_plan(content: str) -> List[Task]:
         """解析计划文本，提取任务列表"""
         tasks = []
-        lines = content.strip().split('\n')
+        for line in content.strip().split('\n'):
+            task = PlanParser.parse_line(line)
+            if task:
+                tasks.append(task)
 
-        # <任务编号>. [<工具名>] <任务描述>|<工具输入>
-        for line in lines:
-            # 检查行是否以数字和点开始（例如："1."、"2."等）
-            if not line.strip() or not re.match(r'^\d+\.', line.strip()):
-                continue
-            # 如果行是空的或者不匹配这种模式，则跳过该行
-            task_match = re.match(r'^(\d+)\.\s*\[(\w+)\]\s*(.*)', line.strip())
-            if not task_match:
-                continue
-            # 任务id
-            task_id = int(task_match.group(1))
-            # 工具名称
-            tool_name = task_match.group(2).strip()
-            # 任务描述
-            rest_content = task_match.group(3).strip()
-            # 将剩余内容按竖线"|"分割成多个部分 "描述|输入参数"
-            parts = rest_content.split('|')
-            
-            if len(parts) < 2:
-                continue
-            
-            description = parts[0].strip()
-            tool_input = parts[1].strip()
-            dependencies = []
-
-            # 检查依赖任务
-            if len(parts) > 2 and '依赖' in parts[2]:
-                dep_match = re.search(r'依赖[:\s：]*([\d,\s]+)', parts[2])
-                if dep_match:
-                    dep_str = dep_match.group(1).strip()
-                    dependencies = [int(d.strip()) for d in dep_str.split(',') if d.strip().isdigit()]
-            
-            tasks.append(Task(
-                id=task_id,
-                description=description,
-                tool_name=tool_name,
-                tool_input=tool_input,
-                dependencies=dependencies
-            ))
-        
         logger.info(f"解析到 {len(tasks)} 个任务")
         return tasks
 
 
+class StreamingPlanParser:
+    """流式计划解析器：逐块接收LLM输出，每凑齐一行就立即解析出任务"""
+
+    def __init__(self):
+        self._buffer = ""
+        self._chunks: List[str] = []
+
+    @property
+    def text(self) -> str:
+        """目前接收到的完整计划文本"""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> List[Task]:
+        """接收一个文本块，返回其中已完整的行解析出的任务"""
+        self._chunks.append(chunk)
+        self._buffer += chunk
+        if '\n' not in chunk:
+            return []
+        # 最后一段可能是未写完的行，留到下一块继续拼接
+        *lines, self._buffer = self._buffer.split('\n')
+        return [task for task in map(PlanParser.parse_line, lines) if task]
+
+    def close(self) -> List[Task]:
+        """流结束，解析缓冲区中剩余的最后一行"""
+        line, self._buffer = self._buffer, ""
+        task = PlanParser.parse_line(line)
+        return [task] if task else []
+
+
+class DependencyGraph:
+    """任务依赖图：一次性构建入度表和后继表，并提前检查悬空依赖与循环依赖"""
+
+    def __init__(self, tasks: List[Task]):
+        self.tasks: Dict[int, Task] = {}
+        self.indegree: Dict[int, int] = {}
+        self.dependents: Dict[int, List[int]] = {}
+        # 无法执行的任务ID -> 原因
+        self.invalid: Dict[int, str] = {}
+        self._build(tasks)
+
+    def _build(self, tasks: List[Task]):
+        """构建依赖图，时间复杂度 O(任务数 + 依赖数)"""
+        for task in tasks:
+            if task.id in self.tasks:
+                logger.warning(f"任务编号重复，忽略任务: {task}")
+                task.status = TaskStatus.FAILED
+                task.result = "失败: 任务编号重复"
+                continue
+            self.tasks[task.id] = task
+            self.indegree[task.id] = 0
+            self.dependents[task.id] = []
+
+        for task in self.tasks.values():
+            # 去重，避免"依赖: 1,1"重复计入入度
+            dependencies = list(dict.fromkeys(task.dependencies))
+            missing = [dep_id for dep_id in dependencies if dep_id not in self.tasks]
+            if missing:
+                self.invalid[task.id] = f"依赖任务不存在: {missing}"
+            for dep_id in dependencies:
+                if dep_id in self.tasks:
+                    self.dependents[dep_id].append(task.id)
+                    self.indegree[task.id] += 1
+
+        # Kahn算法试运行：无法排入拓扑序的任务都处在循环依赖链上
+        remaining = dict(self.indegree)
+        ready = deque(task_id for task_id, degree in remaining.items() if degree == 0)
+        visited = set()
+        while ready:
+            task_id = ready.popleft()
+            visited.add(task_id)
+            for child_id in self.dependents[task_id]:
+                remaining[child_id] -= 1
+                if remaining[child_id] == 0:
+                    ready.append(child_id)
+        for task_id in self.tasks:
+            if task_id not in visited:
+                self.invalid.setdefault(task_id, "依赖链中存在循环")
+
+    def initial_ready(self) -> List[int]:
+        """返回没有前置依赖且有效的任务ID"""
+        return [task_id for task_id, degree in self.indegree.items()
+                if degree == 0 and task_id not in self.invalid]
+
+
+class IncrementalScheduler:
+    """增量调度器：任务可陆续加入，依赖全部完成后立即提交到线程池执行
+
+    每个任务维护未完成依赖的计数（即入度），任务完成时只递减其后继的计数，
+    整体开销为 O(任务数 + 依赖数)。依赖的任务可以晚于依赖方加入（流式计划）。
+    """
+
+    def __init__(self, pool: ThreadPoolExecutor, execute_fn: Callable[[Task, Dict[str, Any]], str]):
+        self._pool = pool
+        self._execute_fn = execute_fn
+        # 完成回调可能在提交线程中同步触发，因此使用可重入锁
+        self._lock = threading.RLock()
+        self._idle = threading.Condition(self._lock)
+        self.tasks: Dict[int, Task] = {}
+        self._pending_deps: Dict[int, int] = {}
+        self._waiters: Dict[int, List[int]] = {}
+        self._completed = set()
+        self._running = 0
+        self.context: Dict[str, Any] = {}
+
+    def add(self, task: Task):
+        """加入一个任务；若依赖已全部完成则立即执行"""
+        with self._lock:
+            if task.id in self.tasks:
+                logger.warning(f"任务编号重复，忽略任务: {task}")
+                task.status = TaskStatus.FAILED
+                task.result = "失败: 任务编号重复"
+                return
+            self.tasks[task.id] = task
+            waiting = [dep_id for dep_id in dict.fromkeys(task.dependencies) if dep_id not in self._completed]
+            self._pending_deps[task.id] = len(waiting)
+            for dep_id in waiting:
+                self._waiters.setdefault(dep_id, []).append(task.id)
+            if not waiting:
+                self._submit(task)
+
+    def join(self):
+        """等待所有已提交的任务执行完毕"""
+        with self._idle:
+            while self._running:
+                self._idle.wait()
+
+    def _submit(self, task: Task):
+        try:
+            future = self._pool.submit(self._execute_fn, task, self.context)
+        except RuntimeError:
+            # 规划中途出错时线程池已在关闭，完成回调不能再提交后继任务
+            logger.warning(f"执行已中止，任务未执行: {task}")
+            task.status = TaskStatus.FAILED
+            task.result = "失败: 执行已中止"
+            return
+        self._running += 1
+        future.add_done_callback(lambda f, t=task: self._on_done(t, f))
+
+    def _on_done(self, task: Task, future: Future):
+        with self._lock:
+            self._running -= 1
+            self.context[f"task_{task.id}"] = future.result()
+            if task.status == TaskStatus.COMPLETED:
+                self._completed.add(task.id)
+                for child_id in self._waiters.pop(task.id, []):
+                    self._pending_deps[child_id] -= 1
+                    if self._pending_deps[child_id] == 0:
+                        self._submit(self.tasks[child_id])
+            self._idle.notify_all()
+
+
 class PlanAndExecuteAgent:
     """Plan-and-Execute智能体"""
 
-    def __init__(self, llm: ChatOpenAI, max_replanning: int = 2):
+    def __init__(self, llm: ChatOpenAI, max_replanning: int = 2, max_workers: int = 8):
         self.llm = llm
         self.max_replanning = max_replanning
+        # 并发执行就绪任务的线程数，依赖满足的任务立即提交（工具多为I/O型调用）
+        self.max_workers = max_workers
         self.tool_executor = MockToolExecutor()
         self.plan_parser = PlanParser()
         
@@ -221,13 +388,58 @@ class PlanAndExecuteAgent:
             task.result = f"失败: {str(e)}"
             return task.result
 
-    def _can_execute_task(self, task: Task, completed: List[int]) -> bool:
-        """检查任务依赖是否满足"""
-        # 没有依赖任务
-        if not task.dependencies:
-            return True
-        # 所有依赖任务都已经完成
-        return all(dep_id in completed for dep_id in task.dependencies)
+    def _execute_plan(self, plan: ExecutionPlan) -> Dict[str, Any]:
+        """按入度计数调度执行计划：任务的依赖全部完成后立即提交到线程池并发执行"""
+        graph = DependencyGraph(plan.tasks)
+        self._fail_invalid_tasks(graph)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            scheduler = IncrementalScheduler(pool, self._execute_task)
+            for task in graph.tasks.values():
+                if task.id not in graph.invalid:
+                    scheduler.add(task)
+            scheduler.join()
+
+        self._warn_blocked_tasks(plan)
+        return scheduler.context
+
+    def _create_and_execute_plan_streaming(self, goal: str) -> ExecutionPlan:
+        """流式规划：边接收LLM输出边解析任务，依赖已满足的任务立即开始执行"""
+        messages = [SystemMessage(content=self.planner_prompt), HumanMessage(content=goal)]
+        parser = StreamingPlanParser()
+        plan = ExecutionPlan(goal=goal, tasks=[])
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            scheduler = IncrementalScheduler(pool, self._execute_task)
+            for chunk in self.llm.stream(messages):
+                for task in parser.feed(chunk.content):
+                    logger.info(f"解析到任务 {task.id}: {task.description}")
+                    plan.tasks.append(task)
+                    scheduler.add(task)
+            for task in parser.close():
+                plan.tasks.append(task)
+                scheduler.add(task)
+            logger.info(f"生成投资计划 :\n{parser.text}")
+
+            # 计划完整后再检查悬空依赖与循环依赖，这些任务此时必然仍未执行
+            self._fail_invalid_tasks(DependencyGraph(list(scheduler.tasks.values())))
+            scheduler.join()
+
+        self._warn_blocked_tasks(plan)
+        return plan
+
+    def _fail_invalid_tasks(self, graph: DependencyGraph):
+        """将存在悬空依赖或循环依赖的任务标记为失败"""
+        for task_id, reason in graph.invalid.items():
+            task = graph.tasks[task_id]
+            logger.error(f"任务 {task_id} 无法执行: {reason}")
+            task.status = TaskStatus.FAILED
+            task.result = f"失败: {reason}"
+
+    def _warn_blocked_tasks(self, plan: ExecutionPlan):
+        blocked = [task.id for task in plan.tasks if task.status == TaskStatus.PENDING]
+        if blocked:
+            logger.warning(f"无法继续执行，未执行的任务: {blocked}")
 
     def _synthesize_answer(self, plan: ExecutionPlan) -> str:
         """综合任务结果生成最终答案"""
@@ -246,37 +458,23 @@ class PlanAndExecuteAgent:
         response = self.llm.invoke(messages)
         return response.content
 
-    def run(self, goal: str) -> str:
-        """运行Plan-and-Execute流程"""
+    def run(self, goal: str, stream: bool = False) -> str:
+        """运行Plan-and-Execute流程
+
+        stream=True 时规划与执行重叠：计划每生成一行就解析出任务并尽早执行
+        """
         logger.info(f"要解决的问题: {goal}")
-        
+
+        if stream:
+            plan = self._create_and_execute_plan_streaming(goal)
+            return self._synthesize_answer(plan)
+
         # 阶段1: 制定计划
         plan = self._create_plan(goal)
         
         # 阶段2: 执行计划
         logger.info(f"开始执行计划{plan}")
-        completed_tasks = []
-        context = {}
-        
-        while len(completed_tasks) < len(plan.tasks):
-            progress_made = False
-            
-            for task in plan.tasks:
-                if task.status in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
-                    continue
-                
-                if self._can_execute_task(task, completed_tasks):
-                    result = self._execute_task(task, context)
-                    context[f"task_{task.id}"] = result
-                    
-                    if task.status == TaskStatus.COMPLETED:
-                        completed_tasks.append(task.id)
-                    
-                    progress_made = True
-            
-            if not progress_made:
-                logger.warning("无法继续执行")
-                break
+        self._execute_plan(plan)
         return self._synthesize_answer(plan)
 
 
@@ -17,6 +17,7 @@ from langchain_core.tools import tool
 
 from langchain_experimental.plan_and_execute import PlanAndExecute, load_chat_planner, load_agent_executor
 from langchain_openai import ChatOpenAI
+from example.common.safe_math import CalculationError, default_calculator
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -45,9 +46,9 @@ def calculate(expression: str) -> str:
     """数学计算"""
     logger.info(f"进行计算，计算公式: {expression}")
     try:
-        if not all(c in set('0123456789+-*/(). ') for c in expression):
-            return "错误: 非法字符"
-        return f"{eval(expression)}"
+        return f"{default_calculator.evaluate(expression)}"
+    except CalculationError as e:
+        return f"错误: {e}"
     except Exception as e:
         return f"计算错误: {str(e)}"
 
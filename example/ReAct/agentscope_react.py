@@ -10,6 +10,8 @@ from agentscope.formatter import DashScopeChatFormatter
 from agentscope.memory import InMemoryMemory
 from agentscope.tool import Toolkit, ToolResponse
 from agentscope.message import Msg, TextBlock
+from example.common.safe_math import CalculationError, default_calculator
+from example.common.search_index import default_search_index
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -26,20 +28,8 @@ def search_web(query: str) -> ToolResponse:
     """搜索工具"""
     logger.info(f"执行搜索: {query}")
 
-    # 模拟搜索结果，实际应用中应该调用真实的搜索API
-    search_data = {
-        "黄金": "根据最新市场数据，今日黄金价格约为1159元/克（24K金），投资金条价格约为1080元/克。",
-        "gold": "Current gold price is approximately $65 per gram (24K), investment gold bars around $63 per gram."
-    }
-
-    # 改进的关键词匹配逻辑
-    query_lower = query.lower()
-    # 简单的关键词匹配
-    text = ''
-    for key, value in search_data.items():
-        if key in query_lower:
-            text = value
-            break
+    results = default_search_index().search(query, top_k=1)
+    text = results[0].text if results else ''
 
     return ToolResponse(
         content=[
@@ -56,16 +46,13 @@ def calculate(expression: str) -> str:
     logger.info(f"执行计算: {expression}")
 
     try:
-        # 只允许数字、基本运算符和括号
-        allowed_chars = set('0123456789+-*/(). ')
-        if not all(c in allowed_chars for c in expression):
-            text = "错误：表达式包含非法字符，只能使用数字和基本运算符(+-*/.)"
-
-        result = eval(expression)
+        result = default_calculator.evaluate(expression)
         text = f"计算结果：{result}"
 
     except ZeroDivisionError:
         text = "错误：除数不能为零"
+    except CalculationError as e:
+        text = f"错误：{e}"
     except Exception as e:
         text = f"计算错误：{str(e)}"
 
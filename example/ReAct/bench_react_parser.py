@@ -0,0 +1,69 @@
+"""
+ReActParser 微基准测试 - 对比原先的三次惰性正则解析与单次扫描解析（1KB ~ 1MB 响应）
+运行: uv run python -m example.ReAct.bench_react_parser
+"""
+import re
+import timeit
+from typing import Any, Dict
+
+from example.ReAct.classics_react import ActionType, ReActParser
+
+RESPONSE_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def legacy_parse_response(content: str) -> Dict[str, Any]:
+    """原先的解析方式：三次带前瞻的惰性 DOTALL 正则，再按 '(' 切分动作"""
+    result = {"thought": "", "action": "", "action_type": ActionType.UNKNOWN,
+              "action_input": "", "final_answer": None}
+
+    thought_match = re.search(r'Thought:\s*(.*?)(?=\nAction:|\nFinal Answer:|$)',
+                              content, re.DOTALL | re.IGNORECASE)
+    if thought_match:
+        result["thought"] = thought_match.group(1).strip()
+
+    action_match = re.search(r'Action:\s*(.*?)(?=\nObservation:|\nThought:|\nFinal Answer:|$)',
+                             content, re.DOTALL | re.IGNORECASE)
+    if action_match:
+        action_text = action_match.group(1).strip()
+        result["action"] = action_text
+        if '(' in action_text and ')' in action_text:
+            action_parts = action_text.split('(', 1)
+            action_name = action_parts[0].strip()
+            result["action_input"] = action_parts[1].rsplit(')', 1)[0].strip('"\'')
+            if action_name == "search_web":
+                result["action_type"] = ActionType.SEARCH
+            elif action_name == "calculate":
+                result["action_type"] = ActionType.CALCULATE
+            elif action_name == "answer":
+                result["action_type"] = ActionType.ANSWER
+
+    final_answer_match = re.search(r'Final Answer:\s*(.*?)(?=\nThought:|\nAction:|$)',
+                                   content, re.DOTALL | re.IGNORECASE)
+    if final_answer_match:
+        result["final_answer"] = final_answer_match.group(1).strip()
+
+    return result
+
+
+def make_response(size: int) -> str:
+    """构造一个 Thought 很长的响应，模拟推理模型的输出"""
+    sentence = "我需要先查询当前黄金价格，再用总金额除以单价得到可购买的克数。"
+    thought = (sentence * (size // len(sentence.encode()) + 1))[:size // 3]
+    return f"Thought: {thought}\nAction: search_web(\"黄金价格\")"
+
+
+def main():
+    print(f"{'响应大小':>10} | {'原解析(ms)':>10} | {'单次扫描(ms)':>12} | {'加速比':>6}")
+    for size in RESPONSE_SIZES:
+        content = make_response(size)
+        assert legacy_parse_response(content) == ReActParser.parse_response(content)
+
+        number = max(1, 2_000_000 // size)
+        legacy_cost = timeit.timeit(lambda: legacy_parse_response(content), number=number) / number
+        new_cost = timeit.timeit(lambda: ReActParser.parse_response(content), number=number) / number
+        print(f"{len(content.encode()):>10} | {legacy_cost * 1000:>10.3f} | {new_cost * 1000:>12.3f} | "
+              f"{legacy_cost / new_cost:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
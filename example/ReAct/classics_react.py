@@ -1,17 +1,25 @@
 """
 ReAct实现 - 通过理解原理去实现，更好的理解ReAct的思想
 """
+import asyncio
+import atexit
+import json
 import logging
 import re
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
+from abc import ABC, abstractmethod
+from collections import deque
 from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from example.common.safe_math import CalculationError, default_calculator
+from example.common.search_index import default_search_index
+from example.common.tool_registry import ToolRegistry
 
 def openai_tongyi_chat_model() -> ChatOpenAI:
     return ChatOpenAI(api_key=os.getenv("DASHSCOPE_API_KEY"),
@@ -33,9 +41,9 @@ class ActionType(Enum):
     UNKNOWN = "unknown"
 
 
-@dataclass
+@dataclass(slots=True)
 class ReActStep:
-    """ReAct步骤数据结构"""
+    """ReAct步骤数据结构（使用__slots__，不为每个实例分配__dict__）"""
     thought: str
     action: str
     action_type: ActionType
@@ -43,32 +51,111 @@ class ReActStep:
     observation: str
     final_answer: Optional[str] = None
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "thought": self.thought,
+            "action": self.action,
+            "action_type": self.action_type.value,
+            "action_input": self.action_input,
+            "observation": self.observation,
+            "final_answer": self.final_answer
+        }
+
+
+class HistoryStore(ABC):
+    """对话历史存储接口"""
+
+    @abstractmethod
+    def append(self, record: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        ...
+
+    def flush(self):
+        """将缓冲中的记录写出"""
+
+    def close(self):
+        self.flush()
+
+
+class RingBufferHistoryStore(HistoryStore):
+    """内存环形缓冲：超过条数或字节上限时淘汰最早的记录，内存占用有界；最新的一条总会保留，即使它本身超过字节上限"""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 10 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # (记录, 序列化后的字节数)
+        self._records = deque()
+        self._total_bytes = 0
+
+    def append(self, record: Dict[str, Any]):
+        size = len(json.dumps(record, ensure_ascii=False).encode())
+        self._records.append((record, size))
+        self._total_bytes += size
+        while len(self._records) > 1 and (len(self._records) > self.max_entries or self._total_bytes > self.max_bytes):
+            _, evicted_size = self._records.popleft()
+            self._total_bytes -= evicted_size
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (record for record, _ in list(self._records))
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+class JsonlHistoryStore(HistoryStore):
+    """追加写入的JSONL文件：记录先在内存中攒批，满 batch_size 条后一次写入磁盘；
+    ReActAgent 每个问题结束时调用 flush，进程正常退出时也会写出剩余的记录"""
+
+    def __init__(self, path: str, batch_size: int = 100):
+        self.path = path
+        self.batch_size = batch_size
+        self._pending: List[str] = []
+        atexit.register(self.flush)
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+
+    def append(self, record: Dict[str, Any]):
+        self._pending.append(json.dumps(record, ensure_ascii=False))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(self._pending) + "\n")
+        self._pending.clear()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        for line in list(self._pending):
+            yield json.loads(line)
+
 
 class ToolExecutor:
-    """工具执行器"""
+    """工具执行器：工具注册在 ToolRegistry 中，按名称 O(1) 分发"""
 
     def __init__(self):
-        self.tools = {
-            "search_web": self._search_web,
-            "calculate": self._calculate
-        }
+        self.registry = ToolRegistry()
+        self.registry.register(self._search_web, name="search_web", params={"query": "搜索关键词"})
+        self.registry.register(self._calculate, name="calculate", params={"expression": "数学表达式"})
 
     def _search_web(self, query: str) -> str:
         """搜索工具"""
         logger.info(f"执行搜索: {query}")
 
-        # 模拟搜索结果，实际应用中应该调用真实的搜索API
-        search_data = {
-            "黄金": "根据最新市场数据，今日黄金价格约为1159元/克（24K金），投资金条价格约为1080元/克。",
-            "gold": "Current gold price is approximately $65 per gram (24K), investment gold bars around $63 per gram."
-        }
-
-        # 改进的关键词匹配逻辑
-        query_lower = query.lower()
-        # 简单的关键词匹配
-        for key, value in search_data.items():
-            if key in query_lower:
-                return value
+        results = default_search_index().search(query, top_k=1)
+        if results:
+            return results[0].text
 
         return f"未找到关于'{query}'的相关信息，建议尝试其他关键词。"
 
@@ -77,33 +164,96 @@ class ToolExecutor:
         logger.info(f"执行计算: {expression}")
 
         try:
-            # 只允许数字、基本运算符和括号
-            allowed_chars = set('0123456789+-*/(). ')
-            if not all(c in allowed_chars for c in expression):
-                return "错误：表达式包含非法字符，只能使用数字和基本运算符(+-*/.)"
-
-            result = eval(expression)
+            result = default_calculator.evaluate(expression)
             return f"计算结果：{result}"
 
         except ZeroDivisionError:
             return "错误：除数不能为零"
+        except CalculationError as e:
+            return f"错误：{e}"
         except Exception as e:
             return f"计算错误：{str(e)}"
 
     def execute(self, action: str, action_input: str) -> str:
         """执行工具"""
-        if action in self.tools:
+        if action in self.registry:
             logger.info(f"执行工具：{action} 参数: {action_input}")
-            return self.tools[action](action_input)
+            return self.registry.execute_text(action, action_input)
         else:
             return f"未知工具：{action}"
 
 
+class AsyncToolExecutor:
+    """异步工具执行器：同步工具在线程中运行，同一轮的多个Action并发执行"""
+
+    def __init__(self, tool_executor: Optional[ToolExecutor] = None):
+        self.tool_executor = tool_executor or ToolExecutor()
+
+    async def execute(self, action: str, action_input: str) -> str:
+        """执行单个工具"""
+        return await asyncio.to_thread(self.tool_executor.execute, action, action_input)
+
+    async def execute_all(self, calls: List[Tuple[str, str]]) -> List[str]:
+        """并发执行多个工具调用，按调用顺序返回结果"""
+        results = await asyncio.gather(
+            *(self.execute(action, action_input) for action, action_input in calls),
+            return_exceptions=True
+        )
+        return [f"工具执行错误：{result}" if isinstance(result, Exception) else result for result in results]
+
+
 class ReActParser:
-    """ReAct响应解析器"""
+    """ReAct响应解析器：单次扫描提取 Thought / Action / Final Answer"""
+
+    # 所有段落标记预编译为一个正则，扫描一遍响应即可得到各段的起止位置。
+    # 以字符集开头便于正则引擎快速跳过不可能是标记首字符的位置（长Thought多为中文）；
+    # 匹配以换行开头表示"行首标记"，只有行首标记才能结束前一个段落
+    MARKER_PATTERN = re.compile(
+        r'[\nTtAaFfOo](?:(?<=\n)(?i:thought|action|final answer|observation)'
+        r'|(?i:(?<=t)hought|(?<=a)ction|(?<=f)inal answer|(?<=o)bservation)):'
+    )
+    # 每个段落遇到哪些"行首标记"时结束
+    SECTION_TERMINATORS = {
+        "thought": ("action", "final answer"),
+        "action": ("observation", "thought", "final answer"),
+        "final answer": ("thought", "action"),
+    }
+    ACTION_TYPES = {
+        ActionType.SEARCH.value: ActionType.SEARCH,
+        ActionType.CALCULATE.value: ActionType.CALCULATE,
+        ActionType.ANSWER.value: ActionType.ANSWER,
+    }
 
     @staticmethod
-    def parse_response(content: str) -> Dict[str, Any]:
+    def marker_of(match: re.Match) -> Tuple[str, bool]:
+        """返回标记名称（小写）以及它是否位于行首"""
+        token = match.group(0)
+        return token.lstrip('\n')[:-1].lower(), token[0] == '\n'
+
+    @classmethod
+    def split_sections(cls, content: str) -> Dict[str, str]:
+        """单次扫描，返回每种段落第一次出现时的内容"""
+        starts: Dict[str, int] = {}
+        sections: Dict[str, str] = {}
+
+        for match in cls.MARKER_PATTERN.finditer(content):
+            marker, at_line_start = cls.marker_of(match)
+            # 行首标记会结束所有以它为终止符、仍未结束的段落
+            if at_line_start:
+                for name in [name for name in starts if name not in sections]:
+                    if marker in cls.SECTION_TERMINATORS[name]:
+                        sections[name] = content[starts[name]:match.start()].strip()
+            if marker in cls.SECTION_TERMINATORS and marker not in starts:
+                starts[marker] = match.end()
+
+        # 没有遇到终止符的段落一直延续到文本末尾
+        for name, start in starts.items():
+            if name not in sections:
+                sections[name] = content[start:].strip()
+        return sections
+
+    @classmethod
+    def parse_response(cls, content: str) -> Dict[str, Any]:
         """解析LLM响应内容"""
         result = {
             "thought": "",
@@ -113,52 +263,242 @@ class ReActParser:
             "final_answer": None
         }
 
-        # 提取思考过程
-        thought_pattern = r'Thought:\s*(.*?)(?=\nAction:|\nFinal Answer:|$)'
-        thought_match = re.search(thought_pattern, content, re.DOTALL | re.IGNORECASE)
-        if thought_match:
-            result["thought"] = thought_match.group(1).strip()
-
-        # 提取动作
-        action_pattern = r'Action:\s*(.*?)(?=\nObservation:|\nThought:|\nFinal Answer:|$)'
-        action_match = re.search(action_pattern, content, re.DOTALL | re.IGNORECASE)
-        if action_match:
-            action_text = action_match.group(1).strip()
-            result["action"] = action_text
-
-            # 解析动作类型和输入
-            if '(' in action_text and ')' in action_text:
-                action_parts = action_text.split('(', 1)
-                action_name = action_parts[0].strip()
-                action_input = action_parts[1].rsplit(')', 1)[0].strip('"\'')
-
-                result["action_input"] = action_input
-
-                if action_name == "search_web":
-                    result["action_type"] = ActionType.SEARCH
-                elif action_name == "calculate":
-                    result["action_type"] = ActionType.CALCULATE
-                elif action_name == "answer":
-                    result["action_type"] = ActionType.ANSWER
-
-        # 提取最终答案
-        final_answer_pattern = r'Final Answer:\s*(.*?)(?=\nThought:|\nAction:|$)'
-        final_answer_match = re.search(final_answer_pattern, content, re.DOTALL | re.IGNORECASE)
-        if final_answer_match:
-            result["final_answer"] = final_answer_match.group(1).strip()
+        sections = cls.split_sections(content)
+        result["thought"] = sections.get("thought", "")
+        result["final_answer"] = sections.get("final answer")
+
+        action_text = sections.get("action")
+        if action_text:
+            result.update(cls.parse_action(action_text))
 
         return result
 
+    @classmethod
+    def parse_action(cls, action_text: str) -> Dict[str, Any]:
+        """解析动作文本 tool_name(args)，得到动作类型和输入"""
+        result = {"action": action_text, "action_type": ActionType.UNKNOWN, "action_input": ""}
+        open_index = action_text.find('(')
+        close_index = action_text.rfind(')')
+        if open_index != -1 and close_index != -1:
+            action_name = action_text[:open_index].strip()
+            end = close_index if close_index > open_index else len(action_text)
+            result["action_input"] = action_text[open_index + 1:end].strip('"\'')
+            result["action_type"] = cls.ACTION_TYPES.get(action_name, ActionType.UNKNOWN)
+        return result
+
+    @classmethod
+    def parse_actions(cls, content: str) -> List[Dict[str, Any]]:
+        """提取响应中的所有Action（一轮多个动作），每个Action到下一个行首标记为止"""
+        actions = []
+        action_start = None
+        for match in cls.MARKER_PATTERN.finditer(content):
+            marker, at_line_start = cls.marker_of(match)
+            if action_start is not None and at_line_start:
+                actions.append(content[action_start:match.start()].strip())
+                action_start = None
+            if marker == "action" and action_start is None:
+                action_start = match.end()
+        if action_start is not None:
+            actions.append(content[action_start:].strip())
+        return [cls.parse_action(action_text) for action_text in actions if action_text]
+
+
+class StreamingReActParser:
+    """流式ReAct解析器：增量接收LLM输出，判断Action行是否已经完整"""
+
+    # 最长标记 "\nfinal answer:" 的长度，回退这么多字符以防标记被切分在两个chunk之间
+    MARKER_OVERLAP = len("\nfinal answer:")
+
+    def __init__(self):
+        self._buffer = ""
+        self._scan_from = 0
+        self._action_start: Optional[int] = None
+        self._action_end: Optional[int] = None
+        self._has_final_answer = False
+
+    @property
+    def action_closed(self) -> bool:
+        return self._action_end is not None
+
+    @property
+    def text(self) -> str:
+        """已接收的文本；Action完整后截断在Action行末尾，丢弃之后的内容"""
+        if self._action_end is not None:
+            return self._buffer[:self._action_end]
+        return self._buffer
+
+    def feed(self, chunk: str) -> bool:
+        """接收一个文本块，Action行完整时返回True"""
+        self._buffer += chunk
+        if self._action_start is None and not self._has_final_answer:
+            self._scan_markers()
+        if self._action_start is not None and not self._has_final_answer:
+            self._action_end = self._find_action_end()
+        return self.action_closed
+
+    def _scan_markers(self):
+        for match in ReActParser.MARKER_PATTERN.finditer(self._buffer, self._scan_from):
+            marker, _ = ReActParser.marker_of(match)
+            if marker == "final answer":
+                # 最终答案需要完整生成，不再提前停止
+                self._has_final_answer = True
+                return
+            if marker == "action":
+                self._action_start = match.end()
+                return
+        self._scan_from = max(0, len(self._buffer) - self.MARKER_OVERLAP)
+
+    def _find_action_end(self) -> Optional[int]:
+        """Action行遇到换行或括号配平时结束，返回结束位置
+
+        引号（单引号、双引号，支持反斜杠转义）内的括号不计数；引号未闭合时括号无法配平，等到换行才结束
+        """
+        start = self._action_start
+        while start < len(self._buffer) and self._buffer[start] in ' \t':
+            start += 1
+        newline = self._buffer.find('\n', start)
+        line_end = len(self._buffer) if newline == -1 else newline
+
+        depth = 0
+        quote = None
+        escaped = False
+        for index in range(start, line_end):
+            char = self._buffer[index]
+            if quote is not None:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == quote:
+                    quote = None
+            elif char in '"\'':
+                quote = char
+            elif char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth == 0:
+                    return index + 1
+
+        if newline != -1 and self._buffer[start:newline].strip():
+            return newline
+        return None
+
+
+class IncrementalPrompt:
+    """增量构建的提示词
+
+    系统提示词和之前的轮次作为字节完全不变的前缀，新消息只追加在末尾，
+    使提供商的前缀缓存(KV-cache)尽可能命中。每次调用前统计与上次请求共享的前缀比例；
+    超过 token 预算时，一次性把较早的 Observation 压缩为简短摘要，之后前缀再次保持稳定。
+    """
+
+    OBSERVATION_PREFIX = "Observation"
+    SUMMARY_CHARS = 60
+    SUMMARY_SUFFIX = "...(已压缩)"
+
+    def __init__(self, system_prompt: str, question: str, token_budget: Optional[int] = None,
+                 keep_recent_observations: int = 2):
+        self.token_budget = token_budget
+        self.keep_recent_observations = keep_recent_observations
+        self.messages: List[Any] = []
+        # 每条消息的估算token数，只在追加时计算一次
+        self._tokens: List[int] = []
+        self._total_tokens = 0
+        # 上一次请求发送的消息对象，用于按对象身份判断前缀是否被改动
+        self._sent: List[Any] = []
+        self.hit_ratios: List[float] = []
+        self.append(SystemMessage(content=system_prompt))
+        self.append(HumanMessage(content=question))
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """粗略估算token数：中文约1字1token，英文约4字符1token"""
+        ascii_chars = sum(1 for char in text if char.isascii())
+        return (len(text) - ascii_chars) + ascii_chars // 4 + 1
+
+    def append(self, message):
+        tokens = self.estimate_tokens(message.content)
+        self.messages.append(message)
+        self._tokens.append(tokens)
+        self._total_tokens += tokens
+
+    def prepare(self) -> List[Any]:
+        """返回本次调用要发送的消息，并记录前缀缓存命中率"""
+        if self.token_budget is not None and self._total_tokens > self.token_budget:
+            self._compress_observations()
+
+        reused_tokens = 0
+        for index, message in enumerate(self._sent):
+            if index >= len(self.messages) or self.messages[index] is not message:
+                break
+            reused_tokens += self._tokens[index]
+        hit_ratio = reused_tokens / self._total_tokens if self._total_tokens else 0.0
+        self.hit_ratios.append(hit_ratio)
+        logger.info(f"提示词约 {self._total_tokens} tokens，前缀复用 {reused_tokens} tokens，命中率 {hit_ratio:.1%}")
+
+        self._sent = list(self.messages)
+        return self.messages
+
+    @property
+    def total_tokens(self) -> int:
+        return self._total_tokens
+
+    def _compress_observations(self):
+        """将除最近几条以外的Observation替换为简短摘要"""
+        observation_indexes = [
+            index for index, message in enumerate(self.messages)
+            if isinstance(message, HumanMessage) and message.content.startswith(self.OBSERVATION_PREFIX)
+        ]
+        keep = self.keep_recent_observations
+        older = observation_indexes[:-keep] if keep else observation_indexes
+        compressed = 0
+        for index in older:
+            content = self.messages[index].content
+            # 已压缩或本身足够短的不再改动，避免无谓地破坏前缀
+            if content.endswith(self.SUMMARY_SUFFIX) or len(content) <= self.SUMMARY_CHARS:
+                continue
+            summary = f"{content[:self.SUMMARY_CHARS]}{self.SUMMARY_SUFFIX}"
+            tokens = self.estimate_tokens(summary)
+            self._total_tokens += tokens - self._tokens[index]
+            self._tokens[index] = tokens
+            self.messages[index] = HumanMessage(content=summary)
+            compressed += 1
+        if compressed:
+            logger.info(f"提示词超过预算 {self.token_budget}，压缩 {compressed} 条较早的Observation后"
+                        f"约 {self._total_tokens} tokens")
+
 
 class ReActAgent:
     """ReAct智能体"""
 
-    def __init__(self, llm, max_iterations: int = 5):
+    # 异步模式追加的提示：允许一轮返回多个互不依赖的Action
+    MULTI_ACTION_PROMPT = """
+
+## 多个动作
+如果多个工具调用之间互不依赖，可以在同一轮中每行写一个Action，系统会并发执行，
+并按顺序返回 Observation 1、Observation 2 ...：
+Thought: 需要同时查询黄金和白银价格
+Action: search_web("黄金价格")
+Action: search_web("白银价格")"""
+
+    def __init__(self, llm, max_iterations: int = 5, stream: bool = False,
+                 history_store: Optional[HistoryStore] = None,
+                 token_budget: Optional[int] = None, keep_recent_observations: int = 2):
         self.llm = llm
         self.max_iterations = max_iterations
+        # 提示词超过 token_budget 后压缩较早的Observation，None表示不压缩
+        self.token_budget = token_budget
+        self.keep_recent_observations = keep_recent_observations
+        # 最近一次提问使用的提示词，可读取其前缀复用统计
+        self.last_prompt: Optional[IncrementalPrompt] = None
+        # 流式模式下Action行一结束就执行工具，并停止后续生成
+        self.stream = stream
         self.tool_executor = ToolExecutor()
+        self.async_tool_executor = AsyncToolExecutor(self.tool_executor)
         self.parser = ReActParser()
-        self.conversation_history = []
+        # 默认使用有界的内存环形缓冲，长期运行的进程不会无限增长
+        self.conversation_history = history_store if history_store is not None else RingBufferHistoryStore()
 
         # 改进的提示词
         self.system_prompt = """# ReAct智能理财助手
@@ -220,11 +560,8 @@ Action: calculate(10000/1159)
         """处理问题"""
         logger.info(f"开始处理问题: {question}")
 
-        # 初始化对话历史
-        messages = [
-            SystemMessage(content=self.system_prompt),
-            HumanMessage(content=question)
-        ]
+        # 初始化对话历史：系统提示词与历史轮次构成稳定前缀，之后只在末尾追加
+        prompt = self._new_prompt(self.system_prompt, question)
 
         # 记录每一轮解析相应结果
         steps = []
@@ -234,8 +571,10 @@ Action: calculate(10000/1159)
 
             try:
                 # 调用LLM
-                response = self.llm.invoke(messages)
-                content = response.content
+                if self.stream:
+                    content = self._stream_until_action(prompt.prepare())
+                else:
+                    content = self.llm.invoke(prompt.prepare()).content
 
                 logger.info(f"LLM响应:\n{content}")
 
@@ -274,8 +613,8 @@ Action: calculate(10000/1159)
                     logger.info(f"观察: {observation}")
 
                     # 更新消息历史
-                    messages.append(AIMessage(content=content))
-                    messages.append(HumanMessage(content=f"Observation: {observation}"))
+                    prompt.append(AIMessage(content=content))
+                    prompt.append(HumanMessage(content=f"Observation: {observation}"))
 
                     steps.append(step)
                 else:
@@ -284,7 +623,7 @@ Action: calculate(10000/1159)
                         logger.info(f"记录思考过程: {step.thought}")
                         steps.append(step)
                         # 即使没有action，也要添加消息历史以便模型继续
-                        messages.append(AIMessage(content=content))
+                        prompt.append(AIMessage(content=content))
                         # 不中断，继续下一轮迭代 - 模型应该在下轮提供Action
                     else:
                         logger.warning("无法识别的动作类型且没有思考内容")
@@ -299,23 +638,106 @@ Action: calculate(10000/1159)
         self._save_conversation_history(question, steps)
         return "抱歉，我无法在限定步骤内回答您的问题。请尝试重新表述或简化问题。"
 
+    async def aprocess_question(self, question: str) -> str:
+        """异步处理问题：一轮回复可包含多个Action，并发执行后按顺序一起返回所有Observation"""
+        logger.info(f"开始处理问题(异步): {question}")
+
+        prompt = self._new_prompt(self.system_prompt + self.MULTI_ACTION_PROMPT, question)
+        steps = []
+
+        for iteration in range(self.max_iterations):
+            logger.info(f"=== 第{iteration + 1}轮迭代 ===")
+
+            try:
+                response = await self.llm.ainvoke(prompt.prepare())
+                content = response.content
+                logger.info(f"LLM响应:\n{content}")
+
+                parsed = self.parser.parse_response(content)
+                if parsed["final_answer"]:
+                    logger.info(f"答案: {parsed['final_answer']}")
+                    steps.append(ReActStep(thought=parsed["thought"], action=parsed["action"],
+                                           action_type=parsed["action_type"], action_input=parsed["action_input"],
+                                           observation="", final_answer=parsed["final_answer"]))
+                    self._save_conversation_history(question, steps)
+                    return parsed["final_answer"]
+
+                actions = [action for action in self.parser.parse_actions(content)
+                           if action["action_type"] != ActionType.UNKNOWN]
+                if not actions:
+                    if parsed["thought"]:
+                        steps.append(ReActStep(thought=parsed["thought"], action=parsed["action"],
+                                               action_type=ActionType.UNKNOWN, action_input="", observation=""))
+                        prompt.append(AIMessage(content=content))
+                        continue
+                    logger.warning("无法识别的动作类型且没有思考内容")
+                    break
+
+                # 同一轮的多个Action并发执行，观察结果按Action顺序排列
+                observations = await self.async_tool_executor.execute_all(
+                    [(action["action_type"].value, action["action_input"]) for action in actions]
+                )
+                for action, observation in zip(actions, observations):
+                    logger.info(f"动作: {action['action']} 观察: {observation}")
+                    steps.append(ReActStep(thought=parsed["thought"], action=action["action"],
+                                           action_type=action["action_type"], action_input=action["action_input"],
+                                           observation=observation))
+
+                prompt.append(AIMessage(content=content))
+                prompt.append(HumanMessage(content=self._format_observations(observations)))
+
+            except Exception as e:
+                logger.error(f"迭代过程中出错: {str(e)}")
+                break
+
+        logger.warning("达到最大迭代次数，未能获得最终答案")
+        self._save_conversation_history(question, steps)
+        return "抱歉，我无法在限定步骤内回答您的问题。请尝试重新表述或简化问题。"
+
+    @staticmethod
+    def _format_observations(observations: List[str]) -> str:
+        """单个动作保持原格式，多个动作按顺序编号"""
+        if len(observations) == 1:
+            return f"Observation: {observations[0]}"
+        return "\n".join(f"Observation {index}: {observation}"
+                         for index, observation in enumerate(observations, 1))
+
+    def _new_prompt(self, system_prompt: str, question: str) -> "IncrementalPrompt":
+        self.last_prompt = IncrementalPrompt(system_prompt, question, token_budget=self.token_budget,
+                                             keep_recent_observations=self.keep_recent_observations)
+        return self.last_prompt
+
+    def _stream_until_action(self, messages: List) -> str:
+        """流式生成：Action行完整后立即停止生成，丢弃模型随后臆造的Observation"""
+        parser = StreamingReActParser()
+        stream = self.llm.stream(messages)
+        try:
+            for chunk in stream:
+                if parser.feed(chunk.content):
+                    logger.info("Action已完整，提前停止生成")
+                    break
+        finally:
+            stream.close()
+        return parser.text
+
     def _save_conversation_history(self, question: str, steps: List[ReActStep]):
         """保存对话历史"""
         history = {
             "question": question,
-            "steps": [
-                {
-                    "thought": step.thought,
-                    "action": step.action,
-                    "action_type": step.action_type.value,
-                    "action_input": step.action_input,
-                    "observation": step.observation,
-                    "final_answer": step.final_answer
-                }
-                for step in steps
-            ]
+            "steps": [step.to_dict() for step in steps]
         }
         self.conversation_history.append(history)
+        # 每个问题结束时落盘，进程被杀掉时最多丢失当前问题
+        self.conversation_history.flush()
+
+    def close(self):
+        self.conversation_history.close()
+
+    def __enter__(self) -> "ReActAgent":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 def main():
@@ -343,6 +765,7 @@ def main():
     logger.info("=====输出所有的对话历史====")
     for history in agent.conversation_history:
         print(f"{history}")
+    agent.close()
 
 
 
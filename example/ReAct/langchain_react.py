@@ -10,6 +10,8 @@ load_dotenv()
 from langchain.agents import create_agent
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
+from example.common.safe_math import CalculationError, default_calculator
+from example.common.search_index import default_search_index
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,18 +29,9 @@ def search_web(query: str) -> str:
     """搜索工具"""
     logger.info(f"执行搜索: {query}")
 
-    # 模拟搜索结果，实际应用中应该调用真实的搜索API
-    search_data = {
-        "黄金": "根据最新市场数据，今日黄金价格约为1159元/克（24K金），投资金条价格约为1080元/克。",
-        "gold": "Current gold price is approximately $65 per gram (24K), investment gold bars around $63 per gram."
-    }
-
-    # 改进的关键词匹配逻辑
-    query_lower = query.lower()
-    # 简单的关键词匹配
-    for key, value in search_data.items():
-        if key in query_lower:
-            return value
+    results = default_search_index().search(query, top_k=1)
+    if results:
+        return results[0].text
 
     return f"未找到关于'{query}'的相关信息，建议尝试其他关键词。"
 
@@ -48,16 +41,13 @@ def calculate( expression: str) -> str:
     logger.info(f"执行计算: {expression}")
 
     try:
-        # 只允许数字、基本运算符和括号
-        allowed_chars = set('0123456789+-*/(). ')
-        if not all(c in allowed_chars for c in expression):
-            return "错误：表达式包含非法字符，只能使用数字和基本运算符(+-*/.)"
-
-        result = eval(expression)
+        result = default_calculator.evaluate(expression)
         return f"计算结果：{result}"
 
     except ZeroDivisionError:
         return "错误：除数不能为零"
+    except CalculationError as e:
+        return f"错误：{e}"
     except Exception as e:
         return f"计算错误：{str(e)}"
 
@@ -0,0 +1,191 @@
+"""
+后台摘要中间件 - SummarizationMiddleware 在达到阈值的那一轮同步调用摘要模型，用户要等摘要生成完才能得到回复
+达到软阈值时在后台线程生成摘要，当前轮照常执行；之后某一轮摘要已完成时再一次性替换被摘要的消息；
+只有达到硬阈值时才会等待（或同步生成）摘要。
+摘要是增量的：已有摘要 + 新增消息 合并成新摘要，不会每次重新总结整个前缀
+"""
+import concurrent.futures
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from langchain.agents.middleware import AgentState, SummarizationMiddleware
+from langchain.chat_models import BaseChatModel
+from langchain_core.messages import AnyMessage, HumanMessage, RemoveMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.config import get_config
+from langgraph.runtime import Runtime
+
+logger = logging.getLogger(__name__)
+
+# 摘要消息在 additional_kwargs 中保存原始摘要文本的键，增量摘要时据此取出上一版摘要
+SUMMARY_KEY = "conversation_summary"
+
+DEFAULT_INCREMENTAL_PROMPT = """你正在维护一段对话的摘要。
+已有摘要：
+{summary}
+
+新增的对话消息：
+{messages}
+
+请把新增内容合并进已有摘要，输出更新后的完整摘要，只输出摘要本身。"""
+
+
+@dataclass
+class _SummaryJob:
+    """一次摘要任务：covered_ids 为被摘要的消息（含上一版摘要消息），按顺序是消息列表的前缀"""
+    covered_ids: List[str]
+    future: Future
+
+
+class BackgroundSummarizationMiddleware(SummarizationMiddleware):
+    """后台增量摘要中间件
+
+    token 数达到 soft_limit 时在后台生成摘要，达到 hard_limit 时阻塞等待摘要完成后再调用模型。
+    summary_prompt 用于第一次摘要（占位符 {messages}），incremental_prompt 用于已有摘要时的增量合并
+    （占位符 {summary} 与 {messages}）。
+    """
+
+    def __init__(self, model: str | BaseChatModel, soft_limit: int, hard_limit: int,
+                 messages_to_keep: int = 20, token_counter=count_tokens_approximately,
+                 incremental_prompt: str = DEFAULT_INCREMENTAL_PROMPT, max_workers: int = 4,
+                 max_threads: int = 1024, **kwargs):
+        if hard_limit < soft_limit:
+            raise ValueError("hard_limit 不能小于 soft_limit")
+        super().__init__(model, max_tokens_before_summary=soft_limit, messages_to_keep=messages_to_keep,
+                         token_counter=token_counter, **kwargs)
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.incremental_prompt = incremental_prompt
+        self.max_threads = max_threads
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary")
+        # 线程id -> 进行中或已完成、尚未替换的摘要任务
+        self._jobs: "OrderedDict[Any, _SummaryJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def before_model(self, state: AgentState, runtime: Runtime) -> dict[str, Any] | None:
+        messages = state["messages"]
+        if not messages:
+            return None
+        self._ensure_message_ids(messages)
+        thread_id = get_config().get("configurable", {}).get("thread_id")
+
+        # 1. 上一轮启动的摘要已完成：替换被摘要的消息，之后按替换后的消息继续判断阈值，仍超过软阈值时本轮就启动下一次摘要；
+        #    摘要已过期或失败则丢弃，按当前消息继续判断阈值
+        applied = None
+        job = self._get_job(thread_id)
+        if job is not None and job.future.done():
+            self._pop_job(thread_id, job)
+            applied = self._apply(job, messages)
+            if applied is not None:
+                messages = [applied["messages"][0], *messages[len(job.covered_ids):]]
+            job = None
+
+        total_tokens = self.token_counter(messages)
+        if total_tokens < self.soft_limit:
+            return applied
+
+        # 2. 达到软阈值：没有进行中的任务就在后台启动一个
+        started = False
+        if job is None:
+            job = self._start_job(thread_id, messages)
+            if job is None:
+                return applied
+            started = True
+        if total_tokens < self.hard_limit:
+            return applied
+
+        # 3. 达到硬阈值：等待摘要完成后替换；之前启动的任务等到后已过期或失败时，按当前消息重新生成一次
+        logger.info(f"线程 {thread_id} 达到硬阈值 {self.hard_limit}，等待摘要完成")
+        while True:
+            concurrent.futures.wait([job.future])
+            self._pop_job(thread_id, job)
+            update = self._apply(job, messages)
+            if update is not None:
+                return self._merge_updates(applied, update)
+            if started:
+                return applied
+            job = self._start_job(thread_id, messages)
+            if job is None:
+                return applied
+            started = True
+
+    @staticmethod
+    def _merge_updates(applied: dict[str, Any] | None, update: dict[str, Any]) -> dict[str, Any]:
+        """同一轮先后应用两次摘要：第二次摘要沿用第一次摘要消息的id，只需再删除第一次被覆盖的其余消息"""
+        if applied is None:
+            return update
+        return {"messages": [*update["messages"], *applied["messages"][1:]]}
+
+    def _start_job(self, thread_id: Any, messages: List[AnyMessage]) -> Optional[_SummaryJob]:
+        cutoff_index = self._find_safe_cutoff(messages)
+        if cutoff_index <= 0:
+            return None
+        covered = messages[:cutoff_index]
+        previous = covered[0].additional_kwargs.get(SUMMARY_KEY) if isinstance(covered[0], HumanMessage) else None
+        if previous is not None:
+            if len(covered) == 1:
+                return None
+            future = self._executor.submit(self._summarize, covered[1:], previous)
+        else:
+            future = self._executor.submit(self._summarize, covered, None)
+        job = _SummaryJob(covered_ids=[message.id for message in covered], future=future)
+        with self._lock:
+            self._jobs[thread_id] = job
+            while len(self._jobs) > self.max_threads:
+                self._jobs.popitem(last=False)
+        return job
+
+    def _get_job(self, thread_id: Any) -> Optional[_SummaryJob]:
+        with self._lock:
+            return self._jobs.get(thread_id)
+
+    def _pop_job(self, thread_id: Any, job: _SummaryJob):
+        with self._lock:
+            if self._jobs.get(thread_id) is job:
+                del self._jobs[thread_id]
+
+    def _summarize(self, new_messages: List[AnyMessage], previous: Optional[str]) -> str:
+        """生成摘要；有上一版摘要时只把新增消息合并进去。失败时抛出异常，由 _apply 放弃替换"""
+        trimmed_messages = self._trim_messages_for_summary(new_messages)
+        if previous is None:
+            prompt = self.summary_prompt.format(messages=trimmed_messages)
+        else:
+            prompt = self.incremental_prompt.format(summary=previous, messages=trimmed_messages)
+        return str(self.model.invoke(prompt).content).strip()
+
+    def _apply(self, job: _SummaryJob, messages: List[AnyMessage]) -> dict[str, Any] | None:
+        """用摘要替换被覆盖的消息
+
+        摘要消息沿用第一条被覆盖消息的id，add_messages 会原地替换它，其余被覆盖的消息按id删除，
+        因此替换在一次状态更新中完成，之后的消息保持不变。
+        """
+        covered_ids = job.covered_ids
+        if [message.id for message in messages[:len(covered_ids)]] != covered_ids:
+            # 任务启动后历史被修改过（如被裁剪），摘要已不对应当前消息，丢弃
+            logger.info("摘要对应的历史已变化，丢弃本次摘要")
+            return None
+        try:
+            summary = job.future.result()
+        except Exception as e:
+            # 摘要失败时保留原消息，由调用方按当前消息重新判断阈值、重新生成
+            logger.warning(f"生成摘要失败，保留原消息: {e}")
+            return None
+        summary_message = HumanMessage(
+            content=f"{self.summary_prefix}\n\n{summary}",
+            id=covered_ids[0],
+            additional_kwargs={SUMMARY_KEY: summary},
+        )
+        return {"messages": [summary_message, *(RemoveMessage(id=message_id) for message_id in covered_ids[1:])]}
+
+    def close(self, wait: bool = False):
+        """关闭后台线程池；wait 为 True 时等待进行中的摘要完成"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def pending_jobs(self) -> Dict[Any, bool]:
+        """各线程进行中的摘要任务是否已完成，便于观察"""
+        with self._lock:
+            return {thread_id: job.future.done() for thread_id, job in self._jobs.items()}
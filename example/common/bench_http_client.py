@@ -0,0 +1,99 @@
+"""
+HTTP客户端基准测试 - 在本地桩服务上对比"每次新建连接的 requests.post"与连接池客户端
+运行: uv run python -m example.common.bench_http_client
+注意: 本地桩服务是明文HTTP，每个新连接额外等待 HANDSHAKE_DELAY 秒，用来模拟公网上 TCP+TLS 握手的往返耗时
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from example.common.http_client import AsyncPooledHttpClient, PooledHttpClient
+
+REQUEST_COUNT = 200
+ASYNC_CONCURRENCY = 4
+# 模拟的握手耗时（秒），设为0即为纯本地回环
+HANDSHAKE_DELAY = 0.02
+RESPONSE_BODY = json.dumps({"output": {"choices": [{"message": {"role": "assistant", "content": "ok"}}]}}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """模拟 DashScope 生成接口，立即返回固定的JSON"""
+    # HTTP/1.1 才支持 keep-alive
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写出，不关闭Nagle算法时会与客户端的延迟ACK叠加出约40ms的等待
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        time.sleep(HANDSHAKE_DELAY)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE_BODY)))
+        self.end_headers()
+        self.wfile.write(RESPONSE_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_requests_post(url: str, payload: dict) -> float:
+    start = time.perf_counter()
+    for _ in range(REQUEST_COUNT):
+        response = requests.post(url, json=payload, timeout=(3.05, 60))
+        response.raise_for_status()
+        response.json()
+    return time.perf_counter() - start
+
+
+def bench_pooled(url: str, payload: dict) -> float:
+    client = PooledHttpClient()
+    start = time.perf_counter()
+    for _ in range(REQUEST_COUNT):
+        client.post_json(url, payload)
+    cost = time.perf_counter() - start
+    client.close()
+    return cost
+
+
+async def bench_async_pooled(url: str, payload: dict) -> float:
+    async with AsyncPooledHttpClient(pool_size=ASYNC_CONCURRENCY) as client:
+        semaphore = asyncio.Semaphore(ASYNC_CONCURRENCY)
+
+        async def one():
+            async with semaphore:
+                await client.post_json(url, payload)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(REQUEST_COUNT)))
+        return time.perf_counter() - start
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/generation"
+    payload = {"model": "qwen3-max", "input": {"messages": [{"role": "user", "content": "你好"}]}}
+
+    try:
+        results = [
+            ("requests.post（每次新建连接）", bench_requests_post(url, payload)),
+            ("PooledHttpClient（连接复用）", bench_pooled(url, payload)),
+            (f"AsyncPooledHttpClient（并发{ASYNC_CONCURRENCY}）", asyncio.run(bench_async_pooled(url, payload))),
+        ]
+    finally:
+        server.shutdown()
+
+    print(f"{REQUEST_COUNT} 次请求")
+    for name, cost in results:
+        print(f"{name:<36} 总耗时 {cost:.3f}s  平均 {cost / REQUEST_COUNT * 1000:.2f}ms/次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+长期记忆存储基准测试 - 在百万条数据上对比 InMemoryStore 的逐条扫描过滤与 IndexedStore 的索引过滤
+数据平均分布在 --users 个用户命名空间 (user_id, "memories") 中，查询包括：单个用户命名空间内按城市等值过滤、
+按用户前缀 (user_id,) 过滤、按时间范围过滤
+运行: uv run python -m example.common.bench_indexed_store [--items 1000000] [--users 100] [--sqlite]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from langgraph.store.base import PutOp
+from langgraph.store.memory import InMemoryStore
+
+from example.common.indexed_store import IndexedStore
+
+CITIES = [f"city-{i}" for i in range(300)]
+QUERIES = 2000
+# InMemoryStore 每次查询都要扫描全部数据，只跑少量查询
+SCAN_QUERIES = 5
+BATCH = 10_000
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def fill(store, items: int, users: int):
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for offset in range(0, items, BATCH):
+        store.batch([
+            PutOp(namespace=(f"user-{i % users}", "memories"), key=f"m{i}",
+                  value={"city": rng.choice(CITIES), "time": rng.randint(0, 10_000_000), "content": f"记忆 {i}"})
+            for i in range(offset, min(items, offset + BATCH))
+        ])
+    return time.perf_counter() - start
+
+
+def make_queries(count: int, users: int) -> List[Tuple[Tuple[str, ...], Dict[str, Any]]]:
+    rng = random.Random(1)
+    queries = []
+    for i in range(count):
+        user = f"user-{rng.randrange(users)}"
+        kind = i % 3
+        if kind == 0:
+            queries.append(((user, "memories"), {"city": rng.choice(CITIES)}))
+        elif kind == 1:
+            queries.append(((user,), {"city": rng.choice(CITIES)}))
+        else:
+            low = rng.randint(0, 10_000_000)
+            queries.append(((user, "memories"), {"time": {"$gte": low, "$lt": low + 5_000}}))
+    return queries
+
+
+def run_queries(name: str, store, queries) -> List[List[Tuple[Tuple[str, ...], str]]]:
+    """执行查询并打印延迟分位数，返回每个查询结果的 (命名空间, 键) 列表，用于核对两种实现的结果完全一致"""
+    latencies = []
+    results = []
+    for prefix, filter in queries:
+        start = time.perf_counter()
+        result = store.search(prefix, filter=filter, limit=10)
+        latencies.append(time.perf_counter() - start)
+        results.append([(item.namespace, item.key) for item in result])
+    latencies.sort()
+    print(f"  {name}: {len(queries)} 次过滤查询，p50 {percentile(latencies, 0.5) * 1000:.3f} ms，"
+          f"p99 {percentile(latencies, 0.99) * 1000:.3f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100, help="用户命名空间个数，设为1即所有数据在同一个命名空间")
+    parser.add_argument("--sqlite", action="store_true", help="IndexedStore 同时持久化到临时SQLite文件")
+    args = parser.parse_args()
+
+    queries = make_queries(QUERIES, args.users)
+
+    baseline = InMemoryStore()
+    print(f"InMemoryStore 写入 {args.items} 条: {fill(baseline, args.items, args.users):.1f} 秒")
+    expected = run_queries("InMemoryStore", baseline, queries[:SCAN_QUERIES])
+    del baseline
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "store.sqlite") if args.sqlite else None
+        store = IndexedStore(filter_fields=["city", "time"], path=path)
+        print(f"IndexedStore 写入 {args.items} 条{'（SQLite）' if path else ''}: {fill(store, args.items, args.users):.1f} 秒")
+        results = run_queries("IndexedStore", store, queries)
+        assert results[:SCAN_QUERIES] == expected
+        if path:
+            store.close()
+            start = time.perf_counter()
+            reloaded = IndexedStore(filter_fields=["city", "time"], path=path)
+            print(f"  从SQLite加载并重建索引: {time.perf_counter() - start:.1f} 秒")
+            assert run_queries("IndexedStore（重新加载）", reloaded, queries) == results
+            reloaded.close()
+
+
+if __name__ == "__main__":
+    main()
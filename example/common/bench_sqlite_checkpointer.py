@@ -0,0 +1,114 @@
+"""
+检查点基准测试 - 对比每步写完整快照（相当于默认检查点的做法）与 CompactSqliteSaver 的增量 + 压缩写入
+模拟多个会话线程轮流对话：每一轮先读取最新检查点，再写两个检查点（追加用户消息、追加模型回复），
+统计写入/读取延迟分位数和数据库大小，最后重新打开数据库测冷读取（进程重启后的恢复）延迟
+运行: uv run python -m example.common.bench_sqlite_checkpointer --threads 10000 --turns 200
+注意: 完整规模（1万线程 × 200轮，共400万次写入）需要数小时和数GB磁盘，可先用较小的 --threads 试跑
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+
+from example.common.sqlite_checkpointer import CompactSqliteSaver
+
+COLD_READS = 1000
+WORDS = ["北京", "天气", "晴天", "温度", "湿度", "风力", "明天", "降雨", "the", "weather", "is", "sunny", "today"]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def put_message(saver: CompactSqliteSaver, config: Dict, version: Optional[str], messages: List,
+                message) -> Tuple[Dict, str, List]:
+    """模拟 LangGraph 的一步：消息列表追加一条，写入新版本的检查点"""
+    checkpoint = empty_checkpoint()
+    messages = [*messages, message]
+    version = saver.get_next_version(version, None)
+    checkpoint["id"] = str(uuid6())
+    checkpoint["channel_values"] = {"messages": messages}
+    checkpoint["channel_versions"] = {"messages": version}
+    checkpoint["updated_channels"] = ["messages"]
+    new_config = saver.put(config, checkpoint, {"source": "loop", "step": len(messages)}, {"messages": version})
+    return new_config, version, messages
+
+
+def run(name: str, saver: CompactSqliteSaver, threads: int, turns: int) -> Dict[str, float]:
+    rng = random.Random(0)
+    writes: List[float] = []
+    reads: List[float] = []
+    start = time.perf_counter()
+    for turn in range(turns):
+        for thread in range(threads):
+            base = {"configurable": {"thread_id": f"t{thread}", "checkpoint_ns": ""}}
+            t0 = time.perf_counter()
+            latest = saver.get_tuple(base)
+            reads.append(time.perf_counter() - t0)
+            if latest is None:
+                config, version, messages = base, None, []
+            else:
+                config = latest.config
+                version = latest.checkpoint["channel_versions"]["messages"]
+                messages = latest.checkpoint["channel_values"]["messages"]
+            for message in (HumanMessage(text(rng, 20), id=str(uuid6())), AIMessage(text(rng, 80), id=str(uuid6()))):
+                t0 = time.perf_counter()
+                config, version, messages = put_message(saver, config, version, messages, message)
+                writes.append(time.perf_counter() - t0)
+        if (turn + 1) % max(1, turns // 10) == 0:
+            print(f"  [{name}] {turn + 1}/{turns} 轮，已用 {time.perf_counter() - start:.0f} 秒", flush=True)
+    saver.close()
+
+    # 重新打开数据库：内存中的增量基准为空，读取需要沿增量链还原
+    cold_saver = CompactSqliteSaver(saver.path)
+    cold: List[float] = []
+    for thread in rng.sample(range(threads), min(COLD_READS, threads)):
+        t0 = time.perf_counter()
+        latest = cold_saver.get_tuple({"configurable": {"thread_id": f"t{thread}"}})
+        cold.append(time.perf_counter() - t0)
+        assert len(latest.checkpoint["channel_values"]["messages"]) == turns * 2
+    cold_saver.close()
+    writes.sort()
+    reads.sort()
+    cold.sort()
+    return {"total": time.perf_counter() - start, "write_p50": percentile(writes, 0.5),
+            "write_p99": percentile(writes, 0.99), "read_p50": percentile(reads, 0.5),
+            "read_p99": percentile(reads, 0.99), "cold_p50": percentile(cold, 0.5), "cold_p99": percentile(cold, 0.99),
+            "size_mb": os.path.getsize(saver.path) / 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=10_000)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--keep-last", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configs = [
+            ("完整快照", dict(max_delta_chain=0, compress_level=0)),
+            ("增量+压缩", dict()),
+        ]
+        for index, (name, options) in enumerate(configs):
+            saver = CompactSqliteSaver(os.path.join(tmp, f"checkpoints-{index}.sqlite"),
+                                       keep_last=args.keep_last, **options)
+            result = run(name, saver, args.threads, args.turns)
+            print(f"{name}: {args.threads} 线程 × {args.turns} 轮，总耗时 {result['total']:.1f} 秒，"
+                  f"数据库 {result['size_mb']:.1f} MB")
+            print(f"  写入 p50 {result['write_p50'] * 1000:.2f} ms，p99 {result['write_p99'] * 1000:.2f} ms；"
+                  f"读取 p50 {result['read_p50'] * 1000:.2f} ms，p99 {result['read_p99'] * 1000:.2f} ms；"
+                  f"重启后冷读取 p50 {result['cold_p50'] * 1000:.2f} ms，p99 {result['cold_p99'] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+示例共用的演示工具 - 天气与时间查询，注册在 demo_registry 中供直接调用 DashScope 的 Function Calling 示例使用
+天气结果经过工具结果缓存，相同城市在TTL内不再重复查询；当前时间每次都变，不缓存
+"""
+from datetime import datetime
+
+from example.common.tool_cache import default_tool_cache
+from example.common.tool_registry import ToolRegistry
+
+demo_registry = ToolRegistry()
+
+
+@demo_registry.register(params={"city": "城市名称"})
+@default_tool_cache().cached
+def get_weather(city: str) -> str:
+    """获取指定城市的天气信息"""
+    return f"{city}的天气是晴天，温度为25度。"
+
+
+@demo_registry.register
+def get_time() -> str:
+    """获取当前时间"""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,170 @@
+"""
+连接池化的HTTP客户端 - 供直接调用 DashScope REST 接口的示例共用
+同步版基于 requests.Session（keep-alive 连接池），异步版基于 httpx.AsyncClient；
+两者都带连接/读取超时，以及对连接失败和 429/5xx 的有限次数重试（指数退避 + 随机抖动）；
+读取超时不重试：生成接口的 POST 不是幂等的，请求可能已被服务端处理并计费
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+DASHSCOPE_GENERATION_URL = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
+
+# 这些状态码表示服务端暂时不可用，可以重试
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# 请求 DashScope 以 server-sent events 流式返回
+SSE_HEADERS = {"Accept": "text/event-stream", "X-DashScope-SSE": "enable"}
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """全抖动指数退避：在 [0, min(cap, base * 2^attempt)] 内随机取值，避免多个请求同时重试"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _connect_failed(error: requests.exceptions.ConnectionError) -> bool:
+    """连接阶段失败（请求尚未发出）：连接超时、连接被拒绝、域名解析失败"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class PooledHttpClient:
+    """同步HTTP客户端：复用TCP/TLS连接，避免每次请求重新握手"""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None, pool_size: int = 10,
+                 connect_timeout: float = 3.05, read_timeout: float = 60.0,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_cap: float = 8.0):
+        if max_retries < 0:
+            raise ValueError("max_retries 不能小于 0")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        # 重试由本类控制（带抖动），适配器本身不重试
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post_json(self, url: str, payload: Dict[str, Any], timeout: Optional[tuple] = None) -> Dict[str, Any]:
+        """POST JSON并返回解析后的响应；最终失败时抛出 requests.exceptions.RequestException"""
+        return self._post(url, payload, timeout=timeout).json()
+
+    def stream_sse(self, url: str, payload: Dict[str, Any], timeout: Optional[tuple] = None) -> Iterator[Dict[str, Any]]:
+        """POST JSON并以 server-sent events 方式读取响应，逐个产出每个事件 data 字段解析后的JSON
+
+        只在建立连接阶段重试；开始接收事件后出错直接抛出，避免重复产出已发送的内容
+        """
+        response = self._post(url, payload, timeout=timeout, stream=True, headers=SSE_HEADERS)
+        # SSE固定使用UTF-8，不依赖响应头推断编码
+        response.encoding = "utf-8"
+        with response:
+            data_lines: List[str] = []
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    if line.startswith("data:"):
+                        data_lines.append(line[5:].lstrip())
+                    continue
+                # 空行表示一个事件结束
+                if data_lines:
+                    data = "\n".join(data_lines)
+                    data_lines = []
+                    if data == "[DONE]":
+                        return
+                    yield json.loads(data)
+            if data_lines and data_lines != ["[DONE]"]:
+                yield json.loads("\n".join(data_lines))
+
+    def _post(self, url: str, payload: Dict[str, Any], timeout: Optional[tuple] = None,
+              **kwargs) -> requests.Response:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=payload, timeout=timeout or self.timeout, **kwargs)
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    response.close()
+                    time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+                    continue
+                response.raise_for_status()
+                return response
+            except requests.exceptions.ConnectionError as e:
+                # 请求发出后连接中断同样是 ConnectionError，此时服务端可能已处理，不重试
+                if attempt == self.max_retries or not _connect_failed(e):
+                    raise
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncPooledHttpClient:
+    """异步HTTP客户端：与 PooledHttpClient 行为一致，需在同一个事件循环中使用并在结束时 aclose"""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None, pool_size: int = 10,
+                 connect_timeout: float = 3.05, read_timeout: float = 60.0,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_cap: float = 8.0):
+        if max_retries < 0:
+            raise ValueError("max_retries 不能小于 0")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def post_json(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST JSON并返回解析后的响应；最终失败时抛出 httpx.HTTPError"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.post(url, json=payload)
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncPooledHttpClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+def dashscope_headers() -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {os.getenv('DASHSCOPE_API_KEY')}",
+        "Content-Type": "application/json"
+    }
+
+
+_dashscope_client: Optional[PooledHttpClient] = None
+_dashscope_client_lock = threading.Lock()
+
+
+def dashscope_client() -> PooledHttpClient:
+    """进程内共享的 DashScope 同步客户端"""
+    global _dashscope_client
+    with _dashscope_client_lock:
+        if _dashscope_client is None:
+            _dashscope_client = PooledHttpClient(headers=dashscope_headers())
+    return _dashscope_client
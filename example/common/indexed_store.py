@@ -0,0 +1,325 @@
+"""
+带二级索引的长期记忆存储 - InMemoryStore.search(filter=...) 会遍历所有命名空间和其中每一条数据逐条比较
+IndexedStore 继承 InMemoryStore，接口完全相同，另外维护：
+- 命名空间前缀树：按前缀查找命名空间不再遍历全部命名空间
+- 声明字段（filter_fields）的哈希索引（等值过滤）和有序索引（$gt/$gte/$lt/$lte 范围过滤）
+- 可选的SQLite持久化：写入同步落盘，启动时加载并重建索引
+过滤仍用 InMemoryStore 的比较规则对候选逐条复核；候选按数据在 InMemoryStore 中的顺序（命名空间先后、命名空间内的插入顺序）
+排列后再取 offset / limit，结果与原实现完全一致；没有 query 时取够 offset + limit 条即停止
+"""
+import bisect
+import itertools
+import json
+import math
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from langgraph.store.base import IndexConfig, Item, PutOp, SearchOp
+from langgraph.store.memory import InMemoryStore, _compare_values
+
+_RANGE_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+
+
+class _NamespaceTrie:
+    """命名空间前缀树，每个节点记录以该路径结尾的命名空间是否存在"""
+
+    def __init__(self):
+        self.children: Dict[str, "_NamespaceTrie"] = {}
+        self.terminal = False
+
+    def add(self, namespace: Tuple[str, ...]):
+        node = self
+        for part in namespace:
+            node = node.children.setdefault(part, _NamespaceTrie())
+        node.terminal = True
+
+    def discard(self, namespace: Tuple[str, ...]):
+        path = [self]
+        for part in namespace:
+            node = path[-1].children.get(part)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].terminal = False
+        # 自底向上删除已经没有命名空间的节点
+        for part, parent, node in zip(reversed(namespace), reversed(path[:-1]), reversed(path[1:])):
+            if node.terminal or node.children:
+                break
+            del parent.children[part]
+
+    def with_prefix(self, prefix: Tuple[str, ...]) -> Iterator[Tuple[str, ...]]:
+        node = self
+        for part in prefix:
+            node = node.children.get(part)
+            if node is None:
+                return
+        stack = [(node, prefix)]
+        while stack:
+            node, namespace = stack.pop()
+            if node.terminal:
+                yield namespace
+            # 逆序入栈，按插入顺序输出
+            stack.extend((child, namespace + (part,)) for part, child in reversed(node.children.items()))
+
+
+class _FieldIndex:
+    """单个命名空间中某个字段的索引
+
+    by_value: 可哈希的值 -> 键（dict 保持插入顺序）；缺少该字段按 None 索引，与 value.get(field) 一致
+    values / keys: 数值按升序排列的有序索引，用于范围过滤；新增的数值先放入 pending，范围查询时再合并，
+    批量写入时不必每条都在大列表中间插入
+    others: 值不可哈希（列表、字典等）的键，等值过滤时总要复核
+    non_numeric: 值不是数字的键，范围过滤时总要复核（InMemoryStore 会尝试 float() 转换）
+    """
+
+    # 待合并的数值不超过该数量时逐条二分插入，否则整体重新排序
+    INSERT_LIMIT = 1000
+
+    def __init__(self):
+        self.by_value: Dict[Any, Dict[str, None]] = defaultdict(dict)
+        self.values: List[float] = []
+        self.keys: List[str] = []
+        self.pending: List[Tuple[float, str]] = []
+        self.others: Dict[str, None] = {}
+        self.non_numeric: Dict[str, None] = {}
+
+    def add(self, key: str, value: Any):
+        try:
+            self.by_value[value][key] = None
+        except TypeError:
+            self.others[key] = None
+        number = _as_number(value)
+        if number is None:
+            self.non_numeric[key] = None
+        else:
+            self.pending.append((number, key))
+
+    def remove(self, key: str, value: Any):
+        try:
+            bucket = self.by_value.get(value)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self.by_value[value]
+        except TypeError:
+            self.others.pop(key, None)
+        number = _as_number(value)
+        if number is None:
+            self.non_numeric.pop(key, None)
+        else:
+            lo = bisect.bisect_left(self.values, number)
+            hi = bisect.bisect_right(self.values, number)
+            for i in range(lo, hi):
+                if self.keys[i] == key:
+                    del self.values[i]
+                    del self.keys[i]
+                    return
+            for i in range(len(self.pending) - 1, -1, -1):
+                if self.pending[i] == (number, key):
+                    del self.pending[i]
+                    return
+
+    def _merge_pending(self):
+        if len(self.pending) <= self.INSERT_LIMIT:
+            for number, key in self.pending:
+                i = bisect.bisect_right(self.values, number)
+                self.values.insert(i, number)
+                self.keys.insert(i, key)
+        else:
+            merged = sorted([*zip(self.values, self.keys), *self.pending], key=lambda pair: pair[0])
+            self.values = [number for number, _ in merged]
+            self.keys = [key for _, key in merged]
+        self.pending.clear()
+
+    def equal(self, value: Any) -> Optional[List[str]]:
+        """等值过滤的候选键；过滤值不可哈希时返回 None（无法使用索引）"""
+        try:
+            bucket = self.by_value.get(value, {})
+        except TypeError:
+            return None
+        return [*bucket, *self.others]
+
+    def range(self, operators: Dict[str, Any]) -> Optional[List[str]]:
+        """范围过滤的候选键；边界不是数字时返回 None"""
+        if self.pending:
+            self._merge_pending()
+        lo, hi = 0, len(self.values)
+        for operator, operand in operators.items():
+            number = _as_number(operand)
+            if number is None:
+                return None
+            if operator == "$gt":
+                lo = max(lo, bisect.bisect_right(self.values, number))
+            elif operator == "$gte":
+                lo = max(lo, bisect.bisect_left(self.values, number))
+            elif operator == "$lt":
+                hi = min(hi, bisect.bisect_left(self.values, number))
+            else:
+                hi = min(hi, bisect.bisect_right(self.values, number))
+        return [*self.keys[lo:hi], *self.non_numeric]
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)) and not (isinstance(value, float) and math.isnan(value)):
+        return float(value)
+    return None
+
+
+class IndexedStore(InMemoryStore):
+    """带索引的 InMemoryStore
+
+    filter_fields: 需要建索引的顶层字段，如 ["city", "time"]；未声明的字段过滤时仍逐条比较
+    path: SQLite 文件路径，为 None 时只在内存中；向量（index 配置的语义检索）不持久化，重启后需要重新写入；
+    重新加载后命名空间按首次写入的先后排列（只被读取过、没有写入过的空命名空间不持久化）
+    """
+
+    def __init__(self, *, filter_fields: Sequence[str] = (), path: Optional[str] = None,
+                 index: Optional[IndexConfig] = None):
+        super().__init__(index=index)
+        self.filter_fields = tuple(filter_fields)
+        self.path = path
+        self._namespaces = _NamespaceTrie()
+        # 命名空间 -> 字段 -> 索引
+        self._indexes: Dict[Tuple[str, ...], Dict[str, _FieldIndex]] = {}
+        # 命名空间在 _data 中的位置；_data 只追加命名空间（读取不存在的命名空间也会创建），搜索时为新增的命名空间编号
+        self._namespace_order: Dict[Tuple[str, ...], int] = {}
+        # 命名空间 -> 键 -> 插入序号：与 _data 中键的顺序一致（更新保持原位置，删除后重新写入排到最后）
+        self._positions: Dict[Tuple[str, ...], Dict[str, int]] = defaultdict(dict)
+        self._next_position = 0
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS store (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "created_at TEXT NOT NULL, updated_at TEXT NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            # 命名空间首次写入的先后，重新加载后命名空间的顺序不受其中数据删除的影响
+            self._conn.execute("CREATE TABLE IF NOT EXISTS namespaces (namespace TEXT PRIMARY KEY)")
+            self._load()
+
+    def _load(self):
+        for (namespace,) in self._conn.execute("SELECT namespace FROM namespaces ORDER BY rowid"):
+            self._data.setdefault(tuple(json.loads(namespace)), {})
+        rows = self._conn.execute("SELECT namespace, key, value, created_at, updated_at FROM store ORDER BY rowid")
+        for namespace, key, value, created_at, updated_at in rows:
+            namespace = tuple(json.loads(namespace))
+            item = Item(value=json.loads(value), key=key, namespace=namespace,
+                        created_at=datetime.fromisoformat(created_at), updated_at=datetime.fromisoformat(updated_at))
+            self._data[namespace][key] = item
+            self._index(namespace, key, item.value)
+            self._assign_position(namespace, key)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+    def _index(self, namespace: Tuple[str, ...], key: str, value: Dict[str, Any]):
+        self._namespaces.add(namespace)
+        if not self.filter_fields:
+            return
+        indexes = self._indexes.get(namespace)
+        if indexes is None:
+            indexes = self._indexes[namespace] = {field: _FieldIndex() for field in self.filter_fields}
+        for field, field_index in indexes.items():
+            field_index.add(key, value.get(field))
+
+    def _unindex(self, namespace: Tuple[str, ...], key: str, value: Dict[str, Any]):
+        for field, field_index in self._indexes.get(namespace, {}).items():
+            field_index.remove(key, value.get(field))
+
+    def _assign_position(self, namespace: Tuple[str, ...], key: str):
+        positions = self._positions[namespace]
+        if key not in positions:
+            positions[key] = self._next_position
+            self._next_position += 1
+
+    def _apply_put_ops(self, put_ops: Dict[Tuple[Tuple[str, ...], str], PutOp]) -> None:
+        with self._lock:
+            for namespace, key in put_ops:
+                old = self._data[namespace].get(key) if namespace in self._data else None
+                if old is not None:
+                    self._unindex(namespace, key, old.value)
+            super()._apply_put_ops(put_ops)
+            rows, deleted = [], []
+            for namespace, key in put_ops:
+                item = self._data[namespace].get(key)
+                if item is not None:
+                    self._index(namespace, key, item.value)
+                    self._assign_position(namespace, key)
+                    rows.append((json.dumps(namespace, ensure_ascii=False), key,
+                                 json.dumps(item.value, ensure_ascii=False),
+                                 item.created_at.isoformat(), item.updated_at.isoformat()))
+                else:
+                    deleted.append((json.dumps(namespace, ensure_ascii=False), key))
+                    self._positions[namespace].pop(key, None)
+                    if not self._data[namespace]:
+                        self._namespaces.discard(namespace)
+                        self._indexes.pop(namespace, None)
+                        self._positions.pop(namespace, None)
+            if self._conn is not None:
+                with self._conn:
+                    # 更新已有键时保留 rowid，重新加载后键的顺序与内存中一致
+                    self._conn.executemany(
+                        "INSERT INTO store VALUES (?, ?, ?, ?, ?) ON CONFLICT (namespace, key) DO UPDATE SET "
+                        "value = excluded.value, created_at = excluded.created_at, updated_at = excluded.updated_at",
+                        rows)
+                    self._conn.executemany("DELETE FROM store WHERE namespace = ? AND key = ?", deleted)
+                    self._conn.executemany("INSERT OR IGNORE INTO namespaces VALUES (?)",
+                                           dict.fromkeys((row[0],) for row in rows))
+
+    def _candidate_keys(self, namespace: Tuple[str, ...], filter: Optional[Dict[str, Any]]) -> Iterable[str]:
+        """用索引缩小候选范围：在所有可用索引的条件中选候选最少的一个，按插入顺序排列；没有可用索引时返回全部键"""
+        best: Optional[List[str]] = None
+        indexes = self._indexes.get(namespace, {})
+        for field, filter_value in (filter or {}).items():
+            field_index = indexes.get(field)
+            if field_index is None:
+                continue
+            candidates = None
+            if isinstance(filter_value, dict) and filter_value and all(op.startswith("$") for op in filter_value):
+                if "$eq" in filter_value:
+                    candidates = field_index.equal(filter_value["$eq"])
+                elif all(op in _RANGE_OPERATORS for op in filter_value):
+                    candidates = field_index.range(filter_value)
+            elif not isinstance(filter_value, (dict, list, tuple)):
+                candidates = field_index.equal(filter_value)
+            if candidates is not None and (best is None or len(candidates) < len(best)):
+                best = candidates
+        if best is None:
+            return self._data[namespace].keys()
+        return sorted(best, key=self._positions[namespace].__getitem__)
+
+    def _ordered_namespaces(self, prefix: Tuple[str, ...]) -> List[Tuple[str, ...]]:
+        """前缀匹配的命名空间，按在 _data 中的先后排列"""
+        order = self._namespace_order
+        if len(order) != len(self._data):
+            for namespace in itertools.islice(self._data, len(order), None):
+                order[namespace] = len(order)
+        return sorted(self._namespaces.with_prefix(prefix), key=order.__getitem__)
+
+    def _filter_items(self, op: SearchOp) -> List[Tuple[Item, List[List[float]]]]:
+        # 有 query 时需要全部候选参与相似度排序，否则取够 offset + limit 条即可
+        needed = None if op.query else op.offset + op.limit
+        filtered = []
+        with self._lock:
+            for namespace in self._ordered_namespaces(tuple(op.namespace_prefix)):
+                items = self._data[namespace]
+                for key in self._candidate_keys(namespace, op.filter):
+                    item = items.get(key)
+                    if item is None or (op.filter and not all(
+                            _compare_values(item.value.get(field), filter_value)
+                            for field, filter_value in op.filter.items())):
+                        continue
+                    if op.query and (embeddings := self._vectors[namespace].get(key)):
+                        filtered.append((item, list(embeddings.values())))
+                    else:
+                        filtered.append((item, []))
+                    if needed is not None and len(filtered) >= needed:
+                        return filtered
+        return filtered
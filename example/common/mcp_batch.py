@@ -0,0 +1,50 @@
+"""
+MCP批量工具的客户端封装 - 把多次标量调用合并为一次批量调用，减少MCP往返
+对应服务端：AgentTools/mcp_server.py 的 get_current_time_batch，langchain01/advance/math_server.py 的 evaluate_batch。
+超过 batch_size 的输入拆成多批并发发送，结果按输入顺序合并
+"""
+import asyncio
+import json
+from typing import Any, Dict, List, Sequence
+
+from example.common.mcp_session_pool import MCPSessionPool
+
+DEFAULT_BATCH_SIZE = 100
+
+
+class MCPToolCallError(RuntimeError):
+    """MCP工具返回 isError"""
+
+
+async def call_tool_result(pool: MCPSessionPool, server_name: str, tool_name: str, arguments: Dict[str, Any]) -> Any:
+    """调用工具并取出返回值：优先使用结构化结果，没有时按JSON解析文本内容"""
+    result = await pool.call(server_name, "call_tool", tool_name, arguments)
+    text = "".join(getattr(content, "text", "") for content in result.content)
+    if result.isError:
+        raise MCPToolCallError(f"{tool_name}: {text}")
+    if result.structuredContent is not None:
+        # 返回值不是对象时 FastMCP 把它包在 result 字段里
+        return result.structuredContent.get("result", result.structuredContent)
+    return json.loads(text)
+
+
+async def _batched(pool: MCPSessionPool, server_name: str, tool_name: str, key: str, items: Sequence[Any],
+                   extra: Dict[str, Any], batch_size: int) -> List[Any]:
+    chunks = [list(items[i:i + batch_size]) for i in range(0, len(items), batch_size)]
+    results = await asyncio.gather(*(
+        call_tool_result(pool, server_name, tool_name, {key: chunk, **extra}) for chunk in chunks
+    ))
+    return [item for chunk_result in results for item in chunk_result]
+
+
+async def get_current_times(pool: MCPSessionPool, server_name: str, timezones: Sequence[str], format: str = "iso",
+                            batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict[str, str]]:
+    """批量查询多个时区的当前时间，每项为 {"timezone", "time"} 或 {"timezone", "error"}"""
+    return await _batched(pool, server_name, "get_current_time_batch", "timezones", timezones,
+                          {"format": format}, batch_size)
+
+
+async def evaluate_ops(pool: MCPSessionPool, server_name: str, ops: Sequence[Dict[str, Any]],
+                       batch_size: int = DEFAULT_BATCH_SIZE) -> List[float]:
+    """批量执行 add / multiply，ops 每项为 {"op", "a", "b"}"""
+    return await _batched(pool, server_name, "evaluate_batch", "ops", ops, {}, batch_size)
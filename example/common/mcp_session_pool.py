@@ -0,0 +1,286 @@
+"""
+MCP会话池 - 每个MCP服务器保持一个长连接会话（stdio 子进程 / HTTP 会话），在多次对话之间复用
+MultiServerMCPClient.get_tools() 返回的工具每次调用都会新建会话，stdio 传输下即每次都重新启动一个 Python 进程；
+会话池加载的工具通过池中的常驻会话调用，空闲超过健康检查间隔时先 ping，服务器已退出或连接断开则自动重启，
+close() 关闭全部会话并结束子进程。
+工具发现在各服务器间并发进行且各自超时，配置 MCPToolSchemaCache 后优先使用磁盘缓存的工具定义并在后台重新校验
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+from mcp.types import Tool as MCPTool
+
+from example.common.mcp_tool_cache import MCPToolSchemaCache
+
+logger = logging.getLogger(__name__)
+
+# 这些异常说明传输层已断开（子进程退出、HTTP会话失效），重启会话后可重试
+TRANSPORT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, ConnectionError)
+
+
+class _ServerSession:
+    """单个服务器的常驻会话
+
+    会话的上下文管理器（anyio 任务组）必须在同一个任务里进入和退出，
+    因此由一个专属任务持有会话，关闭时通知该任务退出上下文，而不是在调用方任务里关闭。
+    """
+
+    def __init__(self, client: MultiServerMCPClient, name: str):
+        self.client = client
+        self.name = name
+        self.session = None
+        self.server_version: Optional[str] = None
+        self.last_used = 0.0
+        self._ready: Optional[asyncio.Future] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # 启动失败后被取消、仍在清理（结束子进程）的持有任务，会话池关闭时等待它们结束
+        self.abandoned: set = set()
+
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done() and self.session is not None
+
+    async def open(self, timeout: float):
+        loop = asyncio.get_running_loop()
+        self._ready = loop.create_future()
+        self._closing = asyncio.Event()
+        self._task = asyncio.create_task(self._hold(self._ready), name=f"mcp-session-{self.name}")
+        try:
+            await asyncio.wait_for(asyncio.shield(self._ready), timeout)
+        except BaseException:
+            # 启动超时或出错时服务器可能卡在初始化里：直接取消持有任务，清理（结束子进程）在后台完成，不占用调用方的超时
+            self._abandon()
+            raise
+        self.last_used = time.monotonic()
+
+    async def _hold(self, ready: asyncio.Future):
+        # ready 由参数传入：启动失败被放弃的任务在后台清理时，不能影响之后重新 open() 的 _ready 和 session
+        session = None
+        try:
+            async with self.client.session(self.name, auto_initialize=False) as session:
+                result = await session.initialize()
+                self.server_version = result.serverInfo.version
+                self.session = session
+                ready.set_result(None)
+                await self._closing.wait()
+        except BaseException as e:
+            if not ready.done():
+                if isinstance(e, asyncio.CancelledError):
+                    ready.cancel()
+                else:
+                    ready.set_exception(e)
+            elif not isinstance(e, asyncio.CancelledError):
+                logger.warning(f"MCP服务器 {self.name} 的会话异常结束: {e}")
+        finally:
+            if self.session is session:
+                self.session = None
+
+    def _abandon(self):
+        task, self._task = self._task, None
+        self.last_used = 0.0
+        ready = self._ready
+        task.cancel()
+        self.abandoned.add(task)
+        task.add_done_callback(self.abandoned.discard)
+        # 启动失败的异常已由 open() 抛给调用方，这里取走 _ready 中的异常，避免 "Future exception was never retrieved"
+        task.add_done_callback(lambda _: ready.cancelled() or ready.exception())
+
+    async def close(self):
+        task, self._task = self._task, None
+        self.last_used = 0.0
+        if task is None:
+            return
+        self._closing.set()
+        try:
+            await asyncio.wait_for(task, 5.0)
+        except asyncio.TimeoutError:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        except Exception:
+            # 会话异常结束时 _hold 已记录日志
+            pass
+
+
+class _PooledSessionProxy:
+    """交给 convert_mcp_tool_to_langchain_tool 的会话代理：每次调用都取池中该服务器当前可用的会话，服务器重启后工具仍然有效"""
+
+    def __init__(self, pool: "MCPSessionPool", server_name: str):
+        self._pool = pool
+        self._server_name = server_name
+
+    async def list_tools(self, *args, **kwargs):
+        return await self._pool.call(self._server_name, "list_tools", *args, **kwargs)
+
+    async def call_tool(self, *args, **kwargs):
+        return await self._pool.call(self._server_name, "call_tool", *args, **kwargs)
+
+
+class MCPSessionPool:
+    """MCP会话池，可作为异步上下文管理器使用
+
+    connections 与 MultiServerMCPClient 的配置相同。会话在首次使用时建立（或调用 start() 预热），
+    距上次成功调用超过 health_check_interval 秒时先 ping 一次，失败则重启；
+    调用中遇到传输层错误时重启会话并重试一次。
+    工具发现时单个服务器超过 discovery_timeout 秒或出错只跳过该服务器；
+    传入 tool_cache 时命中缓存的服务器直接返回缓存的工具，并在后台拉取最新列表更新缓存。
+    """
+
+    def __init__(self, connections: Dict[str, Dict[str, Any]], health_check_interval: float = 30.0,
+                 ping_timeout: float = 5.0, start_timeout: float = 30.0, discovery_timeout: float = 10.0,
+                 tool_cache: Optional[MCPToolSchemaCache] = None, **client_kwargs):
+        self.client = MultiServerMCPClient(connections, **client_kwargs)
+        self.connections = connections
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+        self.start_timeout = start_timeout
+        self.discovery_timeout = discovery_timeout
+        self.tool_cache = tool_cache
+        self._background: set = set()
+        self._servers = {name: _ServerSession(self.client, name) for name in connections}
+        self._locks = {name: asyncio.Lock() for name in connections}
+        self.restarts = {name: 0 for name in connections}
+
+    @property
+    def server_names(self) -> List[str]:
+        return list(self._servers)
+
+    async def start(self):
+        """并发预热所有服务器的会话；启动失败的服务器只记录日志，首次使用时会再次尝试"""
+        results = await asyncio.gather(*(self._acquire(name) for name in self._servers), return_exceptions=True)
+        for name, result in zip(self._servers, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"MCP服务器 {name} 启动失败: {result!r}")
+
+    async def get_tools(self, server_name: Optional[str] = None) -> List[BaseTool]:
+        """并发加载各服务器的工具；返回的工具通过池中的常驻会话调用，超时或出错的服务器不提供工具"""
+        names = [server_name] if server_name is not None else self.server_names
+        for name in names:
+            self._server(name)
+        tools_list = await asyncio.gather(*(self._server_tools(name) for name in names))
+        return [tool for tools in tools_list for tool in tools]
+
+    async def call(self, server_name: str, method: str, *args, **kwargs) -> Any:
+        """在服务器的常驻会话上调用 ClientSession 的方法；传输层断开时重启会话并重试一次"""
+        server = await self._acquire(server_name)
+        session = server.session
+        try:
+            result = await getattr(session, method)(*args, **kwargs)
+        except TRANSPORT_ERRORS as e:
+            logger.warning(f"MCP服务器 {server_name} 连接已断开({type(e).__name__})，重启后重试")
+            server = await self._restart(server_name, session)
+            result = await getattr(server.session, method)(*args, **kwargs)
+        server.last_used = time.monotonic()
+        return result
+
+    async def close(self):
+        """关闭所有会话，stdio 传输的子进程随之退出"""
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        await asyncio.gather(*(server.close() for server in self._servers.values()))
+        await asyncio.gather(*(task for server in self._servers.values() for task in server.abandoned),
+                             return_exceptions=True)
+
+    async def __aenter__(self) -> "MCPSessionPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _server_tools(self, name: str) -> List[BaseTool]:
+        cached = self.tool_cache.load(self.connections[name]) if self.tool_cache else None
+        if cached is not None:
+            task = asyncio.create_task(self._revalidate(name, cached.server_version, cached.tools))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            return self._convert(name, cached.tools)
+        try:
+            version, mcp_tools = await asyncio.wait_for(self._discover(name), self.discovery_timeout)
+        except Exception as e:
+            logger.warning(f"MCP服务器 {name} 工具发现失败，跳过该服务器: {e!r}")
+            return []
+        if self.tool_cache:
+            self.tool_cache.save(self.connections[name], version, mcp_tools)
+        return self._convert(name, mcp_tools)
+
+    async def _discover(self, name: str) -> Tuple[Optional[str], List[MCPTool]]:
+        """拉取服务器的完整工具列表（处理分页），同时返回服务器版本"""
+        mcp_tools: List[MCPTool] = []
+        cursor = None
+        while True:
+            page = await self.call(name, "list_tools", cursor=cursor)
+            mcp_tools.extend(page.tools)
+            if not page.nextCursor:
+                break
+            cursor = page.nextCursor
+        return self._servers[name].server_version, mcp_tools
+
+    async def _revalidate(self, name: str, cached_version: Optional[str], cached_tools: List[MCPTool]):
+        """后台校验缓存：服务器版本或工具定义变化时更新缓存，下次加载工具时生效"""
+        try:
+            version, mcp_tools = await asyncio.wait_for(self._discover(name), self.discovery_timeout)
+        except Exception as e:
+            logger.warning(f"MCP服务器 {name} 工具缓存校验失败，继续使用缓存: {e!r}")
+            return
+        if version != cached_version or mcp_tools != cached_tools:
+            logger.info(f"MCP服务器 {name} 的工具定义已变化（版本 {cached_version} -> {version}），更新缓存")
+            self.tool_cache.save(self.connections[name], version, mcp_tools)
+
+    def _convert(self, name: str, mcp_tools: List[MCPTool]) -> List[BaseTool]:
+        proxy = _PooledSessionProxy(self, name)
+        return [
+            convert_mcp_tool_to_langchain_tool(proxy, tool, callbacks=self.client.callbacks,
+                                               tool_interceptors=self.client.tool_interceptors, server_name=name)
+            for tool in mcp_tools
+        ]
+
+    def _server(self, name: str) -> _ServerSession:
+        server = self._servers.get(name)
+        if server is None:
+            raise ValueError(f"未配置的MCP服务器: {name}，可选: {self.server_names}")
+        return server
+
+    async def _acquire(self, name: str) -> _ServerSession:
+        server = self._server(name)
+        if server.alive and time.monotonic() - server.last_used < self.health_check_interval:
+            return server
+        async with self._locks[name]:
+            if not server.alive:
+                if server.last_used:
+                    logger.warning(f"MCP服务器 {name} 已退出，重新启动")
+                    self.restarts[name] += 1
+                await server.close()
+                await server.open(self.start_timeout)
+            elif time.monotonic() - server.last_used >= self.health_check_interval and not await self._ping(server):
+                logger.warning(f"MCP服务器 {name} 健康检查失败，重新启动")
+                self.restarts[name] += 1
+                await server.close()
+                await server.open(self.start_timeout)
+        return server
+
+    async def _ping(self, server: _ServerSession) -> bool:
+        try:
+            await asyncio.wait_for(server.session.send_ping(), self.ping_timeout)
+        except Exception:
+            return False
+        server.last_used = time.monotonic()
+        return True
+
+    async def _restart(self, name: str, failed_session) -> _ServerSession:
+        server = self._server(name)
+        async with self._locks[name]:
+            # 并发调用同时发现断开时只重启一次
+            if server.alive and server.session is not failed_session:
+                return server
+            self.restarts[name] += 1
+            await server.close()
+            await server.open(self.start_timeout)
+        return server
@@ -0,0 +1,85 @@
+"""
+MCP工具定义的磁盘缓存 - 启动时直接用缓存的工具 schema 构造工具，不必等所有服务器连上再 list_tools
+以服务器配置的哈希为文件名，文件内记录服务器版本；会话池在后台重新拉取工具列表校验，版本或工具变化时更新缓存。
+缓存目录默认为 ~/.cache/ydc_ai_dev/mcp_tools，可用环境变量 MCP_TOOL_CACHE_DIR 指定
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from mcp.types import Tool as MCPTool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ydc_ai_dev", "mcp_tools")
+# 缓存文件格式版本，格式变化时递增使旧缓存失效
+CACHE_FORMAT = 1
+
+
+def config_hash(connection: Dict[str, Any]) -> str:
+    """服务器配置的哈希；配置里的密钥只参与哈希，不写入缓存文件"""
+    canonical = json.dumps(connection, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedToolList:
+    """某个服务器缓存的工具列表"""
+    server_version: Optional[str]
+    tools: List[MCPTool]
+    fetched_at: float
+
+
+class MCPToolSchemaCache:
+    """按服务器配置哈希存取工具定义，每个服务器一个JSON文件，写入时先写临时文件再原子替换"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or os.getenv("MCP_TOOL_CACHE_DIR") or DEFAULT_CACHE_DIR
+
+    def _path(self, connection: Dict[str, Any]) -> str:
+        return os.path.join(self.cache_dir, f"{config_hash(connection)}.json")
+
+    def load(self, connection: Dict[str, Any]) -> Optional[CachedToolList]:
+        try:
+            with open(self._path(connection), encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") != CACHE_FORMAT:
+                return None
+            return CachedToolList(
+                server_version=data.get("server_version"),
+                tools=[MCPTool.model_validate(tool) for tool in data["tools"]],
+                fetched_at=data.get("fetched_at", 0.0),
+            )
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"MCP工具缓存读取失败，忽略缓存: {e}")
+            return None
+
+    def save(self, connection: Dict[str, Any], server_version: Optional[str], tools: List[MCPTool]):
+        data = {
+            "format": CACHE_FORMAT,
+            "server_version": server_version,
+            "fetched_at": time.time(),
+            "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in tools],
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(connection))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def invalidate(self, connection: Dict[str, Any]):
+        try:
+            os.unlink(self._path(connection))
+        except FileNotFoundError:
+            pass
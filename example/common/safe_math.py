@@ -0,0 +1,130 @@
+"""
+安全的算术表达式计算引擎 - 替代各示例 calculate 工具中的 eval
+表达式只解析一次为AST并编译成闭包，按表达式文本做LRU缓存；
+对表达式长度、整数位数、幂指数、幂运算嵌套层数和AST嵌套深度做限制，避免 9**9**9 之类的输入占满CPU、
+---...1 之类的深层嵌套耗尽递归栈
+"""
+import ast
+import operator
+from functools import lru_cache
+from typing import Callable, List, Union
+
+Number = Union[int, float]
+
+# 允许的运算与原先字符白名单 '0123456789+-*/(). ' 一致
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Pow: operator.pow,
+}
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+class CalculationError(ValueError):
+    """表达式不合法或超出计算限制"""
+
+
+class SafeCalculator:
+    """安全算术计算器"""
+
+    def __init__(self, max_expression_length: int = 1000, max_int_bits: int = 4096,
+                 max_exponent: int = 10000, max_power_nesting: int = 2, max_depth: int = 300,
+                 cache_size: int = 1024):
+        self.max_expression_length = max_expression_length
+        self.max_int_bits = max_int_bits
+        self.max_exponent = max_exponent
+        self.max_power_nesting = max_power_nesting
+        self.max_depth = max_depth
+        self._compile_cached = lru_cache(maxsize=cache_size)(self._compile_expression)
+
+    def evaluate(self, expression: str) -> Number:
+        """计算单个表达式；非法表达式抛出 CalculationError，除零抛出 ZeroDivisionError"""
+        expression = expression.strip()
+        if len(expression) > self.max_expression_length:
+            raise CalculationError(f"表达式过长，最多 {self.max_expression_length} 个字符")
+        return self._compile_cached(expression)()
+
+    def evaluate_batch(self, expressions: List[str]) -> List[Union[Number, Exception]]:
+        """批量计算，单个表达式出错不影响其他表达式，出错位置返回对应的异常对象"""
+        results = []
+        for expression in expressions:
+            try:
+                results.append(self.evaluate(expression))
+            except (CalculationError, ArithmeticError) as e:
+                results.append(e)
+        return results
+
+    def cache_info(self):
+        return self._compile_cached.cache_info()
+
+    def _compile_expression(self, expression: str) -> Callable[[], Number]:
+        try:
+            tree = ast.parse(expression, mode="eval")
+        except SyntaxError:
+            raise CalculationError("表达式语法错误，只能使用数字和基本运算符(+-*/.)")
+        except (RecursionError, MemoryError):
+            # 解析器本身也会因嵌套过深失败
+            raise CalculationError(f"表达式嵌套超过 {self.max_depth} 层")
+        return self._compile_node(tree.body, power_nesting=0, depth=0)
+
+    def _compile_node(self, node: ast.AST, power_nesting: int, depth: int) -> Callable[[], Number]:
+        """把AST节点编译为无参闭包，编译期完成白名单校验；嵌套深度受限，编译和求值都不会耗尽递归栈"""
+        depth += 1
+        if depth > self.max_depth:
+            raise CalculationError(f"表达式嵌套超过 {self.max_depth} 层")
+
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            value = node.value
+            self._check_size(value)
+            return lambda: value
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            op = UNARY_OPERATORS[type(node.op)]
+            operand = self._compile_node(node.operand, power_nesting, depth)
+            return lambda: op(operand())
+
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            op_type = type(node.op)
+            if op_type is ast.Pow:
+                power_nesting += 1
+                if power_nesting > self.max_power_nesting:
+                    raise CalculationError(f"幂运算嵌套超过 {self.max_power_nesting} 层")
+            left = self._compile_node(node.left, power_nesting, depth)
+            right = self._compile_node(node.right, power_nesting, depth)
+            return lambda: self._apply(op_type, left(), right())
+
+        raise CalculationError("表达式包含非法内容，只能使用数字和基本运算符(+-*/.)")
+
+    def _apply(self, op_type, left: Number, right: Number) -> Number:
+        # 在真正计算之前估算结果大小，超限直接拒绝
+        if op_type is ast.Pow:
+            self._check_power(left, right)
+        elif op_type is ast.Mult and isinstance(left, int) and isinstance(right, int):
+            if left.bit_length() + right.bit_length() > self.max_int_bits:
+                raise CalculationError(f"计算结果超过 {self.max_int_bits} 位")
+        result = BINARY_OPERATORS[op_type](left, right)
+        if isinstance(result, complex):
+            raise CalculationError("计算结果不是实数")
+        self._check_size(result)
+        return result
+
+    def _check_power(self, base: Number, exponent: Number):
+        if abs(exponent) > self.max_exponent:
+            raise CalculationError(f"指数绝对值不能超过 {self.max_exponent}")
+        if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+            if max(base.bit_length(), 1) * exponent > self.max_int_bits:
+                raise CalculationError(f"计算结果超过 {self.max_int_bits} 位")
+
+    def _check_size(self, value: Number):
+        if isinstance(value, int) and value.bit_length() > self.max_int_bits:
+            raise CalculationError(f"数值超过 {self.max_int_bits} 位")
+
+
+# 进程内共享的默认计算器，各示例的 calculate 工具共用同一份编译缓存
+default_calculator = SafeCalculator()
@@ -0,0 +1,150 @@
+"""
+本地检索组件 - 倒排索引 + BM25 打分，替代 search_web 工具中对字典的线性子串匹配
+中文按字的二元组(bigram)切分，无需分词词典即可支持"黄金价格"这类查询；英文和数字按单词切分
+"""
+import math
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 连续的中日韩统一表意文字，或连续的英文字母/数字
+TOKEN_PATTERN = re.compile(r'([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)|([0-9a-z]+)')
+
+# 演示用的市场数据片段，未指定语料目录时使用
+DEMO_SNIPPETS = [
+    ("黄金", "根据最新市场数据，今日黄金价格约为1159元/克（24K金），投资金条价格约为1080元/克。"),
+    ("gold", "Current gold price is approximately $65 per gram (24K), investment gold bars around $63 per gram."),
+]
+
+
+def tokenize_spans(text: str) -> List[Tuple[str, int, int]]:
+    """与 tokenize 相同的切分，同时返回每个词项在文本中的起止位置"""
+    spans = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        start, end = match.span()
+        if match.group(2) or end - start == 1:
+            spans.append((match.group(), start, end))
+        else:
+            spans.extend((text[i:i + 2].lower(), i, i + 2) for i in range(start, end - 1))
+    return spans
+
+
+def tokenize(text: str) -> List[str]:
+    """CJK感知的切分：中文连续片段切为二元组（单字片段保留单字），其余按单词切分"""
+    return [token for token, _, _ in tokenize_spans(text)]
+
+
+@dataclass
+class SearchResult:
+    """检索结果"""
+    doc_id: str
+    score: float
+    text: str
+
+
+class BM25Index:
+    """倒排索引 + BM25 打分"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.texts: List[str] = []
+        self.doc_lengths: List[int] = []
+        # 词项 -> [(文档序号, 词频)]
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add_document(self, doc_id: str, text: str):
+        """加入一篇文档（片段）"""
+        doc_index = len(self.doc_ids)
+        tokens = tokenize(text)
+        term_freqs: Dict[str, int] = {}
+        for token in tokens:
+            term_freqs[token] = term_freqs.get(token, 0) + 1
+        for term, freq in term_freqs.items():
+            self.postings.setdefault(term, []).append((doc_index, freq))
+
+        self.doc_ids.append(doc_id)
+        self.texts.append(text)
+        self.doc_lengths.append(len(tokens))
+        self._total_length += len(tokens)
+
+    def add_documents(self, documents: Iterable[Tuple[str, str]]):
+        for doc_id, text in documents:
+            self.add_document(doc_id, text)
+
+    @classmethod
+    def from_directory(cls, path: str, extensions: Tuple[str, ...] = (".txt", ".md"), **kwargs) -> "BM25Index":
+        """从目录加载语料：每个文件按空行切分为片段，片段ID为 <相对路径>#<序号>"""
+        index = cls(**kwargs)
+        for root, _, files in os.walk(path):
+            for filename in sorted(files):
+                if not filename.endswith(extensions):
+                    continue
+                file_path = os.path.join(root, filename)
+                relative_path = os.path.relpath(file_path, path)
+                with open(file_path, encoding="utf-8") as f:
+                    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', f.read()) if p.strip()]
+                index.add_documents((f"{relative_path}#{i}", p) for i, p in enumerate(paragraphs))
+        return index
+
+    def search(self, query: str, top_k: int = 5, min_coverage: float = 0.6) -> List[SearchResult]:
+        """返回得分最高的 top_k 个片段，只遍历查询词项的倒排表
+
+        片段命中的查询词项需覆盖查询文本中至少 min_coverage 比例的字符（按字/字母计，不含空白和标点），
+        否则不算命中：只共享"价格"一个词的片段不会作为"白银价格"的结果返回
+        """
+        if not self.doc_ids:
+            return []
+        doc_count = len(self.doc_ids)
+        avg_length = self._total_length / doc_count
+        scores: Dict[int, float] = {}
+        matched: Dict[int, List[str]] = {}
+
+        spans = tokenize_spans(query)
+        for term in {token for token, _, _ in spans}:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_index, freq in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_index] / avg_length)
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+                matched.setdefault(doc_index, []).append(term)
+
+        query_chars = {i for _, start, end in spans for i in range(start, end)}
+        results = []
+        for doc_index, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+            terms = set(matched[doc_index])
+            covered = {i for token, start, end in spans if token in terms for i in range(start, end)}
+            if len(covered) < min_coverage * len(query_chars):
+                continue
+            results.append(SearchResult(doc_id=self.doc_ids[doc_index], score=score, text=self.texts[doc_index]))
+            if len(results) >= top_k:
+                break
+        return results
+
+
+_default_index: Optional[BM25Index] = None
+_default_index_lock = threading.Lock()
+
+
+def default_search_index() -> BM25Index:
+    """进程内共享的默认索引：设置了 SEARCH_CORPUS_DIR 时从该目录加载，否则使用演示片段"""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            corpus_dir = os.getenv("SEARCH_CORPUS_DIR")
+            if corpus_dir:
+                index = BM25Index.from_directory(corpus_dir)
+            else:
+                index = BM25Index()
+                index.add_documents(DEMO_SNIPPETS)
+            _default_index = index
+    return _default_index
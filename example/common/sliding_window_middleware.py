@@ -0,0 +1,116 @@
+"""
+滑动窗口裁剪中间件 - 替代每轮对全部历史调用 trim_messages 再 RemoveMessage(REMOVE_ALL_MESSAGES) 重写整个列表的做法
+按会话线程维护窗口内每条消息的token数和累计总数，每轮只计算新增消息；
+超出上限时从窗口头部淘汰，只返回被淘汰消息的 RemoveMessage，未变化的消息不会重新写入 checkpointer。
+带 tool_calls 的 AIMessage 与对应的 ToolMessage 作为一组一起淘汰，窗口里不会出现孤立的工具结果
+"""
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from langchain.agents.middleware import AgentMiddleware, AgentState
+from langchain_core.messages import AIMessage, AnyMessage, RemoveMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.config import get_config
+from langgraph.runtime import Runtime
+
+
+@dataclass
+class _Window:
+    """某个线程的窗口：第一条消息（可选保留）之后、按顺序排列的 (消息id, token数)"""
+    pinned_id: Optional[str] = None
+    entries: Deque[Tuple[str, int]] = field(default_factory=deque)
+    total_tokens: int = 0
+
+
+class SlidingWindowTrimMiddleware(AgentMiddleware):
+    """滑动窗口裁剪中间件
+
+    max_tokens / max_messages 至少设置一个，窗口（不含保留的第一条消息）超过任一上限时淘汰最早的消息；
+    keep_first 为 True 时始终保留第一条消息（通常是系统消息或最初的问题）。
+    token_counter 接收消息列表返回token数，每条消息只计算一次。
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, max_messages: Optional[int] = None,
+                 keep_first: bool = True,
+                 token_counter: Callable[[List[AnyMessage]], int] = count_tokens_approximately,
+                 max_threads: int = 1024):
+        super().__init__()
+        if max_tokens is None and max_messages is None:
+            raise ValueError("max_tokens 和 max_messages 至少需要设置一个")
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self.keep_first = keep_first
+        self.token_counter = token_counter
+        self.max_threads = max_threads
+        # 线程id -> 窗口，按最近使用做LRU淘汰；进程重启后首轮从消息列表重建
+        self._windows: "OrderedDict[Any, _Window]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def before_model(self, state: AgentState, runtime: Runtime) -> dict[str, Any] | None:
+        messages = state["messages"]
+        if not messages:
+            return None
+        thread_id = get_config().get("configurable", {}).get("thread_id")
+        with self._lock:
+            window = self._windows.pop(thread_id, None)
+            window = self._sync(window, messages)
+            self._windows[thread_id] = window
+            while len(self._windows) > self.max_threads:
+                self._windows.popitem(last=False)
+            evicted = self._evict(window, messages)
+        if not evicted:
+            return None
+        return {"messages": [RemoveMessage(id=message_id) for message_id in evicted]}
+
+    def _sync(self, window: Optional[_Window], messages: List[AnyMessage]) -> _Window:
+        """把窗口与当前消息列表对齐：只给新追加的消息计数，对不上时（首轮或历史被外部修改）整体重建"""
+        offset = 1 if self.keep_first else 0
+        if window is not None and len(messages) >= offset + len(window.entries) \
+                and (not self.keep_first or messages[0].id == window.pinned_id):
+            known = len(window.entries)
+            if known == 0 or messages[offset + known - 1].id == window.entries[-1][0]:
+                self._append(window, messages[offset + known:])
+                return window
+        window = _Window(pinned_id=messages[0].id if self.keep_first else None)
+        self._append(window, messages[offset:])
+        return window
+
+    def _append(self, window: _Window, new_messages: Iterable[AnyMessage]):
+        for message in new_messages:
+            tokens = self.token_counter([message])
+            window.entries.append((message.id, tokens))
+            window.total_tokens += tokens
+
+    def _over_limit(self, window: _Window) -> bool:
+        return (self.max_tokens is not None and window.total_tokens > self.max_tokens) or \
+            (self.max_messages is not None and len(window.entries) > self.max_messages)
+
+    def _evict(self, window: _Window, messages: List[AnyMessage]) -> List[str]:
+        """从窗口头部按组淘汰，直到不超过上限；最新的一组（当前轮的输入）始终保留"""
+        if not self._over_limit(window):
+            return []
+        offset = 1 if self.keep_first else 0
+        kinds = messages[offset:]
+        evicted: List[str] = []
+        index = 0
+        while self._over_limit(window) or (window.entries and isinstance(kinds[index], ToolMessage)):
+            group = self._group_size(kinds, index)
+            if group >= len(window.entries):
+                break
+            for _ in range(group):
+                message_id, tokens = window.entries.popleft()
+                window.total_tokens -= tokens
+                evicted.append(message_id)
+            index += group
+        return evicted
+
+    @staticmethod
+    def _group_size(messages: List[AnyMessage], index: int) -> int:
+        """从 index 开始的一组消息长度：带 tool_calls 的 AIMessage 连同其后的 ToolMessage 为一组"""
+        end = index + 1
+        if isinstance(messages[index], AIMessage) and messages[index].tool_calls:
+            while end < len(messages) and isinstance(messages[end], ToolMessage):
+                end += 1
+        return end - index
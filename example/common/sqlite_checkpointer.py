@@ -0,0 +1,416 @@
+"""
+紧凑的SQLite检查点 - 替代 InMemorySaver（进程重启后状态丢失、检查点无限增长）
+LangGraph 每一步都会写检查点，消息列表每步只追加一两条，但默认的检查点每次都把整个列表序列化一遍。
+这里对列表类型的通道（如 messages）只保存与上一版本相比新增的部分（基版本 + 公共前缀长度 + 新增元素），
+每隔 max_delta_chain 个增量写一次完整快照，读取时沿基版本链还原；较大的数据用 zlib 压缩；
+每个线程只保留最近 keep_last 个检查点，不再被引用的通道数据随之清理。
+人工审批（HumanInTheLoopMiddleware）的中断保存在 writes 表中，进程重启后用同一个 thread_id 即可恢复运行
+"""
+import asyncio
+import json
+import logging
+import operator
+import os
+import random
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ydc_ai_dev", "checkpoints.sqlite")
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS checkpoints ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, parent_id TEXT, "
+    "type TEXT NOT NULL, checkpoint BLOB NOT NULL, metadata_type TEXT NOT NULL, metadata BLOB NOT NULL, "
+    "versions TEXT NOT NULL, compressed INTEGER NOT NULL, "
+    "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))",
+    # kind: full 完整值 / delta 相对 base_version 的增量 / empty 通道无值
+    "CREATE TABLE IF NOT EXISTS blobs ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, version TEXT NOT NULL, "
+    "kind TEXT NOT NULL, base_version TEXT, prefix_len INTEGER, depth INTEGER NOT NULL, "
+    "type TEXT, data BLOB, compressed INTEGER NOT NULL, "
+    "PRIMARY KEY (thread_id, checkpoint_ns, channel, version))",
+    "CREATE TABLE IF NOT EXISTS writes ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+    "task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT NOT NULL, data BLOB NOT NULL, "
+    "compressed INTEGER NOT NULL, task_path TEXT NOT NULL, "
+    "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))",
+]
+
+
+@dataclass
+class _CachedList:
+    """某个线程某个通道最近写入或读取的列表值，作为下一次写入的增量基准"""
+    version: str
+    value: List[Any]
+    depth: int
+
+
+def _common_prefix(old: List[Any], new: List[Any]) -> int:
+    """两个列表的公共前缀长度；LangGraph 的 reducer 会复用未变化的消息对象，先按对象身份快速比较"""
+    n = min(len(old), len(new))
+    if all(map(operator.is_, old, new)):
+        return n
+    for i in range(n):
+        if old[i] is not new[i] and old[i] != new[i]:
+            return i
+    return n
+
+
+class CompactSqliteSaver(BaseCheckpointSaver[str]):
+    """SQLite检查点存储，用法与 InMemorySaver 相同：create_agent(..., checkpointer=CompactSqliteSaver(path))
+
+    max_delta_chain: 连续增量的最大个数，超过后写完整快照，限制冷读取时需要还原的链长；0 表示不使用增量
+    compress_level: zlib 压缩级别，0 表示不压缩；小于 compress_min_bytes 的数据不压缩
+    keep_last: 每个线程（及子图命名空间）保留的检查点个数，None 表示全部保留
+    cache_size: 内存中保留增量基准的 (线程, 通道) 个数，按LRU淘汰；未命中时该通道写完整快照
+
+    同一个消息对象被原地修改不会被识别为变化（LangGraph 的 reducer 总是用新对象替换消息）。
+    """
+
+    PRUNE_EVERY = 16
+
+    def __init__(self, path: str, *, serde: Optional[SerializerProtocol] = None, max_delta_chain: int = 50,
+                 compress_level: int = 6, compress_min_bytes: int = 512, keep_last: Optional[int] = 20,
+                 cache_size: int = 4096):
+        super().__init__(serde=serde)
+        self.path = path
+        self.max_delta_chain = max_delta_chain
+        self.compress_level = compress_level
+        self.compress_min_bytes = compress_min_bytes
+        self.keep_last = keep_last
+        self.cache_size = cache_size
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 所有读写共用一个连接，由 _lock 串行化；增量基准缓存也在同一把锁下维护
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+        self._lock = threading.RLock()
+        self._cache: "OrderedDict[Tuple[str, str, str], _CachedList]" = OrderedDict()
+        # (线程, 命名空间) -> 上次清理后的写入次数
+        self._puts_since_prune: Dict[Tuple[str, str], int] = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "CompactSqliteSaver":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ---------- 序列化 ----------
+
+    def _pack(self, value: Any) -> Tuple[str, bytes, int]:
+        type_, data = self.serde.dumps_typed(value)
+        if self.compress_level > 0 and len(data) >= self.compress_min_bytes:
+            compressed = zlib.compress(data, self.compress_level)
+            if len(compressed) < len(data):
+                return type_, compressed, 1
+        return type_, data, 0
+
+    def _unpack(self, type_: str, data: bytes, compressed: int) -> Any:
+        return self.serde.loads_typed((type_, zlib.decompress(data) if compressed else data))
+
+    # ---------- 通道数据 ----------
+
+    def _cache_put(self, key: Tuple[str, str, str], entry: _CachedList):
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _write_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str, values: Dict[str, Any]):
+        key = (thread_id, checkpoint_ns, channel)
+        if channel not in values:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, 'empty', NULL, NULL, 0, NULL, NULL, 0)",
+                (thread_id, checkpoint_ns, channel, version),
+            )
+            return
+        value = values[channel]
+        kind, base_version, prefix_len, depth, stored = "full", None, None, 0, value
+        if isinstance(value, list):
+            base = self._cache.get(key)
+            if base is not None and self.max_delta_chain > 0 and base.depth < self.max_delta_chain:
+                prefix_len = _common_prefix(base.value, value)
+                if prefix_len > 0:
+                    kind, base_version, depth, stored = "delta", base.version, base.depth + 1, value[prefix_len:]
+            if kind == "full":
+                prefix_len = None
+            self._cache_put(key, _CachedList(version=version, value=list(value), depth=depth))
+        type_, data, compressed = self._pack(stored)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, channel, version, kind, base_version, prefix_len, depth, type_, data,
+             compressed),
+        )
+
+    def _load_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str) -> Tuple[bool, Any]:
+        """还原某个通道版本的值，返回 (是否有值, 值)；增量沿 base_version 向前找到完整快照后依次应用"""
+        key = (thread_id, checkpoint_ns, channel)
+        cached = self._cache.get(key)
+        if cached is not None and cached.version == version:
+            self._cache.move_to_end(key)
+            return True, list(cached.value)
+        # 一条递归查询取出整条增量链（从目标版本到完整快照），避免每一环一次往返
+        chain = self._conn.execute(
+            "WITH RECURSIVE chain(kind, base_version, prefix_len, depth, type, data, compressed) AS ("
+            "SELECT kind, base_version, prefix_len, depth, type, data, compressed FROM blobs "
+            "WHERE thread_id = ?1 AND checkpoint_ns = ?2 AND channel = ?3 AND version = ?4 "
+            "UNION ALL SELECT b.kind, b.base_version, b.prefix_len, b.depth, b.type, b.data, b.compressed "
+            "FROM blobs b JOIN chain c ON c.kind = 'delta' AND b.version = c.base_version "
+            "WHERE b.thread_id = ?1 AND b.checkpoint_ns = ?2 AND b.channel = ?3) "
+            "SELECT * FROM chain",
+            (thread_id, checkpoint_ns, channel, version),
+        ).fetchall()
+        if not chain:
+            return False, None
+        if chain[-1][0] == "delta":
+            logger.warning(f"通道 {channel} 的增量基准 {chain[-1][1]} 缺失，线程 {thread_id}")
+            return False, None
+        kind, _, _, _, type_, data, compressed = chain[-1]
+        if kind == "empty":
+            return False, None
+        value = self._unpack(type_, data, compressed)
+        for _, _, prefix_len, _, type_, data, compressed in reversed(chain[:-1]):
+            value = value[:prefix_len] + self._unpack(type_, data, compressed)
+        if isinstance(value, list):
+            self._cache_put(key, _CachedList(version=version, value=list(value), depth=chain[0][3]))
+        return True, value
+
+    # ---------- 读取 ----------
+
+    def _pending_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        rows = self._conn.execute(
+            "SELECT task_id, channel, type, data, compressed FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self._unpack(type_, data, compressed))
+                for task_id, channel, type_, data, compressed in rows]
+
+    def _to_tuple(self, row: tuple, metadata: Optional[CheckpointMetadata] = None) -> CheckpointTuple:
+        (thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data, metadata_type, metadata_data,
+         _, compressed) = row
+        checkpoint: Checkpoint = self._unpack(type_, data, compressed)
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            found, value = self._load_blob(thread_id, checkpoint_ns, channel, version)
+            if found:
+                channel_values[channel] = value
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                     "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=metadata if metadata is not None else self.serde.loads_typed((metadata_type, metadata_data)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                  "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=self._pending_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._to_tuple(row) if row is not None else None
+
+    def list(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+             before: RunnableConfig | None = None, limit: int | None = None) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM checkpoints {where}ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC", params
+            ).fetchall()
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            with self._lock:
+                metadata = self.serde.loads_typed((row[6], row[7]))
+                if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+                checkpoint_tuple = self._to_tuple(row, metadata)
+            if limit is not None:
+                limit -= 1
+            yield checkpoint_tuple
+
+    # ---------- 写入 ----------
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        type_, data, compressed = self._pack(c)
+        # 元数据很小且 list 过滤时要逐条解析，不压缩
+        metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock, self._conn:
+            for channel, version in new_versions.items():
+                self._write_blob(thread_id, checkpoint_ns, channel, str(version), values)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, data, metadata_type, metadata_data, json.dumps(c["channel_versions"]), compressed),
+            )
+            if self.keep_last is not None:
+                key = (thread_id, checkpoint_ns)
+                count = self._puts_since_prune.get(key, 0) + 1
+                if count >= self.PRUNE_EVERY:
+                    self._puts_since_prune.pop(key, None)
+                    self._prune(thread_id, checkpoint_ns)
+                else:
+                    self._puts_since_prune[key] = count
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # 普通写入已存在时保留原值，特殊通道（中断、恢复值等，idx 为负）覆盖，与 InMemorySaver 一致
+        rows: Dict[str, List[tuple]] = {"IGNORE": [], "REPLACE": []}
+        for idx, (channel, value) in enumerate(writes):
+            type_, data, compressed = self._pack(value)
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            rows["REPLACE" if idx < 0 else "IGNORE"].append(
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type_, data, compressed, task_path))
+        with self._lock, self._conn:
+            for conflict, group in rows.items():
+                self._conn.executemany(
+                    f"INSERT OR {conflict} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", group)
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        """删除最近 keep_last 个以外的检查点及其写入，再删除不再被引用（含作为增量基准）的通道数据"""
+        stale = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_last),
+        ).fetchall()
+        if not stale:
+            return
+        for table in ("checkpoints", "writes"):
+            self._conn.executemany(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(thread_id, checkpoint_ns, checkpoint_id) for (checkpoint_id,) in stale],
+            )
+        live = set()
+        for (versions,) in self._conn.execute(
+                "SELECT versions FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns)):
+            live.update((channel, str(version)) for channel, version in json.loads(versions).items())
+        # 内存中的增量基准还会被下一次写入引用
+        live.update((key[2], entry.version) for key, entry in self._cache.items()
+                    if key[0] == thread_id and key[1] == checkpoint_ns)
+        bases = {(channel, version): base_version for channel, version, base_version in self._conn.execute(
+            "SELECT channel, version, base_version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns))}
+        keep = set()
+        for channel, version in live:
+            while (channel, version) in bases and (channel, version) not in keep:
+                keep.add((channel, version))
+                version = bases[(channel, version)]
+                if version is None:
+                    break
+        self._conn.executemany(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            [(thread_id, checkpoint_ns, channel, version) for channel, version in bases.keys() - keep],
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._conn:
+            for table in ("checkpoints", "blobs", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            for key in [key for key in self._cache if key[0] == thread_id]:
+                del self._cache[key]
+            for key in [key for key in self._puts_since_prune if key[0] == thread_id]:
+                del self._puts_since_prune[key]
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        # 与 InMemorySaver 相同：单调递增的序号 + 随机后缀，从同一检查点分叉出的两个版本不会冲突
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ---------- 异步接口：在线程池中执行同步版本 ----------
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+                    before: RunnableConfig | None = None, limit: int | None = None) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: [*self.list(config, filter=filter, before=before, limit=limit)])
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def default_checkpointer() -> CompactSqliteSaver:
+    """示例使用的检查点，数据库文件由环境变量 CHECKPOINT_DB 指定，默认 ~/.cache/ydc_ai_dev/checkpoints.sqlite"""
+    return CompactSqliteSaver(os.getenv("CHECKPOINT_DB") or DEFAULT_DB_PATH)
@@ -0,0 +1,116 @@
+"""
+本地缓存的token计数器 - 替代 token_counter=base_model（每次计数都要请求一次模型）
+使用离线的 BPE 词表文件（tiktoken 格式，如 cl100k_base.tiktoken / qwen.tiktoken）在本地分词，不访问网络；
+每条消息的token数按 消息id + 内容哈希 缓存，同一段历史每轮重复计数时直接命中，内容被修改（如工具结果被清空）后重新计算。
+可直接作为 trim_messages、SummarizationMiddleware 的 token_counter；ContextEditingMiddleware 使用 token_counter_middleware
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.messages.utils import convert_to_messages
+
+logger = logging.getLogger(__name__)
+
+# cl100k_base 的预分词正则，Qwen 的 tiktoken 词表也使用相近的规则
+CL100K_PATTERN = (r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]++[\r\n]*|"""
+                  r"""\s*[\r\n]|\s+(?!\S)|\s+""")
+# 每条消息的格式开销（角色标记、分隔符），与 OpenAI 的计数方式一致
+TOKENS_PER_MESSAGE = 3
+
+
+def load_bpe_encoder(vocab_file: str, pat_str: str = CL100K_PATTERN) -> Callable[[str], int]:
+    """从本地 tiktoken 格式词表文件构造编码器，返回 文本 -> token数 的函数"""
+    import tiktoken
+    from tiktoken.load import load_tiktoken_bpe
+
+    encoding = tiktoken.Encoding(
+        name=os.path.basename(vocab_file),
+        pat_str=pat_str,
+        mergeable_ranks=load_tiktoken_bpe(vocab_file),
+        special_tokens={},
+    )
+    return lambda text: len(encoding.encode_ordinary(text))
+
+
+def _approximate_encoder(text: str) -> int:
+    # 与 count_tokens_approximately 相同的估算方式：约4个字符一个token
+    return -(-len(text) // 4)
+
+
+def _content_text(message: BaseMessage) -> str:
+    """消息中参与计数的文本：内容、名称和工具调用参数"""
+    content = message.content
+    if isinstance(content, str):
+        parts = [content]
+    else:
+        parts = [block if isinstance(block, str) else
+                 block.get("text", "") if block.get("type") == "text" else json.dumps(block, ensure_ascii=False)
+                 for block in content]
+    if message.name:
+        parts.append(message.name)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        parts.append(json.dumps(message.tool_calls, ensure_ascii=False, sort_keys=True))
+    return "".join(parts)
+
+
+class CachedTokenCounter:
+    """带缓存的token计数器，调用方式与 count_tokens_approximately 相同：counter(messages) -> int"""
+
+    def __init__(self, encode: Optional[Callable[[str], int]] = None, max_entries: int = 50_000,
+                 tokens_per_message: int = TOKENS_PER_MESSAGE):
+        self.encode = encode or _approximate_encoder
+        self.max_entries = max_entries
+        self.tokens_per_message = tokens_per_message
+        self._cache: "OrderedDict[Tuple[Optional[str], str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, messages: Iterable[Any]) -> int:
+        if isinstance(messages, BaseMessage):
+            messages = [messages]
+        return sum(self.count_message(message) for message in convert_to_messages(messages))
+
+    def count_message(self, message: BaseMessage) -> int:
+        text = _content_text(message)
+        # 同一id的消息内容可能被修改，哈希放在键里保证修改后重新计数
+        digest = hashlib.blake2b(f"{message.type}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+        key = (message.id, digest)
+        with self._lock:
+            tokens = self._cache.get(key)
+            if tokens is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return tokens
+        tokens = self.encode(text) + self.encode(message.type) + self.tokens_per_message
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = tokens
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return tokens
+
+
+_default_token_counter: Optional[CachedTokenCounter] = None
+_default_token_counter_lock = threading.Lock()
+
+
+def default_token_counter() -> CachedTokenCounter:
+    """进程内共享的计数器；词表文件由环境变量 TOKENIZER_VOCAB_FILE 指定，未配置时按字符数估算（同样带缓存）"""
+    global _default_token_counter
+    with _default_token_counter_lock:
+        if _default_token_counter is None:
+            vocab_file = os.getenv("TOKENIZER_VOCAB_FILE")
+            encode = None
+            if vocab_file:
+                encode = load_bpe_encoder(vocab_file)
+            else:
+                logger.info("未设置 TOKENIZER_VOCAB_FILE，token数按字符数估算")
+            _default_token_counter = CachedTokenCounter(encode)
+    return _default_token_counter
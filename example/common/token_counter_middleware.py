@@ -0,0 +1,42 @@
+"""
+使用缓存token计数器的上下文编辑中间件 - ContextEditingMiddleware 只支持近似计数或调用模型计数，
+这里改为传入 CachedTokenCounter，编辑策略（如 ClearToolUsesEdit）不变
+"""
+from typing import Awaitable, Callable, Iterable, Optional
+
+from langchain.agents.middleware import ContextEditingMiddleware, ModelRequest, ModelResponse
+from langchain.agents.middleware.context_editing import ContextEdit
+from langchain.agents.middleware.types import ModelCallResult
+
+from example.common.token_counter import CachedTokenCounter, default_token_counter
+
+
+class CachedTokenContextEditingMiddleware(ContextEditingMiddleware):
+    """上下文编辑中间件，token 数由本地缓存计数器计算，不访问模型"""
+
+    def __init__(self, *, edits: Optional[Iterable[ContextEdit]] = None,
+                 token_counter: Optional[CachedTokenCounter] = None):
+        super().__init__(edits=edits)
+        self.token_counter = token_counter or default_token_counter()
+
+    def wrap_model_call(
+            self,
+            request: ModelRequest,
+            handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelCallResult:
+        if not request.messages:
+            return handler(request)
+        for edit in self.edits:
+            edit.apply(request.messages, count_tokens=self.token_counter)
+        return handler(request)
+
+    async def awrap_model_call(
+            self,
+            request: ModelRequest,
+            handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelCallResult:
+        if not request.messages:
+            return await handler(request)
+        for edit in self.edits:
+            edit.apply(request.messages, count_tokens=self.token_counter)
+        return await handler(request)
@@ -0,0 +1,273 @@
+"""
+工具结果缓存 - 以 工具名 + 规范化后的参数 为键，避免同一会话内、不同用户之间重复调用上游
+支持按工具设置TTL、LRU容量上限、错误结果的负缓存（较短TTL）以及命中/未命中计数；
+可作为函数装饰器使用，LangChain Agent 使用 tool_cache_middleware.ToolResultCacheMiddleware。
+存储后端：进程内 MemoryCacheBackend，或多个工作进程共享的 SQLiteCacheBackend
+"""
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_arguments(arguments: Dict[str, Any]) -> str:
+    """参数规范化：键排序、紧凑分隔符，保证 {"a":1,"b":2} 与 {"b":2,"a":1} 得到同一个键"""
+    return json.dumps(arguments, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def cache_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(canonical_arguments(arguments).encode("utf-8")).hexdigest()
+    return f"{tool_name}:{digest}"
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目；is_error 为 True 时 value 是错误信息（负缓存）"""
+    value: Any
+    is_error: bool = False
+    expires_at: Optional[float] = None
+
+    def expired(self, now: float) -> bool:
+        return self.expires_at is not None and now >= self.expires_at
+
+
+@dataclass
+class CacheStats:
+    """命中统计"""
+    hits: int = 0
+    misses: int = 0
+    negative_hits: int = 0
+    stores: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class CachedToolError(RuntimeError):
+    """命中负缓存：该参数组合最近一次调用失败，在错误TTL内直接返回同样的错误"""
+
+
+class MemoryCacheBackend:
+    """进程内LRU缓存"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, now: float) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expired(now):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """基于SQLite文件的缓存，多个进程打开同一个文件即可共享结果
+
+    使用WAL模式支持并发读写；每个线程一个连接。按最近访问时间做LRU淘汰，
+    淘汰检查每写入 EVICT_EVERY 次做一次，避免每次写入都统计行数。值以JSON存储，无法序列化的结果不缓存。
+    """
+
+    EVICT_EVERY = 64
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, is_error INTEGER NOT NULL, "
+            "expires_at REAL, last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS tool_cache_last_access ON tool_cache (last_access)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None 即自动提交，每条语句单独成事务
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, now: float) -> Optional[CacheEntry]:
+        conn = self._connection()
+        row = conn.execute("SELECT value, is_error, expires_at FROM tool_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, is_error, expires_at = row
+        if expires_at is not None and now >= expires_at:
+            conn.execute("DELETE FROM tool_cache WHERE key = ? AND expires_at = ?", (key, expires_at))
+            return None
+        conn.execute("UPDATE tool_cache SET last_access = ? WHERE key = ?", (now, key))
+        return CacheEntry(value=json.loads(value), is_error=bool(is_error), expires_at=expires_at)
+
+    def set(self, key: str, entry: CacheEntry):
+        try:
+            value = json.dumps(entry.value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            logger.debug(f"工具结果无法序列化为JSON，跳过缓存: {key}")
+            return
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO tool_cache (key, value, is_error, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, value, int(entry.is_error), entry.expires_at, time.time()),
+        )
+        with self._writes_lock:
+            self._writes += 1
+            should_evict = self._writes % self.EVICT_EVERY == 0
+        if should_evict:
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        (count,) = conn.execute("SELECT COUNT(*) FROM tool_cache").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM tool_cache WHERE key IN (SELECT key FROM tool_cache ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        self._connection().execute("DELETE FROM tool_cache")
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM tool_cache").fetchone()[0]
+
+
+class ToolResultCache:
+    """工具结果缓存
+
+    default_ttl / ttl_by_tool 为成功结果的存活秒数（None 表示不过期，0 表示该工具不缓存）；
+    error_ttl 为错误结果的存活秒数，设为 0 即关闭负缓存。
+    """
+
+    def __init__(self, backend=None, default_ttl: Optional[float] = 300.0,
+                 ttl_by_tool: Optional[Dict[str, Optional[float]]] = None, error_ttl: float = 30.0):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.default_ttl = default_ttl
+        self.ttl_by_tool = dict(ttl_by_tool or {})
+        self.error_ttl = error_ttl
+        self._stats: Dict[str, CacheStats] = {}
+        self._stats_lock = threading.Lock()
+
+    def ttl_for(self, tool_name: str) -> Optional[float]:
+        return self.ttl_by_tool.get(tool_name, self.default_ttl)
+
+    def lookup(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[CacheEntry]:
+        """查询缓存并计数；未命中或该工具不缓存时返回 None"""
+        if self.ttl_for(tool_name) == 0:
+            return None
+        entry = self.backend.get(cache_key(tool_name, arguments), time.time())
+        with self._stats_lock:
+            stats = self._stats.setdefault(tool_name, CacheStats())
+            if entry is None:
+                stats.misses += 1
+            else:
+                stats.hits += 1
+                if entry.is_error:
+                    stats.negative_hits += 1
+        return entry
+
+    def store(self, tool_name: str, arguments: Dict[str, Any], value: Any, is_error: bool = False):
+        if self.ttl_for(tool_name) == 0:
+            return
+        ttl = self.error_ttl if is_error else self.ttl_for(tool_name)
+        if ttl == 0:
+            return
+        expires_at = None if ttl is None else time.time() + ttl
+        self.backend.set(cache_key(tool_name, arguments), CacheEntry(value, is_error, expires_at))
+        with self._stats_lock:
+            self._stats.setdefault(tool_name, CacheStats()).stores += 1
+
+    def stats(self, tool_name: Optional[str] = None) -> CacheStats:
+        """某个工具或全部工具的命中统计（返回副本）"""
+        with self._stats_lock:
+            if tool_name is not None:
+                stats = self._stats.get(tool_name, CacheStats())
+                return CacheStats(stats.hits, stats.misses, stats.negative_hits, stats.stores)
+            total = CacheStats()
+            for stats in self._stats.values():
+                total.hits += stats.hits
+                total.misses += stats.misses
+                total.negative_hits += stats.negative_hits
+                total.stores += stats.stores
+            return total
+
+    def cached(self, func: Optional[Callable[..., Any]] = None, *, name: Optional[str] = None):
+        """装饰器：按 工具名 + 绑定后的参数 缓存返回值，异常按 error_ttl 负缓存后原样抛出
+
+        name 默认为函数名；可直接装饰函数，也可 cached(name="...") 带参数使用。
+        """
+        def decorator(f: Callable[..., Any]) -> Callable[..., Any]:
+            tool_name = name or f.__name__
+            signature = inspect.signature(f)
+
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                arguments = dict(bound.arguments)
+                entry = self.lookup(tool_name, arguments)
+                if entry is not None:
+                    if entry.is_error:
+                        raise CachedToolError(entry.value)
+                    return entry.value
+                try:
+                    result = f(*args, **kwargs)
+                except Exception as e:
+                    self.store(tool_name, arguments, f"{type(e).__name__}: {e}", is_error=True)
+                    raise
+                self.store(tool_name, arguments, result)
+                return result
+
+            return wrapper
+
+        return decorator(func) if func is not None else decorator
+
+
+_default_tool_cache: Optional[ToolResultCache] = None
+_default_tool_cache_lock = threading.Lock()
+
+
+def default_tool_cache() -> ToolResultCache:
+    """进程内共享的默认缓存（内存后端）"""
+    global _default_tool_cache
+    with _default_tool_cache_lock:
+        if _default_tool_cache is None:
+            _default_tool_cache = ToolResultCache()
+    return _default_tool_cache
@@ -0,0 +1,68 @@
+"""
+工具结果缓存中间件 - 把 ToolResultCache 以 wrap_tool_call 中间件的形式挂到 LangChain Agent 上
+"""
+from typing import Awaitable, Callable, Iterable, Optional
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.tools.tool_node import ToolCallRequest
+from langchain_core.messages import ToolMessage
+from langgraph.types import Command
+
+from example.common.tool_cache import ToolResultCache
+
+
+class ToolResultCacheMiddleware(AgentMiddleware):
+    """LangChain 工具调用中间件：命中时不执行工具，直接用缓存内容构造 ToolMessage
+
+    缓存的是 ToolMessage 的内容和状态，命中时按本次调用的 tool_call_id 重新构造消息；
+    status 为 error 的消息按负缓存处理，返回 Command 的工具不缓存。
+    """
+
+    def __init__(self, cache: ToolResultCache, tools: Optional[Iterable[str]] = None):
+        super().__init__()
+        self.cache = cache
+        self.tools = frozenset(tools) if tools is not None else None
+
+    def _cacheable(self, request: ToolCallRequest) -> bool:
+        return self.tools is None or request.tool_call["name"] in self.tools
+
+    def _hit(self, request: ToolCallRequest) -> Optional[ToolMessage]:
+        tool_call = request.tool_call
+        entry = self.cache.lookup(tool_call["name"], tool_call["args"])
+        if entry is None:
+            return None
+        return ToolMessage(content=entry.value, tool_call_id=tool_call["id"], name=tool_call["name"],
+                           status="error" if entry.is_error else "success")
+
+    def _store(self, request: ToolCallRequest, result: ToolMessage | Command):
+        if isinstance(result, ToolMessage):
+            tool_call = request.tool_call
+            self.cache.store(tool_call["name"], tool_call["args"], result.content, is_error=result.status == "error")
+
+    def wrap_tool_call(
+            self,
+            request: ToolCallRequest,
+            handler: Callable[[ToolCallRequest], ToolMessage | Command],
+    ) -> ToolMessage | Command:
+        if not self._cacheable(request):
+            return handler(request)
+        cached = self._hit(request)
+        if cached is not None:
+            return cached
+        result = handler(request)
+        self._store(request, result)
+        return result
+
+    async def awrap_tool_call(
+            self,
+            request: ToolCallRequest,
+            handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+    ) -> ToolMessage | Command:
+        if not self._cacheable(request):
+            return await handler(request)
+        cached = self._hit(request)
+        if cached is not None:
+            return cached
+        result = await handler(request)
+        self._store(request, result)
+        return result
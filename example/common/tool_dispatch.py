@@ -0,0 +1,123 @@
+"""
+工具调用并发分发 - 模型一次返回多个 tool_calls 时并发执行，按原顺序收集结果
+流式场景下由 ToolCallAssembler 拼装 tool_calls 增量片段，某个调用的参数一完整就可以用 submit_tool_call 提前开始执行
+"""
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# 进程内共享的线程池，避免每轮对话都创建新的线程
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+MAX_WORKERS = 8
+
+
+def _shared_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tool-call")
+    return _pool
+
+
+def _run_tool(execute: Callable[[str, Dict[str, Any]], str], tool_name: str, arguments: Dict[str, Any]) -> str:
+    try:
+        return execute(tool_name, arguments)
+    except Exception as e:
+        return f"工具执行错误: {e}"
+
+
+def submit_tool_call(call: Dict[str, Any], execute: Callable[[str, Dict[str, Any]], str]) -> Future:
+    """把单个工具调用提交到共享线程池，立即返回 Future"""
+    return _shared_pool().submit(_run_tool, execute, call["name"], call["arguments"])
+
+
+def collect_results(tool_calls: Sequence[Dict[str, Any]], futures: Sequence[Future], deadline: float,
+                    timeout: float) -> List[str]:
+    """按原顺序收集结果，所有工具共用同一个截止时刻 deadline（time.monotonic）"""
+    results = []
+    for call, future in zip(tool_calls, futures):
+        try:
+            results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+        except TimeoutError:
+            future.cancel()
+            results.append(f"工具 {call['name']} 执行超时（{timeout}秒）")
+    return results
+
+
+def dispatch_tool_calls(tool_calls: List[Dict[str, Any]], execute: Callable[[str, Dict[str, Any]], str],
+                        timeout: float = 10.0) -> List[str]:
+    """并发执行工具调用，返回与 tool_calls 一一对应的结果列表
+
+    tool_calls 中每项为 {"name": 工具名, "arguments": 参数字典}；
+    每个工具最多等待 timeout 秒（从分发时刻起算），超时的位置返回超时提示，不影响其他工具的结果。
+    超时的工具线程无法被强制终止，会在后台执行完毕后被丢弃。
+    """
+    deadline = time.monotonic() + timeout
+    futures = [submit_tool_call(call, execute) for call in tool_calls]
+    return collect_results(tool_calls, futures, deadline, timeout)
+
+
+class ToolCallAssembler:
+    """把流式响应中的 tool_calls 增量片段拼装成完整调用
+
+    每个增量形如 {"index": 0, "id": "...", "function": {"name": "...", "arguments": "<JSON片段>"}}，
+    同一 index 的 arguments 依次拼接。参数是JSON对象，右花括号闭合后不可能再被续写，
+    因此某个调用的参数一能完整解析就立即产出，调用方可以不等整条响应结束就开始执行该工具。
+    """
+
+    def __init__(self):
+        # index -> {"id", "name", "arguments"(已拼接的原始文本)}
+        self._partial: Dict[int, Dict[str, Any]] = {}
+        self._completed: Dict[int, Dict[str, Any]] = {}
+
+    def feed(self, deltas: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """接收一个事件中的 tool_calls 增量，返回本次新完成的调用 {"id", "name", "arguments"(字典)}"""
+        ready = []
+        for position, delta in enumerate(deltas or []):
+            index = delta.get("index", position)
+            if index in self._completed:
+                continue
+            partial = self._partial.setdefault(index, {"id": None, "name": "", "arguments": ""})
+            if delta.get("id"):
+                partial["id"] = delta["id"]
+            function = delta.get("function") or {}
+            if function.get("name"):
+                partial["name"] = function["name"]
+            fragment = function.get("arguments") or ""
+            partial["arguments"] += fragment
+            # 只有新片段含右花括号时参数才可能闭合，避免每个片段都尝试解析
+            if partial["name"] and "}" in fragment:
+                arguments = self._parse_arguments(partial["arguments"])
+                if arguments is not None:
+                    ready.append(self._complete(index, arguments))
+        return ready
+
+    def close(self) -> List[Dict[str, Any]]:
+        """流结束时收尾：参数为空的调用按无参数处理，无法解析的参数也按空字典处理"""
+        ready = []
+        for index in sorted(self._partial):
+            partial = self._partial[index]
+            if partial["name"]:
+                ready.append(self._complete(index, self._parse_arguments(partial["arguments"]) or {}))
+        return ready
+
+    def calls(self) -> List[Dict[str, Any]]:
+        """已完成的调用，按 index 排序"""
+        return [self._completed[index] for index in sorted(self._completed)]
+
+    def _complete(self, index: int, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        partial = self._partial.pop(index)
+        call = {"id": partial["id"] or f"call_{index}", "name": partial["name"], "arguments": arguments}
+        self._completed[index] = call
+        return call
+
+    @staticmethod
+    def _parse_arguments(text: str) -> Optional[Dict[str, Any]]:
+        try:
+            arguments = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return arguments if isinstance(arguments, dict) else None
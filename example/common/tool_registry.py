@@ -0,0 +1,289 @@
+"""
+工具注册表 - 函数只注册一次，按名称 O(1) 分发
+注册时从函数签名推导 JSON Schema，并预先生成提示词片段（文本列表 / XML）和参数校验器，
+之后每轮对话直接复用缓存结果，不再重复构造 tools 列表
+"""
+import inspect
+import json
+import threading
+import typing
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+
+class UnknownToolError(LookupError):
+    """工具未注册"""
+
+
+class ToolArgumentError(ValueError):
+    """工具参数不合法"""
+
+
+# Python 类型 -> JSON Schema 类型
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+
+def _coerce_string(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _coerce_integer(value: Any) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise ToolArgumentError(f"应为整数，实际为 {value!r}")
+
+
+def _coerce_number(value: Any) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    raise ToolArgumentError(f"应为数字，实际为 {value!r}")
+
+
+def _coerce_boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    raise ToolArgumentError(f"应为布尔值，实际为 {value!r}")
+
+
+def _json_coercer(expected: type, type_name: str) -> Callable[[Any], Any]:
+    def coerce(value: Any) -> Any:
+        # XML格式的工具调用里参数都是字符串，数组/对象按JSON解析
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                pass
+        if isinstance(value, expected):
+            return value
+        raise ToolArgumentError(f"应为{type_name}，实际为 {value!r}")
+    return coerce
+
+
+# JSON Schema 类型 -> 参数转换函数（同时完成类型校验）
+COERCERS: Dict[str, Callable[[Any], Any]] = {
+    "string": _coerce_string,
+    "integer": _coerce_integer,
+    "number": _coerce_number,
+    "boolean": _coerce_boolean,
+    "array": _json_coercer(list, "数组"),
+    "object": _json_coercer(dict, "对象"),
+}
+
+
+@dataclass
+class ToolParameter:
+    """工具参数"""
+    name: str
+    type: str
+    description: str = ""
+    required: bool = True
+
+
+@dataclass
+class ToolSpec:
+    """已注册的工具；schema 和提示词片段在注册时生成一次"""
+    name: str
+    description: str
+    func: Callable[..., Any]
+    parameters: List[ToolParameter]
+    schema: Dict[str, Any] = field(init=False)
+    prompt_line: str = field(init=False)
+    xml_fragment: str = field(init=False)
+    validate: Callable[[Dict[str, Any]], Dict[str, Any]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.schema = {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        p.name: {"type": p.type, "description": p.description} if p.description else {"type": p.type}
+                        for p in self.parameters
+                    },
+                    "required": [p.name for p in self.parameters if p.required],
+                },
+            },
+        }
+        if self.parameters:
+            params = "; ".join(
+                f"{p.name} ({p.type}, {'required' if p.required else 'optional'})"
+                + (f" - {p.description}" if p.description else "")
+                for p in self.parameters
+            )
+            self.prompt_line = f"{self.name}: {self.description}，参数：{params}"
+        else:
+            self.prompt_line = f"{self.name}: {self.description}，无需参数"
+        xml_params = "".join(
+            f"\n    <parameter name={quoteattr(p.name)} type={quoteattr(p.type)} "
+            f"required=\"{str(p.required).lower()}\">{escape(p.description)}</parameter>"
+            for p in self.parameters
+        )
+        self.xml_fragment = (f"<tool name={quoteattr(self.name)} description={quoteattr(self.description)}>"
+                             f"{xml_params}\n</tool>" if xml_params else
+                             f"<tool name={quoteattr(self.name)} description={quoteattr(self.description)}/>")
+        self.validate = self._compile_validator()
+
+    def _compile_validator(self) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """预先把参数表编译成闭包，校验时只做字典查找和类型转换"""
+        required = frozenset(p.name for p in self.parameters if p.required)
+        coercers = {p.name: COERCERS[p.type] for p in self.parameters}
+        tool_name = self.name
+
+        def validate(arguments: Dict[str, Any]) -> Dict[str, Any]:
+            if not isinstance(arguments, dict):
+                raise ToolArgumentError(f"工具 {tool_name} 的参数应为对象，实际为 {arguments!r}")
+            missing = required.difference(arguments)
+            if missing:
+                raise ToolArgumentError(f"工具 {tool_name} 缺少必填参数: {sorted(missing)}")
+            validated = {}
+            for key, value in arguments.items():
+                coerce = coercers.get(key)
+                if coerce is None:
+                    raise ToolArgumentError(f"工具 {tool_name} 不支持参数: {key}")
+                try:
+                    validated[key] = coerce(value)
+                except ToolArgumentError as e:
+                    raise ToolArgumentError(f"工具 {tool_name} 的参数 {key} {e}") from None
+            return validated
+
+        return validate
+
+
+def _parameters_from_signature(func: Callable[..., Any], descriptions: Dict[str, str]) -> List[ToolParameter]:
+    """从函数签名推导参数：类型注解决定类型，没有默认值的参数为必填"""
+    hints = typing.get_type_hints(func)
+    parameters = []
+    for name, param in inspect.signature(func).parameters.items():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        annotation = hints.get(name, str)
+        # Optional[X] 按 X 处理
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+            annotation = args[0]
+        annotation = typing.get_origin(annotation) or annotation
+        if annotation not in JSON_TYPES:
+            raise TypeError(f"参数 {name} 的类型 {annotation!r} 无法映射为 JSON Schema 类型")
+        parameters.append(ToolParameter(
+            name=name,
+            type=JSON_TYPES[annotation],
+            description=descriptions.get(name, ""),
+            required=param.default is inspect.Parameter.empty,
+        ))
+    return parameters
+
+
+class ToolRegistry:
+    """工具注册表"""
+
+    def __init__(self):
+        self._tools: Dict[str, ToolSpec] = {}
+        # 按工具名组合缓存拼好的 tools 列表和提示词，注册新工具时清空
+        self._schema_cache: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        self._prompt_cache: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        self._lock = threading.Lock()
+
+    def register(self, func: Optional[Callable[..., Any]] = None, *, name: Optional[str] = None,
+                 description: Optional[str] = None, params: Optional[Dict[str, str]] = None):
+        """注册工具，可直接调用或作为装饰器使用
+
+        name 默认为函数名，description 默认为 docstring 第一行，params 为参数名到参数说明的映射。
+        """
+        def decorator(f: Callable[..., Any]) -> Callable[..., Any]:
+            doc = (inspect.getdoc(f) or "").strip()
+            spec = ToolSpec(
+                name=name or f.__name__,
+                description=description or (doc.splitlines()[0] if doc else ""),
+                func=f,
+                parameters=_parameters_from_signature(f, params or {}),
+            )
+            with self._lock:
+                self._tools[spec.name] = spec
+                self._schema_cache.clear()
+                self._prompt_cache.clear()
+            return f
+
+        return decorator(func) if func is not None else decorator
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def names(self) -> List[str]:
+        return list(self._tools)
+
+    def get(self, name: str) -> ToolSpec:
+        spec = self._tools.get(name)
+        if spec is None:
+            raise UnknownToolError(name)
+        return spec
+
+    def schemas(self, names: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """function calling 的 tools 列表（缓存，调用方不要修改）"""
+        key = self._key(names)
+        cached = self._schema_cache.get(key)
+        if cached is None:
+            cached = [self.get(n).schema for n in key]
+            self._schema_cache[key] = cached
+        return cached
+
+    def text_prompt(self, names: Optional[Iterable[str]] = None) -> str:
+        """编号的工具说明列表，用于提示词"""
+        return self._cached_prompt("text", names, lambda specs: "\n".join(
+            f"{i}. {spec.prompt_line}" for i, spec in enumerate(specs, 1)))
+
+    def xml_prompt(self, names: Optional[Iterable[str]] = None) -> str:
+        """XML格式的工具定义，用于XML提示词"""
+        return self._cached_prompt("xml", names, lambda specs: "<tools>\n" + "\n".join(
+            spec.xml_fragment for spec in specs) + "\n</tools>")
+
+    def execute(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> Any:
+        """按名称分发：校验参数后调用工具函数
+
+        未注册时抛出 UnknownToolError，参数不合法时抛出 ToolArgumentError
+        """
+        spec = self.get(name)
+        return spec.func(**spec.validate(arguments or {}))
+
+    def execute_text(self, name: str, text: str) -> Any:
+        """以单个文本输入调用工具（ReAct / Plan-and-Execute 的 Action 只有一个输入），绑定到第一个参数"""
+        spec = self.get(name)
+        if not spec.parameters:
+            return spec.func()
+        return spec.func(**spec.validate({spec.parameters[0].name: text}))
+
+    def _key(self, names: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        return tuple(self._tools) if names is None else tuple(names)
+
+    def _cached_prompt(self, kind: str, names: Optional[Iterable[str]],
+                       build: Callable[[List[ToolSpec]], str]) -> str:
+        key = (kind, self._key(names))
+        cached = self._prompt_cache.get(key)
+        if cached is None:
+            cached = build([self.get(n) for n in key[1]])
+            self._prompt_cache[key] = cached
+        return cached
@@ -5,7 +5,7 @@ import os
 from dataclasses import dataclass
 
 from dotenv import load_dotenv
-from langgraph.store.memory import InMemoryStore
+from example.common.indexed_store import IndexedStore
 
 load_dotenv()
 
@@ -38,7 +38,8 @@ def get_weather(location: str, runtime: ToolRuntime) -> str:
     return {"messages": [{"role": "assistant", "content": f"It's sunny in {location}."}]}
 
 
-store = InMemoryStore()
+# 按 city 建索引，search(filter={"city": ...}) 不再扫描整个命名空间
+store = IndexedStore(filter_fields=["city"])
 agent = create_agent(
     model=ChatOpenAI(api_key=os.getenv("DASHSCOPE_API_KEY"),
                      base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
@@ -1,8 +1,22 @@
+import operator
+from typing import List, Literal
+
 from mcp.server.fastmcp import FastMCP
+from typing_extensions import TypedDict
 
 mcp = FastMCP("Math")
 
 
+class MathOp(TypedDict):
+    """批量计算中的一次运算"""
+    op: Literal["add", "multiply"]
+    a: float
+    b: float
+
+
+OPERATORS = {"add": operator.add, "multiply": operator.mul}
+
+
 @mcp.tool()
 def add(a: float, b: float) -> float:
     """
@@ -27,6 +41,16 @@ def multiply(a: float, b: float) -> float:
     return a * b
 
 
+@mcp.tool()
+def evaluate_batch(ops: List[MathOp]) -> List[float]:
+    """
+    批量计算，一次调用完成多次 add / multiply
+    :param ops: 运算列表，每项为 {"op": "add" 或 "multiply", "a": 左边的值, "b": 右边的值}
+    :return: 与输入顺序一致的计算结果列表
+    """
+    return [OPERATORS[item["op"]](item["a"], item["b"]) for item in ops]
+
+
 def main():
     """
     MCP服务器入口函数
@@ -54,11 +78,13 @@ def main():
     print(f"Time Service MCP Server 启动中...")
     print(f"传输方式: {args.transport}")
     if args.transport == "streamable-http":
-        print(f"访问地址: http://localhost:{args.port}/mcp_tools")
+        print(f"访问地址: http://localhost:{args.port}{mcp.settings.streamable_http_path}")
 
     # 运行服务器
     if args.transport == "streamable-http":
-        mcp.run(transport="streamable-http", port=args.port)
+        # 端口通过 settings 设置，run() 不接受 port 参数
+        mcp.settings.port = args.port
+        mcp.run(transport="streamable-http")
     else:
         # stdio模式下不打印到stdout，避免干扰MCP协议通信
         mcp.run()
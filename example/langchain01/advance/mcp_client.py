@@ -1,11 +1,13 @@
 import asyncio
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain.agents import create_agent
 from langchain_openai import ChatOpenAI
 import os
 from dotenv import load_dotenv
 
+from example.common.mcp_session_pool import MCPSessionPool
+from example.common.mcp_tool_cache import MCPToolSchemaCache
+
 load_dotenv()
 
 base_model = ChatOpenAI(api_key=os.getenv("DASHSCOPE_API_KEY"),
@@ -13,14 +15,29 @@ base_model = ChatOpenAI(api_key=os.getenv("DASHSCOPE_API_KEY"),
                         model="qwen3-max")
 
 
-async def get_mcp_tools():
+async def get_mcp_tools(client: MCPSessionPool):
+    """
+    获取MCP工具，工具调用复用会话池中的常驻会话
+    """
+    # 获取所有MCP服务器的工具
+    tools = await client.get_tools()
+    print(f"成功加载 {len(tools)} 个工具")
+
+    # 打印工具列表
+    for tool in tools:
+        print(f"  - {tool.name}: {tool.description}")
+
+    return tools
+
+
+def create_mcp_client() -> MCPSessionPool:
     """
-    初始化MCP客户端和Agent
+    初始化MCP客户端
     """
     print("初始化MCP客户端...")
 
-    # 定义MCP client
-    client = MultiServerMCPClient(
+    # 定义MCP client：每个服务器一个常驻会话，stdio服务只启动一次子进程；工具定义缓存到磁盘
+    return MCPSessionPool(
         {
             "time-service": {
                 "command": "python",
@@ -36,30 +53,22 @@ async def get_mcp_tools():
                     "Authorization": f"Bearer {os.getenv('MOJI_API_KEY')}"
                 }
             }
-        }
+        },
+        tool_cache=MCPToolSchemaCache(),
     )
 
-    # 获取所有MCP服务器的工具
-    tools = await client.get_tools()
-    print(f"成功加载 {len(tools)} 个工具")
-
-    # 打印工具列表
-    for tool in tools:
-        print(f"  - {tool.name}: {tool.description}")
-
-    return tools
-
 
 async def main():
     """主函数"""
     try:
-        # 运行综合示例
-        tools = await get_mcp_tools()
-        agent = create_agent(model=base_model, tools=tools)
-        r = await agent.ainvoke(
-            {"messages": [{"role": "user", "content": "北京市今天的温度在是多少度? 如果再下降50%那温度是多少度？"}]})
-        for message in r['messages']:
-            message.pretty_print()
+        # 运行综合示例，退出时关闭所有MCP会话
+        async with create_mcp_client() as client:
+            tools = await get_mcp_tools(client)
+            agent = create_agent(model=base_model, tools=tools)
+            r = await agent.ainvoke(
+                {"messages": [{"role": "user", "content": "北京市今天的温度在是多少度? 如果再下降50%那温度是多少度？"}]})
+            for message in r['messages']:
+                message.pretty_print()
     except Exception as e:
         print(f"运行出错: {str(e)}")
         import traceback
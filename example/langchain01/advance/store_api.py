@@ -1,10 +1,10 @@
 """
 长期记忆 store 的使用
 """
-from langgraph.store.memory import InMemoryStore
+from example.common.indexed_store import IndexedStore
 
-# 定义存储器
-store = InMemoryStore()
+# 定义存储器，time 字段建索引，支持等值和 $gt/$lt 等范围过滤
+store = IndexedStore(filter_fields=["time"])
 
 # 定义命名空间 user_id + type
 user_id = "baqiF2"
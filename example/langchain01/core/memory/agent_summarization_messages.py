@@ -6,12 +6,14 @@
 from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.memory import InMemorySaver
 from langchain.agents import create_agent, AgentState
-from langchain.agents.middleware import SummarizationMiddleware
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
 import os
 from dotenv import load_dotenv
 
+from example.common.background_summarization import BackgroundSummarizationMiddleware
+from example.common.token_counter import default_token_counter
+
 load_dotenv()
 
 base_model = ChatOpenAI(api_key=os.getenv("DASHSCOPE_API_KEY"),
@@ -30,11 +32,15 @@ summary_prompt = """
 agent = create_agent(
     base_model,
     tools=[get_weather],
-    middleware=[SummarizationMiddleware(
+    middleware=[BackgroundSummarizationMiddleware(
         # 摘要模型，使用理解能力更好的模型
         model=base_model,
-        # 触发摘要的token数量
-        max_tokens_before_summary=100,
+        # 达到软阈值时在后台生成摘要，当前轮不等待；摘要完成后的下一轮再替换历史
+        soft_limit=100,
+        # 达到硬阈值时才阻塞等待摘要完成
+        hard_limit=300,
+        # 本地缓存计数，每轮只对新消息分词
+        token_counter=default_token_counter(),
         # 生成后保留最近的消息数量。！！！ 最近N条会排出总结范围，不会总结消息
         messages_to_keep= 1,
         # 摘要的提示词模版，这个很重要，决定最后摘要的质量
@@ -1,6 +1,8 @@
 """
 使用 短时内存记忆来进行管理历史消息
 使用消息裁剪，来裁剪消息
+ - customer_trim_messages: 每轮对全部历史调用 trim_messages，再删除全部消息后写回保留的消息
+ - SlidingWindowTrimMiddleware: 维护累计计数，只删除被淘汰的消息，工具调用与工具结果成组保留（agent 默认使用）
 """
 from typing import Any
 
@@ -16,6 +18,8 @@ from dotenv import load_dotenv
 from langgraph.graph.message import REMOVE_ALL_MESSAGES
 from langgraph.runtime import Runtime
 
+from example.common.sliding_window_middleware import SlidingWindowTrimMiddleware
+
 load_dotenv()
 
 base_model = ChatOpenAI(api_key=os.getenv("DASHSCOPE_API_KEY"),
@@ -29,7 +33,10 @@ def get_weather(location: str) -> str:
 @before_model
 def customer_trim_messages(state: AgentState, runtime: Runtime) -> dict[str, Any] | None:
 
-    """只保留最新的3条数据"""
+    """只保留最新的3条数据
+
+    每轮都会整体重写消息列表，历史越长 checkpoint 写入越大，长会话请使用 SlidingWindowTrimMiddleware
+    """
     messages = state["messages"]
     if len(messages) <= 3:
         return None  # No changes needed
@@ -62,7 +69,8 @@ def customer_trim_messages(state: AgentState, runtime: Runtime) -> dict[str, Any
 agent = create_agent(
     base_model,
     tools=[get_weather],
-    middleware=[customer_trim_messages],
+    # 保留第一条消息和最近4条消息；也可以换成 customer_trim_messages 对比
+    middleware=[SlidingWindowTrimMiddleware(max_messages=4)],
     checkpointer=InMemorySaver(),
 )
 
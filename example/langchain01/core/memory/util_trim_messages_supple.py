@@ -20,6 +20,9 @@ from langchain.messages import AIMessage,HumanMessage,ToolMessage,SystemMessage,
 from langchain_openai import ChatOpenAI
 import os
 from dotenv import load_dotenv
+
+from example.common.token_counter import default_token_counter
+
 load_dotenv()
 
 
@@ -74,7 +77,7 @@ if model == 2:
     )
     print(trim_message)
 
-# 3. 使用LLm计数
+# 3. 使用LLm计数（每次计数都要请求一次模型）
 
 if model == 3:
     trim_message = trim_messages(
@@ -83,4 +86,17 @@ if model == 3:
         token_counter = base_model,
         max_tokens= 45,
     )
+    print(trim_message)
+
+# 4. 使用本地词表计数，每条消息的计数结果会被缓存
+# 设置环境变量 TOKENIZER_VOCAB_FILE 指向离线的 tiktoken 格式词表文件，未设置时按字符数估算
+if model == 4:
+    trim_message = trim_messages(
+        messages,
+        strategy="last",
+        token_counter=default_token_counter(),
+        max_tokens=45,
+        end_on=("human", "tool"),
+        include_system=True,
+    )
     print(trim_message)
\ No newline at end of file
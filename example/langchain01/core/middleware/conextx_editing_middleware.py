@@ -1,17 +1,20 @@
 """
 上下文编辑处理
 ContextEditingMiddleware
+CachedTokenContextEditingMiddleware: 与 ContextEditingMiddleware 相同，token 数由本地缓存计数器计算
 """
 import os
 
 from dotenv import load_dotenv
 from langchain.agents import create_agent
-from langchain.agents.middleware import ContextEditingMiddleware, ClearToolUsesEdit
+from langchain.agents.middleware import ClearToolUsesEdit
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
 from langgraph.checkpoint.memory import InMemorySaver
 
+from example.common.token_counter_middleware import CachedTokenContextEditingMiddleware
+
 load_dotenv()
 
 
@@ -28,7 +31,8 @@ base_model = ChatOpenAI(api_key=os.getenv("DASHSCOPE_API_KEY"),
 agent = create_agent(
     base_model,
     tools=[get_weather],
-    middleware=[ContextEditingMiddleware(edits=[ClearToolUsesEdit()], token_count_method="approximate"),
+    # 等价于 ContextEditingMiddleware(edits=[ClearToolUsesEdit()], token_count_method="approximate")，计数结果带缓存
+    middleware=[CachedTokenContextEditingMiddleware(edits=[ClearToolUsesEdit()]),
                 ],
     checkpointer=InMemorySaver()
 )
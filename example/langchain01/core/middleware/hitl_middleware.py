@@ -11,10 +11,11 @@ from langchain.agents.middleware import HumanInTheLoopMiddleware
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.config import get_stream_writer
 from langgraph.types import Command
 
+from example.common.sqlite_checkpointer import default_checkpointer
+
 load_dotenv()
 
 base_model = ChatOpenAI(api_key=os.getenv("DASHSCOPE_API_KEY"),
@@ -47,7 +48,8 @@ def get_time() -> str:
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
-checkpointer = InMemorySaver()
+# 检查点持久化到本地SQLite，进程重启后中断仍在，可以直接恢复运行
+checkpointer = default_checkpointer()
 agent = create_agent(
     model=base_model,
     checkpointer=checkpointer,
@@ -65,37 +67,49 @@ agent = create_agent(
     ],
 )
 
-config: RunnableConfig = {"configurable": {"thread_id": "1"}}
-r = agent.invoke({"messages": [{"role": "user", "content": "查询北京的今天的日期和天气？"}]}, config=config)
-for message in r['messages']:
-    message.pretty_print()
-
-if '__interrupt__' in r:
-    print(f"interrupt: {r['__interrupt__']}")
-
-## 恢复运行
-print("==" * 10)
-print("恢复运行")
-
-# r = agent.invoke(Command(resume={"decisions": [{"type": "approve"}]}), config=config)
-# for message in r['messages']:
-#     message.pretty_print()
-
-# r = agent.invoke(Command(resume={"decisions": [{"type": "reject"}]}), config=config)
-# for message in r['messages']:
-#     message.pretty_print()
-
-r = agent.invoke(Command(resume={"decisions": [
-    {"type": "edit",
-     "edited_action": {
-         "name": "fallback_weather",
-         "args": {"location": "北京"},
-     }
-     }
-]
-}), config=config)
-for message in r['messages']:
-    message.pretty_print()
-
-if '__interrupt__' in r:
-    print(f"interrupt: {r['__interrupt__']}")
+# 固定使用线程 "1"：上次运行停在审批处时直接恢复；否则先清空该线程的检查点再重新提问，
+# 重复运行示例时线程历史不会一直增长。需要保留历史时改用新的 thread_id
+THREAD_ID = "1"
+config: RunnableConfig = {"configurable": {"thread_id": THREAD_ID}}
+state = agent.get_state(config)
+if state.interrupts:
+    # 上次运行停在审批处（例如审批前进程退出），不用重新提问
+    print(f"存在未完成的审批: {state.interrupts}")
+    pending = True
+else:
+    checkpointer.delete_thread(THREAD_ID)
+    r = agent.invoke({"messages": [{"role": "user", "content": "查询北京的今天的日期和天气？"}]}, config=config)
+    for message in r['messages']:
+        message.pretty_print()
+
+    pending = '__interrupt__' in r
+    if pending:
+        print(f"interrupt: {r['__interrupt__']}")
+
+## 恢复运行：只有存在待审批的中断时才需要 resume
+if pending:
+    print("==" * 10)
+    print("恢复运行")
+
+    # r = agent.invoke(Command(resume={"decisions": [{"type": "approve"}]}), config=config)
+    # for message in r['messages']:
+    #     message.pretty_print()
+
+    # r = agent.invoke(Command(resume={"decisions": [{"type": "reject"}]}), config=config)
+    # for message in r['messages']:
+    #     message.pretty_print()
+
+    r = agent.invoke(Command(resume={"decisions": [
+        {"type": "edit",
+         "edited_action": {
+             "name": "fallback_weather",
+             "args": {"location": "北京"},
+         }
+         }
+    ]
+    }), config=config)
+    for message in r['messages']:
+        message.pretty_print()
+
+    if '__interrupt__' in r:
+        print(f"interrupt: {r['__interrupt__']}")